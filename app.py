@@ -1,56 +1,206 @@
-"""Provide Meme Generator Flask application."""
-import random
+"""Provide Meme Generator Flask application.
+
+`create_app` builds the app. Run it with `flask run`, or with a WSGI server as
+`gunicorn 'app:create_app()'`. Set `MEME_SNAPSHOT` to the directory of a snapshot
+built by `python3 snapshot.py <directory>` to start from it instead of ingesting
+the quote files. The image catalog is refreshed in the background, so photos added
+to the images directory are picked up without a restart.
+
+Render and ingestion metrics are served in the Prometheus text format by `/metrics`;
+set `MEME_METRICS=0` to stop recording them.
+"""
+import functools
 import os
-import requests
-from flask import Flask, render_template, after_this_request, request
-from quote_engine.ingestor import Ingestor
-from meme_engine.meme_engine import MemeEngine
+import threading
+import time
+from typing import Optional
+from flask import Blueprint, Flask, abort, current_app, jsonify, render_template, request, send_from_directory, url_for
+from quote_engine.quote_store import QuoteStore
+from quote_engine.search_index import SearchIndex
+from meme_engine.exception import ImageFetchError, RenderQueueFull
+from meme_engine.image_encoding import ImageEncoding
+from meme_engine.image_fetcher import ImageFetcher
+from meme_engine.image_index import ImageIndex
+from meme_engine.meme_engine import MAX_IMAGE_WIDTH_PX, MemeEngine
+from meme_engine.render_queue import CANCELLED, DONE, TIMED_OUT, RenderQueue
+from snapshot import build_snapshot, load_snapshot
+from telemetry import metrics
+
+MAX_JOB_WAIT_S = 20.0
+# Seconds each refresh of the job page waits for the job, so a browser polls without holding a request thread for long.
+JOB_PAGE_WAIT_S = 2.0
+# Seconds a job keeps after fetching its image to draw and save the meme.
+RENDER_TIME_S = 10.0
+# Seconds between refreshes of the image catalog.
+IMAGE_REFRESH_S = 30.0
+# Formats served by `/meme.<ext>`, keyed by extension.
+MEME_FORMATS = {'jpg': 'JPEG', 'jpeg': 'JPEG', 'webp': 'WEBP', 'png': 'PNG'}
+# Rendered memes only change if their source image does, so caches may keep them for a day and then revalidate by ETag.
+MEME_CACHE_CONTROL = 'public, max-age=86400'
+
+bp = Blueprint('memes', __name__)
+
+
+class MemeGenerator:
+    """The resources the request handlers of one app share."""
 
-app = Flask(__name__)
+    meme: MemeEngine
+    fetcher: ImageFetcher
+    render_queue: RenderQueue
+    quotes: QuoteStore
+    images: ImageIndex
 
-meme = MemeEngine('./static')
+    def __init__(self, quotes: QuoteStore, images: ImageIndex, output_dir: str) -> None:
+        """Construct a new `MemeGenerator` that picks from the quotes and images and writes memes to the output directory.
 
+        :param quotes: A QuoteStore of the quotes to pick from.
+        :param images: An ImageIndex of the images to pick from.
+        :param output_dir: A string of the directory path memes created by `POST /create` are written to.
+        """
+        self.meme = MemeEngine(output_dir)
+        self.fetcher = ImageFetcher()
+        # A job's fetch stops by its deadline less the render time, so a timed-out job frees its worker soon after.
+        self.render_queue = RenderQueue(max_workers=4, max_pending=32, job_timeout_s=self.fetcher.deadline_s + RENDER_TIME_S)
+        self.quotes = quotes
+        # Images are addressed in URLs by their name in the index, so only cataloged images can be rendered.
+        self.images = images
+        self._search_index: Optional[SearchIndex] = None
+        self._search_index_lock = threading.Lock()
 
-def setup():
-    """Load all resources."""
-    quote_files = ['./_data/DogQuotes/DogQuotesTXT.txt',
-                   './_data/DogQuotes/DogQuotesDOCX.docx',
-                   './_data/DogQuotes/DogQuotesPDF.pdf',
-                   './_data/DogQuotes/DogQuotesCSV.csv']
-    quotes = []
-    for quote_file in quote_files:
-        quotes.extend(Ingestor.parse(quote_file))
+    @property
+    def search_index(self) -> SearchIndex:
+        """Get the search index over the quotes, built by the first search."""
+        with self._search_index_lock:
+            if self._search_index is None:
+                self._search_index = SearchIndex(self.quotes)
+            return self._search_index
 
-    images_path = "./_data/photos/dog/"
-    imgs = []
-    for root, _, files in os.walk(images_path):
-        imgs = [os.path.join(root, name) for name in files]
 
-    return quotes, imgs
+def create_app(
+        snapshot_dir: Optional[str] = None,
+        output_dir: str = './static',
+        warm_up: bool = True,
+        image_refresh_s: Optional[float] = IMAGE_REFRESH_S,
+        record_metrics: Optional[bool] = None,
+    ) -> Flask:
+    """Create the Meme Generator app.
 
+    :param snapshot_dir: A String path of a snapshot directory to load the quotes and images from.
+        Defaults to the `MEME_SNAPSHOT` environment variable; without either, the quote files are ingested.
+    :param output_dir: A string of the directory path memes created by `POST /create` are written to.
+    :param warm_up: A boolean whether to decode and resize every image ahead of the first request.
+    :param image_refresh_s: A float of the seconds between refreshes of the image catalog, or None to never refresh it.
+    :param record_metrics: A boolean whether to record stage timings and counts for `/metrics`.
+        Defaults to on unless the `MEME_METRICS` environment variable is "0".
+    :return: A Flask app.
+    """
+    if record_metrics is None:
+        record_metrics = os.environ.get('MEME_METRICS', '1') != '0'
+    metrics.enable(record_metrics)
+    snapshot_dir = snapshot_dir or os.environ.get('MEME_SNAPSHOT')
+    snapshot = load_snapshot(snapshot_dir) if snapshot_dir else build_snapshot()
+    generator = MemeGenerator(snapshot.quotes, snapshot.images, output_dir)
+    if warm_up:
+        generator.meme.template_cache.warm_up(generator.images.paths(), MAX_IMAGE_WIDTH_PX)
+    if image_refresh_s:
+        generator.images.start_watching(image_refresh_s)
+    metrics.collect_gauges('render_queue', generator.render_queue.stats, 'meme_render_queue_jobs', 'kind')
+    metrics.collect_gauges('images', lambda: {'readable': len(generator.images), 'rejected': len(generator.images.rejected)},
+                           'meme_images', 'status')
 
-quotes, imgs = setup()
+    app = Flask(__name__)
+    app.extensions['meme_generator'] = generator
+    app.register_blueprint(bp)
+    return app
 
 
-@app.route('/')
+def _generator() -> MemeGenerator:
+    return current_app.extensions['meme_generator']
+
+
+@bp.route('/')
 def meme_rand():
-    """Generate a random meme."""
-    img = random.choice(imgs)
-    quote = random.choice(quotes)
+    """Generate a random meme, served from memory by `/meme.<ext>`."""
+    generator = _generator()
+    image = generator.images.random_image()
+    quote = generator.quotes.random_quote()
 
-    path = meme.make_meme(img, quote.body, quote.author)
+    path = url_for('.meme_image', ext='jpg', image=image.name, body=quote.body, author=quote.author)
     return render_template('meme.html', path=path)
 
 
-@app.route('/create', methods=['GET'])
+@bp.route('/meme.<ext>')
+def meme_image(ext):
+    """Render a meme in memory and stream the encoded image.
+
+    Query parameters: `image` with the image path below the images directory, `body` and `author`
+    of the quote, and optionally `quality` (1-95) and `progressive=1` for JPEG and WebP, and an
+    integer `seed` of the caption placement.
+    The response carries an ETag derived from the render parameters, and a request whose
+    `If-None-Match` holds that ETag is answered with `304 Not Modified` without rendering.
+    """
+    generator = _generator()
+    image = generator.images.get(request.args.get('image', ''))
+    body = request.args.get('body')
+    author = request.args.get('author')
+    if ext not in MEME_FORMATS or image is None or body is None or author is None:
+        abort(404 if image is None or ext not in MEME_FORMATS else 400)
+    image_path = image.path
+    encoding = ImageEncoding(
+        format=MEME_FORMATS[ext],
+        quality=min(max(request.args.get('quality', 75, type=int), 1), 95),
+        progressive=request.args.get('progressive', '') == '1',
+        optimize=MEME_FORMATS[ext] == 'PNG',
+    )
+
+    seed = request.args.get('seed', type=int)
+
+    etag = generator.meme.render_etag(image_path, body, author, encoding=encoding, seed=seed)
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        rendered = generator.meme.render_bytes(image_path, body, author, encoding=encoding, seed=seed)
+        response = current_app.response_class(rendered.data, mimetype=rendered.mimetype)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = MEME_CACHE_CONTROL
+    return response
+
+
+@bp.route('/search')
+def quote_search():
+    """Search the quotes by words in their body or author.
+
+    Query parameters: `q` with whitespace-separated terms, where a term ending in `*` is a prefix,
+    optionally `author` to restrict results to one author, and `limit` for the maximum number of results.
+    """
+    query = request.args.get('q', '')
+    author = request.args.get('author') or None
+    limit = min(request.args.get('limit', 10, type=int), 100)
+    hits = _generator().search_index.search(query, author=author, limit=limit)
+    return jsonify([{'body': hit.quote.body, 'author': hit.quote.author, 'score': hit.score} for hit in hits])
+
+
+@bp.route('/metrics')
+def metrics_export():
+    """Export the render and ingestion metrics of this process in the Prometheus text format."""
+    return current_app.response_class(metrics.registry.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+@bp.route('/create', methods=['GET'])
 def meme_form():
     """User input for meme information."""
     return render_template('meme_form.html')
 
 
-@app.route('/create', methods=['POST'])
+@bp.route('/create', methods=['POST'])
 def meme_post():
-    """Create a user defined meme."""
+    """Queue a user defined meme and return its job.
+
+    Browsers get the job page, which refreshes until the meme is done; clients that accept JSON
+    get `202 Accepted` with the job id and its status URL. When too many jobs are pending, the job is
+    rejected with `503 Service Unavailable`. An animated image gives an animated GIF meme,
+    and one over the engine's animation limits fails the job like an image that is too large.
+    """
     image_url = request.form.get('image_url')
     body = request.form.get('body')
     author = request.form.get('author')
@@ -61,26 +211,129 @@ def meme_post():
     if not author:
         author = "Meme Generator"
 
-    temp_img_path = "./tmp/downloaded_img.jpg"
+    # Identical requests in flight share one render.
+    generator = _generator()
+    try:
+        fetch_by = time.monotonic() + generator.render_queue.job_timeout_s - RENDER_TIME_S
+        render = functools.partial(_render_remote_meme, generator, image_url, body, author, fetch_by)
+        job = generator.render_queue.submit((image_url, body, author), render)
+    except RenderQueueFull:
+        error = "Too many memes are being created right now, please try again in a moment."
+        headers = {'Retry-After': '5'}
+        if _wants_json():
+            return jsonify({'error': error}), 503, headers
+        return render_template('meme_form.html', error=error), 503, headers
 
-    # 1. Use requests to save the image from the image_url form param to a temp local file.
-    r = requests.get(image_url)
-    if r.status_code == 200:
-        with open(temp_img_path, 'wb') as f:
-            f.write(r.content)
-    del r
+    status_url = url_for('.meme_job', job_id=job.job_id)
+    if _wants_json():
+        return jsonify(_job_status(job)), 202, {'Location': status_url}
+    return _job_page(job)
 
-    # 2. Use the meme object to generate a meme using this temp file and the body and author form paramaters.
-    path = meme.make_meme(temp_img_path, body, author)
 
-    # 3. Remove the temporary saved image.
-    @after_this_request
-    def cleanup(response):
-        os.remove(temp_img_path)
-        return response
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def meme_job(job_id):
+    """Return the state of a meme job, and the meme once it is done.
 
-    return render_template('meme.html', path=path)
+    Query parameters: `wait` with the seconds to long-poll for the job to finish, up to `MAX_JOB_WAIT_S`.
+    Clients that accept JSON get the job status with `200 OK` once it has finished and `202 Accepted` before;
+    the status of a finished job has the URL of its meme in `path`.
+    A job that times out is reported at once, but its worker is only freed when the render returns:
+    the fetch stops at the job deadline less `RENDER_TIME_S`, and drawing the meme is not interrupted.
+    """
+    render_queue = _generator().render_queue
+    job = render_queue.get(job_id)
+    if job is None:
+        return _job_not_found()
+    wait = min(max(request.args.get('wait', 0.0, type=float), 0.0), MAX_JOB_WAIT_S)
+    if wait:
+        render_queue.wait(job, wait)
+
+    if _wants_json():
+        return jsonify(_job_status(job)), _job_http_status(job)
+    return _job_page(job)
+
+
+@bp.route('/jobs/<job_id>', methods=['DELETE'])
+def meme_job_cancel(job_id):
+    """Cancel a meme job that has not finished."""
+    render_queue = _generator().render_queue
+    job = render_queue.get(job_id)
+    if job is None:
+        return _job_not_found()
+    render_queue.cancel(job_id)
+    return jsonify(_job_status(job))
+
+
+@bp.route('/memes/<name>')
+def meme_output(name):
+    """Serve a meme created by `POST /create`, by its file name in the output directory."""
+    response = send_from_directory(_generator().meme.output_store.directory, name)
+    response.headers['Cache-Control'] = MEME_CACHE_CONTROL
+    return response
+
+
+def _render_remote_meme(generator, image_url, body, author, fetch_by):
+    # Runs on a render worker, outside the app context.
+    # 1. Stream the image from the image_url form param into memory, within the fetcher's size limit and by fetch_by.
+    image = generator.fetcher.fetch(image_url, deadline_s=fetch_by - time.monotonic())
+    # 2. Use the meme object to generate a meme from the in-memory image and the body and author form paramaters.
+    return generator.meme.make_meme(image, body, author)
+
+
+def _wants_json():
+    return request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
+
+
+def _job_page(job):
+    status = _job_http_status(job)
+    if job.state == DONE:
+        return render_template('meme.html', path=_meme_url(job))
+    if job.finished:
+        return render_template('meme_form.html', error=_job_error(job)), status
+    return render_template('meme_job.html', job_id=job.job_id, wait=JOB_PAGE_WAIT_S), status
+
+
+def _meme_url(job):
+    return url_for('.meme_output', name=os.path.basename(job.result))
+
+
+def _job_status(job):
+    status = {'job_id': job.job_id, 'state': job.state, 'status_url': url_for('.meme_job', job_id=job.job_id)}
+    if job.state == DONE:
+        status['path'] = _meme_url(job)
+    elif job.finished:
+        status['error'] = _job_error(job)
+    return status
+
+
+def _job_http_status(job):
+    if not job.finished:
+        return 202
+    if job.state == DONE:
+        return 200
+    if job.state == TIMED_OUT:
+        return 504
+    if job.state == CANCELLED:
+        return 410
+    return 400 if isinstance(job.error, ImageFetchError) else 500
+
+
+def _job_error(job):
+    if job.state == TIMED_OUT:
+        return "Creating the meme took too long."
+    if job.state == CANCELLED:
+        return "Creating the meme was cancelled."
+    if isinstance(job.error, ImageFetchError):
+        return str(job.error)
+    return "The meme could not be created from this image."
+
+
+def _job_not_found():
+    error = "This meme job does not exist or has expired."
+    if _wants_json():
+        return jsonify({'error': error}), 404
+    return render_template('meme_form.html', error=error), 404
 
 
 if __name__ == "__main__":
-    app.run()
+    create_app().run()
@@ -0,0 +1 @@
+"""Let Python know that the `benchmarks/` folder is a package."""
@@ -0,0 +1,102 @@
+"""Benchmark captioning long animated GIFs with all frames in memory vs. streamed a frame at a time.
+
+"materialized" decodes and resizes every frame into a list, captions each frame by
+laying out and placing the caption again, and saves them with Pillow's `save_all`,
+which computes a palette per frame. "streamed" is `MemeEngine.make_meme`, which lays
+the caption out once, maps every frame to one palette and writes each frame as it is
+decoded. Each method and animation runs in its own process so that the reported peak
+RSS belongs to that combination alone.
+
+Run from the repository root:
+    python3 -m benchmarks.bench_animation --size 640x480 --frames 100 400
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+from benchmarks.common import make_synthetic_animation, peak_rss_mb
+from meme_engine.meme_engine import MAX_IMAGE_WIDTH_PX
+
+BODY = "To bork or not to bork"
+AUTHOR = "Bork"
+
+
+def _materialized(image_path: str, output_dir: str) -> str:
+    from PIL import Image, ImageSequence
+
+    from meme_engine.caption_cache import CaptionCache
+    from meme_engine.meme_engine import _add_quote_in_image, _saliency_map
+    from meme_engine.image_utils import resize_image_with_aspect_ratio_maintained
+
+    caption_cache = CaptionCache()
+    frames = []
+    durations = []
+    with Image.open(image_path) as image:
+        for frame in ImageSequence.Iterator(image):
+            rgb = frame.convert("RGB")
+            resize_image_with_aspect_ratio_maintained(rgb, MAX_IMAGE_WIDTH_PX)
+            _add_quote_in_image(rgb, BODY, AUTHOR, caption_cache, _saliency_map(rgb), seed=0)
+            frames.append(rgb)
+            durations.append(frame.info.get("duration", 100))
+    output_path = os.path.join(output_dir, "materialized.gif")
+    frames[0].save(output_path, save_all=True, append_images=frames[1:], duration=durations, loop=0)
+    return output_path
+
+
+def _streamed(image_path: str, output_dir: str) -> str:
+    from meme_engine.meme_engine import MemeEngine
+
+    return MemeEngine(output_dir).make_meme(image_path, BODY, AUTHOR, seed=0)
+
+
+METHODS = {
+    "materialized": _materialized,
+    "streamed": _streamed,
+}
+
+
+def run_method(method: str, path: str, frames: int) -> None:
+    """Caption the animation once with one method and print its time, peak RSS and output size."""
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        output_path = METHODS[method](path, output_dir)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        output_kb = os.path.getsize(output_path) / 1024
+    print(f"{frames}\t{method}\t{elapsed_ms:.0f}\t{elapsed_ms / frames:.2f}\t{peak_rss_mb():.1f}\t{output_kb:.0f}", flush=True)
+
+
+def parse_args(argv: List[str] = sys.argv[1:]) -> argparse.Namespace:
+    """Parse input arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="640x480", help="Frame size of the animations as WIDTHxHEIGHT")
+    parser.add_argument("--frames", nargs="+", type=int, default=[100, 400], help="Frames of each animation")
+    parser.add_argument("--methods", nargs="+", choices=sorted(METHODS), default=list(METHODS), help="Methods to run")
+    parser.add_argument("--method", choices=sorted(METHODS), help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(args: argparse.Namespace) -> None:
+    """Generate the animations and caption each with each method in a fresh interpreter."""
+    if args.method:
+        run_method(args.method, args.path, args.frames[0])
+        return
+
+    width, height = (int(px) for px in args.size.split("x"))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print("frames\tmethod\ttotal_ms\tms_per_frame\tpeak_rss_mb\toutput_kb", flush=True)
+        for frames in args.frames:
+            path = os.path.join(tmp_dir, f"animation-{frames}.gif")
+            make_synthetic_animation(path, width, height, frames)
+            for method in args.methods:
+                cmd = [sys.executable, "-m", "benchmarks.bench_animation", "--method", method, "--path", path,
+                       "--frames", str(frames)]
+                subprocess.run(cmd, check=True)
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,77 @@
+"""Benchmark import time, parse time and RSS of the CSV ingestion backends.
+
+Every measurement runs in a fresh interpreter. "import" measures importing the quote
+engine, with and without pandas loaded on top of it; "parse" measures ingesting a
+synthetic CSV corpus with the streaming csv backend and with the pandas backend.
+
+Run from the repository root:
+    python3 -m benchmarks.bench_csv_ingest --rows 1000000
+"""
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import List, Optional
+
+_MEASURE = """
+import json, sys, time
+start = time.perf_counter()
+import quote_engine.ingestor
+if sys.argv[1] == "pandas":
+    import pandas
+imported = time.perf_counter()
+count = 0
+if len(sys.argv) > 2:
+    from quote_engine.ingestor_utils import CSVIngestor
+    for _ in CSVIngestor.parse(sys.argv[2], backend=sys.argv[1]):
+        count += 1
+parsed = time.perf_counter()
+from benchmarks.common import peak_rss_mb
+print(json.dumps({"import_ms": (imported - start) * 1000, "parse_ms": (parsed - imported) * 1000,
+                  "quotes": count, "peak_rss_mb": peak_rss_mb()}))
+"""
+
+
+def make_csv_corpus(path: str, rows: int) -> None:
+    """Write a synthetic CSV corpus with a header row, quoted fields and embedded commas."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["body", "author"])
+        for i in range(rows):
+            writer.writerow([f"Quote number {i}, with a comma and \"quotes\"", f"Author {i % 997}"])
+
+
+def measure(backend: str, path: Optional[str] = None) -> dict:
+    """Run one measurement in a fresh interpreter and return its results."""
+    cmd = [sys.executable, "-c", _MEASURE, backend] + ([path] if path else [])
+    return json.loads(subprocess.run(cmd, check=True, capture_output=True, text=True).stdout)
+
+
+def parse_args(argv: List[str] = sys.argv[1:]) -> argparse.Namespace:
+    """Parse input arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000, help="Rows in the synthetic corpus")
+    return parser.parse_args(argv)
+
+
+def main(args: argparse.Namespace) -> None:
+    """Print import and parse measurements of both backends."""
+    print("stage\tbackend\timport_ms\tparse_ms\tpeak_rss_mb")
+    for backend in ("csv", "pandas"):
+        result = measure(backend)
+        print(f"import\t{backend}\t{result['import_ms']:.1f}\t-\t{result['peak_rss_mb']:.1f}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "quotes.csv")
+        make_csv_corpus(path, args.rows)
+        for backend in ("csv", "pandas"):
+            result = measure(backend, path)
+            assert result["quotes"] == args.rows
+            print(f"parse\t{backend}\t{result['import_ms']:.1f}\t{result['parse_ms']:.1f}\t{result['peak_rss_mb']:.1f}")
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,74 @@
+"""Benchmark the in-memory image fetch used by POST /create against a local stand-in server.
+
+Reports the mean latency of fetching a synthetic photo with a pooled session against a
+new connection per fetch, without network access. The limits of `ImageFetcher` are
+covered by `tests/test_image_fetcher.py`.
+
+Run from the repository root:
+    python3 -m benchmarks.bench_fetch --repeat 200
+"""
+import argparse
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+import requests
+
+from benchmarks.common import make_photo_bytes
+from meme_engine.image_fetcher import ImageFetcher
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    photo = make_photo_bytes()
+
+    def do_GET(self):
+        if self.path != "/photo.jpg":
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(self.photo)))
+        self.end_headers()
+        self.wfile.write(self.photo)
+
+    def log_message(self, *args):
+        pass
+
+
+def time_fetches(base_url: str, repeat: int) -> None:
+    """Print the mean latency of fetching the photo with a pooled session and without one."""
+    fetcher = ImageFetcher()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fetcher.fetch(base_url + "/photo.jpg")
+    print(f"pooled\t{(time.perf_counter() - start) / repeat * 1000:.2f} ms")
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        requests.get(base_url + "/photo.jpg").content
+    print(f"unpooled\t{(time.perf_counter() - start) / repeat * 1000:.2f} ms")
+
+
+def parse_args(argv: List[str] = sys.argv[1:]) -> argparse.Namespace:
+    """Parse input arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200, help="Fetches per variant")
+    return parser.parse_args(argv)
+
+
+def main(args: argparse.Namespace) -> None:
+    """Start the stand-in server and time the fetches."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        time_fetches(base_url, args.repeat)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main(parse_args())
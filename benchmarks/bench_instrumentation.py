@@ -0,0 +1,73 @@
+"""Benchmark the overhead of the render and ingestion instrumentation.
+
+Reports the cost of one disabled and one enabled `timer` and `count` call, and the
+median latency of a warm in-memory render (`MemeEngine.render_bytes` on a cached
+template and caption, the path with the least work per instrumented call) with
+instrumentation disabled and enabled.
+
+Run from the repository root:
+    python3 -m benchmarks.bench_instrumentation --repeat 500
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+from typing import List
+
+from meme_engine.image_encoding import ImageEncoding
+from meme_engine.meme_engine import MemeEngine
+from telemetry import metrics
+
+IMAGE_PATH = "./_data/photos/dog/xander_1.jpg"
+CALLS = 200_000
+
+
+def call_ns(statement: str) -> float:
+    """Return the nanoseconds per execution of a statement using `metrics`."""
+    return min(timeit.repeat(statement, globals={"metrics": metrics}, number=CALLS, repeat=5)) / CALLS * 1e9
+
+
+def render_ms(engine: MemeEngine, repeat: int) -> float:
+    """Return the median milliseconds of a warm render."""
+    encoding = ImageEncoding(format="JPEG")
+    engine.render_bytes(IMAGE_PATH, "To bork or not to bork", "Bork", encoding=encoding)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        engine.render_bytes(IMAGE_PATH, "To bork or not to bork", "Bork", encoding=encoding)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def parse_args(argv: List[str] = sys.argv[1:]) -> argparse.Namespace:
+    """Parse input arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=500, help="Renders per measurement")
+    return parser.parse_args(argv)
+
+
+def main(args: argparse.Namespace) -> None:
+    """Print the per-call and per-render cost of instrumentation."""
+    print("measurement\tdisabled\tenabled")
+    for name, statement in (("timer ns", "with metrics.timer('meme_stage_seconds', stage='decode'): pass"),
+                            ("count ns", "metrics.count('meme_decoded_bytes_total', 1)")):
+        metrics.enable(False)
+        disabled = call_ns(statement)
+        metrics.enable(True)
+        enabled = call_ns(statement)
+        print(f"{name}\t{disabled:.0f}\t{enabled:.0f}")
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        engine = MemeEngine(output_dir)
+        renders = []
+        for enabled in (False, True):
+            metrics.enable(enabled)
+            renders.append(render_ms(engine, args.repeat))
+        print(f"render ms\t{renders[0]:.3f}\t{renders[1]:.3f}")
+    metrics.enable(False)
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,61 @@
+"""Benchmark caption placement by saliency map vs. uniformly at random.
+
+For every photo, reports the time to compute its `SaliencyMap` at the meme width, the
+time of one `SaliencyMap.place`, and the mean busy-ness (mean absolute difference of
+neighbouring samples) and luminance of the region a caption of a typical size covers
+when placed by the map and when placed uniformly at random, averaged over seeds.
+
+Run from the repository root:
+    python3 -m benchmarks.bench_placement --seeds 200
+"""
+import argparse
+import glob
+import random
+import statistics
+import sys
+import time
+from typing import List
+
+# Imported ahead, so the first map's time does not include importing NumPy.
+import numpy  # noqa: F401
+
+from meme_engine.image_utils import open_image_resized
+from meme_engine.meme_engine import MAX_IMAGE_WIDTH_PX
+from meme_engine.placement import SaliencyMap
+
+IMAGES_GLOB = "./_data/photos/dog/*"
+
+
+def parse_args(argv: List[str] = sys.argv[1:]) -> argparse.Namespace:
+    """Parse input arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", default=IMAGES_GLOB, help="Glob of the photos to place captions on")
+    parser.add_argument("--caption", default="300x80", help="Caption size as WIDTHxHEIGHT")
+    parser.add_argument("--seeds", type=int, default=200, help="Placements per photo and method")
+    return parser.parse_args(argv)
+
+
+def main(args: argparse.Namespace) -> None:
+    """Place captions on every photo by saliency and at random and print the regions they cover."""
+    box = tuple(int(px) for px in args.caption.split("x"))
+    print("image\tmap_ms\tplace_us\tbusy_saliency\tbusy_random\tluma_saliency\tluma_random")
+    for path in sorted(glob.glob(args.images)):
+        image = open_image_resized(path, MAX_IMAGE_WIDTH_PX)
+        start = time.perf_counter()
+        saliency = SaliencyMap.from_image(image)
+        map_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        placed = [saliency.place(box, seed) for seed in range(args.seeds)]
+        place_us = (time.perf_counter() - start) / args.seeds * 1e6
+        rng = random.Random(0)
+        uniform = [(rng.randint(0, max(0, image.size[0] - box[0])), rng.randint(0, max(0, image.size[1] - box[1])))
+                   for _ in range(args.seeds)]
+
+        busy = [statistics.fmean(saliency.busyness(coord, box) for coord in coords) for coords in (placed, uniform)]
+        luma = [statistics.fmean(saliency.mean_luminance(coord, box) for coord in coords) for coords in (placed, uniform)]
+        print(f"{path.rsplit('/', 1)[-1]}\t{map_ms:.2f}\t{place_us:.0f}\t{busy[0]:.1f}\t{busy[1]:.1f}\t{luma[0]:.0f}\t{luma[1]:.0f}")
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,59 @@
+"""Benchmark cold vs. warm startup of quote loading through the QuoteCache.
+
+Each start runs in a fresh interpreter, so the timings include importing the quote
+engine as well as parsing. The cold start uses an empty cache directory, the warm
+starts reuse the directory the cold start filled.
+
+Run from the repository root:
+    python3 -m benchmarks.bench_quote_cache --repeat 5
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+DEFAULT_QUOTE_FILES = ['./_data/DogQuotes/DogQuotesTXT.txt',
+                       './_data/DogQuotes/DogQuotesDOCX.docx',
+                       './_data/DogQuotes/DogQuotesPDF.pdf',
+                       './_data/DogQuotes/DogQuotesCSV.csv']
+
+_LOAD_QUOTES = """
+import sys
+from quote_engine.quote_cache import QuoteCache
+cache = QuoteCache(sys.argv[1])
+for path in sys.argv[2:]:
+    cache.parse(path)
+"""
+
+
+def time_start(cache_dir: str, quote_files: List[str]) -> float:
+    """Return the wall time in milliseconds of loading the quote files in a fresh interpreter."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", _LOAD_QUOTES, cache_dir, *quote_files], check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def parse_args(argv: List[str] = sys.argv[1:]) -> argparse.Namespace:
+    """Parse input arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Starts per variant")
+    parser.add_argument("quote_files", nargs="*", default=DEFAULT_QUOTE_FILES, help="Quote files to load")
+    return parser.parse_args(argv)
+
+
+def main(args: argparse.Namespace) -> None:
+    """Time cold and warm starts and print their medians."""
+    cold, warm = [], []
+    for _ in range(args.repeat):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cold.append(time_start(cache_dir, args.quote_files))
+            warm.append(time_start(cache_dir, args.quote_files))
+    print(f"cold\t{statistics.median(cold):.1f} ms")
+    print(f"warm\t{statistics.median(warm):.1f} ms")
+
+
+if __name__ == "__main__":
+    main(parse_args())
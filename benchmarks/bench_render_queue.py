@@ -0,0 +1,160 @@
+"""Load test the random meme route while POST /create is saturated with slow renders.
+
+The Flask app is served by a threaded werkzeug server in a child process, and POST
+/create downloads its images from a local stand-in server that delays every response,
+so no network access is needed. The random route's latency is measured first on an
+idle app and then while clients in another child process submit enough memes to keep
+the render queue full; with renders off the request threads its percentiles should
+stay flat.
+
+Run from the repository root:
+    python3 -m benchmarks.bench_render_queue --clients 48 --duration 10
+"""
+import argparse
+import logging
+import multiprocessing
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+import requests
+from werkzeug.serving import make_server
+
+from benchmarks.common import make_photo_bytes, percentile
+
+
+class _SlowPhotoHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    photo = make_photo_bytes()
+    delay_s = 0.5
+
+    def do_GET(self):
+        time.sleep(self.delay_s)
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(self.photo)))
+        self.end_headers()
+        self.wfile.write(self.photo)
+
+    def log_message(self, *args):
+        pass
+
+
+def time_random_route(base_url: str, duration_s: float) -> List[float]:
+    """Request the random meme route back to back and return each latency in milliseconds."""
+    latencies = []
+    session = requests.Session()
+    end = time.monotonic() + duration_s
+    while time.monotonic() < end:
+        start = time.perf_counter()
+        session.get(base_url + "/").raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def serve_app(port: multiprocessing.Value) -> None:
+    """Serve the Flask app on a free port and publish the port."""
+    import app
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app.create_app(), threaded=True)
+    port.value = server.server_port
+    server.serve_forever()
+
+
+def submit_memes(base_url: str, image_url: str, client: int, stop: threading.Event, results: dict) -> None:
+    """Submit unique memes and long-poll each one until done, recording job latencies and rejections."""
+    session = requests.Session()
+    session.headers["Accept"] = "application/json"
+    n = 0
+    while not stop.is_set():
+        n += 1
+        start = time.perf_counter()
+        response = session.post(base_url + "/create", data={"image_url": image_url, "body": f"Load {client}-{n}", "author": "Bench"})
+        if response.status_code == 503:
+            results["rejected"] += 1
+            time.sleep(0.1)
+            continue
+        status_url = response.json()["status_url"]
+        state = response.json()["state"]
+        while state in ("queued", "running"):
+            state = session.get(base_url + status_url, params={"wait": 20}).json()["state"]
+        results[state] = results.get(state, 0) + 1
+        results["job_ms"].append((time.perf_counter() - start) * 1000)
+
+
+def saturate(base_url: str, image_url: str, clients: int, duration_s: float, summary: multiprocessing.Queue) -> None:
+    """Keep the render queue full with concurrent clients for the duration and report their results."""
+    stop = threading.Event()
+    results = {"rejected": 0, "job_ms": []}
+    threads = [threading.Thread(target=submit_memes, args=(base_url, image_url, i, stop, results)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration_s)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    summary.put(results)
+
+
+def check_coalescing(base_url: str, image_url: str) -> None:
+    """Check that identical in-flight jobs share one job id."""
+    headers = {"Accept": "application/json"}
+    form = {"image_url": image_url, "body": "Coalesce me", "author": "Bench"}
+    first = requests.post(base_url + "/create", data=form, headers=headers).json()
+    second = requests.post(base_url + "/create", data=form, headers=headers).json()
+    assert first["job_id"] == second["job_id"], "identical in-flight jobs were not coalesced"
+    requests.get(base_url + first["status_url"], params={"wait": 20})
+
+
+def parse_args(argv: List[str] = sys.argv[1:]) -> argparse.Namespace:
+    """Parse input arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=48, help="Concurrent clients submitting memes")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per phase")
+    parser.add_argument("--delay", type=float, default=0.5, help="Seconds the stand-in server delays each image")
+    return parser.parse_args(argv)
+
+
+def main(args: argparse.Namespace) -> None:
+    """Serve the app and the stand-in image server, then time the random route idle and saturated."""
+    _SlowPhotoHandler.delay_s = args.delay
+    image_server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowPhotoHandler)
+    threading.Thread(target=image_server.serve_forever, daemon=True).start()
+    image_url = f"http://127.0.0.1:{image_server.server_address[1]}/photo.jpg"
+
+    port = multiprocessing.Value("i", 0)
+    app_process = multiprocessing.Process(target=serve_app, args=(port,), daemon=True)
+    app_process.start()
+    while not port.value:
+        time.sleep(0.05)
+    base_url = f"http://127.0.0.1:{port.value}"
+
+    try:
+        check_coalescing(base_url, image_url)
+        idle = time_random_route(base_url, args.duration)
+
+        summary = multiprocessing.Queue()
+        load_process = multiprocessing.Process(target=saturate, args=(base_url, image_url, args.clients, args.duration + 2.0, summary))
+        load_process.start()
+        time.sleep(1.0)
+        saturated = time_random_route(base_url, args.duration)
+        results = summary.get()
+        load_process.join()
+    finally:
+        app_process.terminate()
+        image_server.shutdown()
+
+    print("phase\trequests\tp50_ms\tp99_ms")
+    for phase, latencies in (("idle", idle), ("saturated", saturated)):
+        print(f"{phase}\t{len(latencies)}\t{statistics.median(latencies):.1f}\t{percentile(latencies, 99):.1f}")
+    job_ms = results.pop("job_ms")
+    print(f"create jobs: {results}; p50 {statistics.median(job_ms):.0f} ms, p99 {percentile(job_ms, 99):.0f} ms")
+
+
+if __name__ == "__main__":
+    main(parse_args())
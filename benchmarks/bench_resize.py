@@ -0,0 +1,82 @@
+"""Benchmark the MemeEngine resize stage on large synthetic photos.
+
+Compares the previous resize path (`Image.open` followed by `thumbnail`) with the
+reduced-resolution decode path used by `MemeEngine`. Each variant and photo runs in
+its own process so that the reported peak RSS belongs to that combination alone.
+
+Run from the repository root:
+    python3 -m benchmarks.bench_resize --sizes 4000x3000 6000x4000 --repeat 10
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+from PIL import Image
+
+from benchmarks.common import make_synthetic_photo, peak_rss_mb
+from meme_engine.image_utils import open_image_resized, resize_image_with_aspect_ratio_maintained
+from meme_engine.meme_engine import MAX_IMAGE_WIDTH_PX
+
+
+def _legacy_resize(image_path: str, width_px: int) -> Image.Image:
+    image = Image.open(image_path)
+    resize_image_with_aspect_ratio_maintained(image, width_px)
+    return image
+
+
+VARIANTS = {
+    "legacy": _legacy_resize,
+    "draft": open_image_resized,
+}
+
+
+def run_variant(variant: str, path: str, width_px: int, repeat: int) -> None:
+    """Resize the photo `repeat` times with one variant and print the mean latency and peak RSS."""
+    resize = VARIANTS[variant]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        resize(path, width_px).load()
+    mean_ms = (time.perf_counter() - start) / repeat * 1000
+    print(f"{os.path.basename(path)}\t{variant}\t{mean_ms:.1f}\t{peak_rss_mb():.1f}", flush=True)
+
+
+def parse_args(argv: List[str] = sys.argv[1:]) -> argparse.Namespace:
+    """Parse input arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=["4000x3000", "6000x4000"], help="Photo sizes as WIDTHxHEIGHT")
+    parser.add_argument("--width", type=int, default=MAX_IMAGE_WIDTH_PX, help="Target width in pixels")
+    parser.add_argument("--repeat", type=int, default=10, help="Resizes per photo")
+    parser.add_argument("--variant", choices=sorted(VARIANTS), help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(args: argparse.Namespace) -> None:
+    """Generate the photos and run each variant in a fresh interpreter."""
+    if args.variant:
+        run_variant(args.variant, args.path, args.width, args.repeat)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = []
+        for size in args.sizes:
+            width, height = (int(px) for px in size.split("x"))
+            for image_format, suffix in (("JPEG", ".jpg"), ("PNG", ".png")):
+                path = os.path.join(tmp_dir, f"{size}{suffix}")
+                make_synthetic_photo(path, width, height, image_format)
+                paths.append(path)
+
+        print("image\tvariant\tmean_ms\tpeak_rss_mb", flush=True)
+        for path in paths:
+            for variant in VARIANTS:
+                cmd = [sys.executable, "-m", "benchmarks.bench_resize", "--variant", variant, "--path", path,
+                       "--width", str(args.width), "--repeat", str(args.repeat)]
+                subprocess.run(cmd, check=True)
+
+
+if __name__ == "__main__":
+    main(parse_args())
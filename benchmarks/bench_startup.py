@@ -0,0 +1,91 @@
+"""Benchmark startup time of app.py and meme.py, and fail when it regresses.
+
+Every start runs in a fresh interpreter with `-X importtime`. Reports the median
+cumulative import time of `app` and `meme`, and the wall time of `create_app` from a
+prebuilt snapshot and from the quote files. Exits with status 1 if a median exceeds
+its threshold or if starting the app imported a heavy backend that only ingestion or
+`POST /create` needs, so it can gate CI.
+
+Run from the repository root:
+    python3 -m benchmarks.bench_startup --repeat 5 --max-import-ms 300 --max-create-ms 400
+"""
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import List, Tuple
+
+# Modules that must stay out of a started app until a request or an ingestion needs them.
+LAZY_MODULES = ("requests", "pandas", "numpy", "docx", "lxml", "xml.etree.ElementTree")
+
+_CREATE_APP = """
+import json, sys, time
+start = time.perf_counter()
+import app
+app.create_app(sys.argv[1] or None, warm_up=False)
+elapsed = time.perf_counter() - start
+print(json.dumps({"ms": elapsed * 1000, "loaded": [m for m in sys.argv[2:] if m in sys.modules]}))
+"""
+_IMPORT_TIME = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| (\S+)$")
+
+
+def import_ms(module: str) -> float:
+    """Return the cumulative import time of the module in a fresh interpreter in milliseconds."""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            check=True, capture_output=True, text=True).stderr
+    for line in stderr.splitlines():
+        match = _IMPORT_TIME.match(line)
+        if match and match.group(2) == module:
+            return int(match.group(1)) / 1000
+    raise RuntimeError(f"No import time reported for {module}")
+
+
+def create_app_ms(snapshot_dir: str) -> Tuple[float, List[str]]:
+    """Return the wall time of importing the app and creating it, and the lazy modules it loaded."""
+    stdout = subprocess.run([sys.executable, "-c", _CREATE_APP, snapshot_dir, *LAZY_MODULES],
+                            check=True, capture_output=True, text=True).stdout
+    result = json.loads(stdout.splitlines()[-1])
+    return result["ms"], result["loaded"]
+
+
+def parse_args(argv: List[str] = sys.argv[1:]) -> argparse.Namespace:
+    """Parse input arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Starts per measurement")
+    parser.add_argument("--max-import-ms", type=float, default=None, help="Fail if importing app or meme takes longer")
+    parser.add_argument("--max-create-ms", type=float, default=None, help="Fail if importing the app and creating it from a snapshot takes longer")
+    return parser.parse_args(argv)
+
+
+def main(args: argparse.Namespace) -> int:
+    """Print the startup measurements and return the exit status."""
+    failures = []
+    print("measurement\tmedian_ms")
+    for module in ("app", "meme"):
+        median = statistics.median(import_ms(module) for _ in range(args.repeat))
+        print(f"import {module}\t{median:.1f}")
+        if args.max_import_ms is not None and median > args.max_import_ms:
+            failures.append(f"importing {module} took {median:.1f} ms > {args.max_import_ms} ms")
+
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        subprocess.run([sys.executable, "snapshot.py", snapshot_dir], check=True, capture_output=True)
+        for name, directory in (("create_app snapshot", snapshot_dir), ("create_app quote files", "")):
+            runs = [create_app_ms(directory) for _ in range(args.repeat)]
+            median = statistics.median(ms for ms, _ in runs)
+            print(f"{name}\t{median:.1f}")
+            loaded = sorted({module for _, modules in runs for module in modules})
+            if directory and loaded:
+                failures.append(f"starting the app from a snapshot imported {', '.join(loaded)}")
+            if directory and args.max_create_ms is not None and median > args.max_create_ms:
+                failures.append(f"creating the app from a snapshot took {median:.1f} ms > {args.max_create_ms} ms")
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(parse_args()))
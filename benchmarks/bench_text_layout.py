@@ -0,0 +1,96 @@
+"""Benchmark caption layout time and overflow rate over the quote corpus.
+
+Every quote body and author of the corpus is laid out at a sweep of caption widths
+with the previous character-count heuristic and with the pixel-width layout engine,
+greedy and balanced. Reports the time per uncached layout, how often a line
+comes out wider than the caption width (overflow), and how much of the width the
+widest line fills on average.
+
+Run from the repository root:
+    python3 -m benchmarks.bench_text_layout --repeat 20
+"""
+import argparse
+import statistics
+import sys
+import textwrap
+import time
+from typing import Callable, List, Tuple
+
+from meme_engine.font_registry import font_registry
+from meme_engine.meme_engine import AUTHOR_FONT, AUTHOR_FONT_SIZE, BODY_FONT, BODY_FONT_SIZE
+from meme_engine.text_layout import BALANCED, GREEDY, layout_text
+from quote_engine.ingestor import Ingestor
+
+DEFAULT_CORPUS = "./_data/DogQuotes"
+WIDTHS = (120, 160, 200, 260, 333, 400, 500)
+
+Caption = Tuple[str, int, str]
+
+
+def load_captions(corpus: str) -> List[Caption]:
+    """Return the (font, font size, text) of every body and author caption in the corpus."""
+    captions = []
+    for result in Ingestor.parse_dir(corpus):
+        if result.error is not None:
+            print(f"skipped {result.path}: {result.error!r}", file=sys.stderr)
+        for quote in result.quotes:
+            captions.append((BODY_FONT, BODY_FONT_SIZE, f"\"{quote.body}\""))
+            captions.append((AUTHOR_FONT, AUTHOR_FONT_SIZE, f"- {quote.author}"))
+    return captions
+
+
+def legacy_layout(font: str, font_size: int, text: str, max_width: int) -> List[int]:
+    """Return the line widths of the previous layout, which guessed characters per line from the font size."""
+    max_char = int(max_width / font_size * 1.5)
+    image_font = font_registry.get(font, font_size)
+    # Lines were drawn with a one pixel stroke on both sides.
+    return [int(image_font.getlength(line)) + 2 for line in textwrap.wrap(text, width=max_char)]
+
+
+def engine_layout(strategy: str) -> Callable[[str, int, str, int], List[int]]:
+    """Return a layout function of the layout engine with the strategy, bypassing the layout cache.
+
+    Word widths stay measured across calls, as they do in a running engine.
+    """
+    def layout(font: str, font_size: int, text: str, max_width: int) -> List[int]:
+        layout_text.cache_clear()
+        return list(layout_text(font, font_size, text, max_width, strategy).line_widths)
+    return layout
+
+
+def measure(layout: Callable[[str, int, str, int], List[int]], captions: List[Caption], repeat: int) -> Tuple[float, float, float]:
+    """Return the median microseconds per layout, the overflow rate and the mean fill of the layout function."""
+    timings, overflows, fills = [], 0, []
+    for font, font_size, text in captions:
+        for width in WIDTHS:
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                line_widths = layout(font, font_size, text, width)
+                samples.append(time.perf_counter() - start)
+            timings.append(min(samples) * 1e6)
+            overflows += max(line_widths) > width
+            fills.append(min(max(line_widths), width) / width)
+    return statistics.median(timings), overflows / len(timings), statistics.mean(fills)
+
+
+def parse_args(argv: List[str] = sys.argv[1:]) -> argparse.Namespace:
+    """Parse input arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="Directory of quote files")
+    parser.add_argument("--repeat", type=int, default=20, help="Layouts per caption and width")
+    return parser.parse_args(argv)
+
+
+def main(args: argparse.Namespace) -> None:
+    """Lay out the corpus with every layout and print their measurements."""
+    captions = load_captions(args.corpus)
+    print(f"{len(captions)} captions x {len(WIDTHS)} widths")
+    print("layout\tus_per_layout\toverflow_rate\tmean_fill")
+    for name, layout in (("legacy", legacy_layout), ("greedy", engine_layout(GREEDY)), ("balanced", engine_layout(BALANCED))):
+        micros, overflow_rate, fill = measure(layout, captions, args.repeat)
+        print(f"{name}\t{micros:.1f}\t{overflow_rate:.1%}\t{fill:.1%}")
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,76 @@
+"""Benchmark rendering every caption at every width one meme at a time vs. with one multi-variant call.
+
+"separate" renders each variant with its own `render_bytes` call on an engine whose
+template cache keeps nothing, so every variant decodes and resizes the photo as a
+separate request would. "variants" renders them all with `render_variants`, which
+decodes once and resizes each smaller width from the next larger one; "sprite" and
+"animation" pack the same variants into a sprite sheet and into animated WebPs.
+
+Run from the repository root:
+    python3 -m benchmarks.bench_variants --size 4000x3000 --captions 4 --widths 1000 500 150
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, List
+
+from benchmarks.common import make_synthetic_photo
+from meme_engine.image_encoding import ImageEncoding
+from meme_engine.meme_engine import MemeEngine
+from meme_engine.template_cache import TemplateCache
+
+CAPTIONS = [("To bork or not to bork", "Bork"), ("He who smelt it...", "Stinky"), ("Chase the mailman", "Skittle"),
+            ("When in doubt, go shoe-shopping", "Mr. Paws"), ("Treats are a state of mind", "Rex"),
+            ("Every puddle is a bath", "Bella"), ("Sit. Stay. Nap.", "Biscuit"), ("The sofa is mine", "Duke")]
+
+
+def time_ms(render: Callable[[], object], repeat: int) -> float:
+    """Return the median milliseconds of a render."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def parse_args(argv: List[str] = sys.argv[1:]) -> argparse.Namespace:
+    """Parse input arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="4000x3000", help="Photo size as WIDTHxHEIGHT")
+    parser.add_argument("--captions", type=int, default=4, choices=range(1, len(CAPTIONS) + 1), metavar="N",
+                        help=f"Captions per width, up to {len(CAPTIONS)}")
+    parser.add_argument("--widths", nargs="+", type=int, default=[1000, 500, 150], help="Widths in pixels")
+    parser.add_argument("--repeat", type=int, default=5, help="Renders per method")
+    return parser.parse_args(argv)
+
+
+def main(args: argparse.Namespace) -> None:
+    """Render the variants of a synthetic photo with each method and print the median time."""
+    captions = CAPTIONS[:args.captions]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "photo.jpg")
+        width, height = (int(px) for px in args.size.split("x"))
+        make_synthetic_photo(path, width, height)
+        separate_engine = MemeEngine(tmp_dir, template_cache=TemplateCache(max_bytes=0))
+        engine = MemeEngine(tmp_dir, template_cache=TemplateCache(max_bytes=0))
+
+        methods = {
+            "separate": lambda: [separate_engine.render_bytes(path, body, author, width_px)
+                                 for width_px in args.widths for body, author in captions],
+            "variants": lambda: engine.render_variants(path, captions, args.widths),
+            "sprite": lambda: engine.render_sprite_sheet(path, captions, args.widths),
+            "animation": lambda: engine.render_animations(path, captions, args.widths, encoding=ImageEncoding("WEBP")),
+        }
+        print(f"{len(captions) * len(args.widths)} variants of a {args.size} photo")
+        print("method\tmedian_ms")
+        for name, render in methods.items():
+            render()
+            print(f"{name}\t{time_ms(render, args.repeat):.1f}", flush=True)
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,84 @@
+"""Provide helpers shared by the benchmarks."""
+import io
+import resource
+from typing import List, Optional, Tuple
+
+
+def peak_rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """Return the peak resident set size of a process in megabytes.
+
+    `ru_maxrss` survives `exec` on Linux, so the kernel's per-address-space high-water
+    mark is preferred where it is available.
+
+    :param pid: An integer id of the process to measure. Defaults to this process.
+    :return: A float, or None if the process is another one and its high-water mark cannot be read.
+    """
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if pid is not None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Return the q-th percentile of the samples by nearest rank."""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def make_photo_bytes(size: Tuple[int, int] = (1200, 900)) -> bytes:
+    """Return a synthetic, detailed JPEG photo of the size."""
+    # Imported here so that measuring peak RSS does not load Pillow.
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.effect_mandelbrot(size, (-2.0, -1.5, 1.0, 1.5), 64).convert("RGB").save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def make_synthetic_photo(path: str, width: int, height: int, image_format: str = "JPEG") -> None:
+    """Write a synthetic photo with enough detail to be representative to compress.
+
+    :param path: A String path of the photo to write.
+    :param width: An integer of the photo width in pixels.
+    :param height: An integer of the photo height in pixels.
+    :param image_format: A String of the Pillow format to save the photo as.
+    """
+    from PIL import Image
+
+    detail = Image.effect_mandelbrot((width, height), (-2.0, -1.5, 1.0, 1.5), 64)
+    noise = Image.effect_noise((width, height), 48)
+    Image.merge("RGB", (detail, noise, Image.linear_gradient("L").resize((width, height)))).save(path, image_format)
+
+
+def make_synthetic_animation(path: str, width: int, height: int, frames: int, frame_ms: int = 40) -> None:
+    """Write a synthetic animated GIF that pans across a detailed scene, so every frame changes.
+
+    The frames are written as they are drawn, so long animations are not held in memory.
+
+    :param path: A String path of the GIF to write.
+    :param width: An integer of the frame width in pixels.
+    :param height: An integer of the frame height in pixels.
+    :param frames: An integer number of frames.
+    :param frame_ms: An integer of the milliseconds each frame is shown for.
+    """
+    from PIL import Image, ImageDraw
+
+    from meme_engine.animation import GifWriter
+
+    scene_size = (width * 2, height)
+    detail = Image.effect_mandelbrot(scene_size, (-2.5, -1.0, 1.5, 1.0), 64)
+    noise = Image.effect_noise(scene_size, 32)
+    scene = Image.merge("RGB", (detail, noise, Image.linear_gradient("L").resize(scene_size)))
+    with open(path, "wb") as f, GifWriter(f) as writer:
+        for i in range(frames):
+            x = i * width // max(1, frames - 1)
+            frame = scene.crop((x, 0, x + width, height))
+            ball_x = i * 7 % width
+            ImageDraw.Draw(frame).ellipse((ball_x, height // 4, ball_x + height // 8, height // 4 + height // 8), fill=(220, 40, 40))
+            writer.write(frame, frame_ms)
@@ -0,0 +1,202 @@
+"""Provide reproducible synthetic corpora of quotes and photos for the benchmarks.
+
+Quotes are drawn from a seeded generator, so a corpus of a given size and seed has the
+same content in every format and on every machine. Every file is written once below a
+data directory and reused by later runs; its name carries the parameters it was made
+from, so changing them writes a new file rather than reusing a stale one.
+"""
+import gzip
+import os
+import random
+import shutil
+import zipfile
+from typing import Callable, Dict, Iterator, List, Tuple
+from xml.sax.saxutils import escape
+
+DEFAULT_SEED = 1234
+# Formats of the quote corpora, named by file extension, including compressed text.
+QUOTE_FORMATS = ("txt", "csv", "docx", "pdf", "txt.gz", "csv.zst")
+# Photo sizes from a VGA frame to a full-frame camera, keyed by their name in results.
+PHOTO_SIZES: Dict[str, Tuple[int, int]] = {
+    "0.3mp": (640, 480),
+    "2mp": (1600, 1200),
+    "8mp": (3264, 2448),
+    "12mp": (4000, 3000),
+    "24mp": (6000, 4000),
+}
+
+_WORDS = ("bork", "woof", "ball", "stick", "squirrel", "mailman", "treat", "nap", "walk", "bone", "sofa", "shoe",
+          "tail", "moon", "puddle", "cat", "garden", "dinner", "sock", "bath", "park", "leash", "friend", "snack",
+          "chase", "sniff", "dig", "fetch", "howl", "wag", "sleep", "dream", "never", "always", "when", "in", "doubt",
+          "the", "a", "of", "is", "my", "your", "to", "not", "good", "best", "big", "little", "happy", "muddy")
+_AUTHORS = tuple(f"{name} {n}" for n in range(1, 41) for name in ("Rex", "Bella", "Mr. Paws", "Skittle", "Bork"))
+_PDF_LINES_PER_PAGE = 60
+_COPY_BUFFER_BYTES = 1024 * 1024
+
+
+def iter_quotes(count: int, seed: int = DEFAULT_SEED) -> Iterator[Tuple[str, str]]:
+    """Generate (body, author) pairs of varied lengths that every ingestor parses without loss.
+
+    :param count: An integer number of quotes.
+    :param seed: An integer seed of the generator.
+    :return: An iterator of String tuples.
+    """
+    rng = random.Random(seed)
+    for _ in range(count):
+        body = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(3, 12)))
+        yield body[0].upper() + body[1:], rng.choice(_AUTHORS)
+
+
+def quote_corpus(data_dir: str, file_format: str, count: int, seed: int = DEFAULT_SEED) -> str:
+    """Return the path of a quote corpus, writing it first if it does not exist.
+
+    :param data_dir: A String path of the directory corpora are kept in.
+    :param file_format: A String format of `QUOTE_FORMATS`.
+    :param count: An integer number of quotes.
+    :param seed: An integer seed of the generator.
+    :return: A String path.
+    """
+    path = os.path.join(data_dir, f"quotes-{count}-{seed}.{file_format}")
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        _open_writer(file_format)(tmp_path, iter_quotes(count, seed))
+        os.replace(tmp_path, path)
+    return path
+
+
+def photo(data_dir: str, size: str) -> str:
+    """Return the path of a synthetic JPEG photo, writing it first if it does not exist.
+
+    :param data_dir: A String path of the directory photos are kept in.
+    :param size: A String size of `PHOTO_SIZES`.
+    :return: A String path.
+    """
+    # Imported here so that the quote benchmarks do not load Pillow.
+    from benchmarks.common import make_synthetic_photo
+
+    width, height = PHOTO_SIZES[size]
+    path = os.path.join(data_dir, "photos", f"photo-{width}x{height}.jpg")
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        make_synthetic_photo(tmp_path, width, height, "JPEG")
+        os.replace(tmp_path, path)
+    return path
+
+
+def _open_writer(file_format: str) -> Callable[[str, Iterator[Tuple[str, str]]], None]:
+    base, _, compression = file_format.partition(".")
+    write = _WRITERS[base]
+    if not compression:
+        return write
+    return lambda path, quotes: _write_compressed(path, quotes, write, compression)
+
+
+def _write_txt(path: str, quotes: Iterator[Tuple[str, str]]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(f"{body} - {author}\n" for body, author in quotes)
+
+
+def _write_csv(path: str, quotes: Iterator[Tuple[str, str]]) -> None:
+    import csv
+
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["body", "author"])
+        writer.writerows(quotes)
+
+
+def _write_docx(path: str, quotes: Iterator[Tuple[str, str]]) -> None:
+    namespace = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '</Types>'))
+        archive.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="word/document.xml" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+            '</Relationships>'))
+        # The document is streamed into the archive, so million-quote corpora are not held in memory.
+        with archive.open("word/document.xml", "w", force_zip64=True) as document:
+            document.write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                           f'<w:document xmlns:w="{namespace}"><w:body>'.encode("utf-8"))
+            for body, author in quotes:
+                document.write(f'<w:p><w:r><w:t>{escape(body)} - {escape(author)}</w:t></w:r></w:p>'.encode("utf-8"))
+            document.write(b'</w:body></w:document>')
+
+
+def _write_pdf(path: str, quotes: Iterator[Tuple[str, str]]) -> None:
+    # A minimal uncompressed PDF with one content stream of Helvetica text lines per page. Pages are
+    # written as the quotes are generated and the page tree last, since only then are its kids known.
+    offsets: Dict[int, int] = {}
+    with open(path, "wb") as f:
+        def write_object(number: int, content: bytes) -> None:
+            offsets[number] = f.tell()
+            f.write(f"{number} 0 obj\n".encode("ascii") + content + b"\nendobj\n")
+
+        def write_page(lines: List[str]) -> None:
+            number = 4 + 2 * len(kids)
+            kids.append(f"{number} 0 R")
+            write_object(number, f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                                 f"/Resources << /Font << /F1 3 0 R >> >> /Contents {number + 1} 0 R >>".encode("ascii"))
+            text = "".join(f"({_pdf_escape(line)}) '\n" for line in lines)
+            stream = f"BT\n/F1 9 Tf\n12 TL\n36 772 Td\n{text}ET".encode("latin-1")
+            write_object(number + 1, f"<< /Length {len(stream)} >>\nstream\n".encode("ascii") + stream + b"\nendstream")
+
+        f.write(b"%PDF-1.4\n")
+        write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        write_object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        kids: List[str] = []
+        lines = []
+        for body, author in quotes:
+            lines.append(f"{body} - {author}")
+            if len(lines) == _PDF_LINES_PER_PAGE:
+                write_page(lines)
+                lines = []
+        if lines or not kids:
+            write_page(lines)
+        write_object(2, f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode("ascii"))
+
+        xref = f.tell()
+        f.write(f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n".encode("ascii"))
+        f.writelines(f"{offsets[number]:010d} 00000 n \n".encode("ascii") for number in sorted(offsets))
+        f.write(f"trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("ascii"))
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _write_compressed(path: str, quotes: Iterator[Tuple[str, str]], write: Callable, compression: str) -> None:
+    plain_path = f"{path}.plain"
+    write(plain_path, quotes)
+    try:
+        with open(plain_path, "rb") as src:
+            if compression == "gz":
+                with gzip.open(path, "wb") as dst:
+                    shutil.copyfileobj(src, dst, _COPY_BUFFER_BYTES)
+            elif compression == "zst":
+                import zstandard
+
+                with open(path, "wb") as f, zstandard.ZstdCompressor().stream_writer(f) as dst:
+                    shutil.copyfileobj(src, dst, _COPY_BUFFER_BYTES)
+            else:
+                raise ValueError(f"Unknown compression \"{compression}\".")
+    finally:
+        os.remove(plain_path)
+
+
+_WRITERS: Dict[str, Callable[[str, Iterator[Tuple[str, str]]], None]] = {
+    "txt": _write_txt,
+    "csv": _write_csv,
+    "docx": _write_docx,
+    "pdf": _write_pdf,
+}
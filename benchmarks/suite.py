@@ -0,0 +1,384 @@
+"""Run the reproducible benchmark suite of the quote and meme engines and compare it with a baseline.
+
+The suite writes synthetic quote corpora of every supported format and synthetic photos
+(see `benchmarks.corpora`) once below the data directory, then measures:
+
+- ingest: `Ingestor.parse` throughput per format and corpus size;
+- render: `MemeEngine.make_meme` latency percentiles per photo size, decoding the photo
+  for every meme ("cold") and taking it from the template cache ("warm");
+- route: throughput and latency percentiles of the Flask routes under a local load
+  generator, with the app served by a threaded werkzeug server in a child process.
+
+Every case runs in a fresh interpreter, so the peak RSS it reports is its own; for
+routes it is the server's. Results are written as JSON. Given a baseline, which is the
+JSON of an earlier run, every metric is compared with it and the run exits non-zero if
+any regressed by more than the tolerance. Everything runs offline; the PDF cases need
+`pdftotext`, and are reported as errors without it.
+
+Run from the repository root:
+    python3 -m benchmarks.suite --output results.json
+    python3 -m benchmarks.suite --quick --baseline baseline.json --update-baseline
+"""
+import argparse
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from benchmarks import corpora
+from benchmarks.common import peak_rss_mb, percentile
+
+RESULTS_FORMAT_VERSION = 1
+DEFAULT_DATA_DIR = "./.cache/benchmarks"
+DEFAULT_OUTPUT = "./.cache/benchmarks/results.json"
+DEFAULT_QUOTE_COUNTS = (1_000, 100_000, 1_000_000)
+DEFAULT_TOLERANCE = 0.15
+KINDS = ("ingest", "render", "route")
+ROUTES = ("random", "render", "search")
+# Seconds a corpus is parsed for at least, however many times that takes.
+MIN_INGEST_S = 1.0
+# Quotes served by the app in the route cases.
+ROUTE_QUOTE_COUNT = 100_000
+# Whether a larger value of a compared metric is better; metrics not listed are reported but not compared.
+HIGHER_IS_BETTER = {
+    "quotes_per_s": True,
+    "mb_per_s": True,
+    "requests_per_s": True,
+    "p50_ms": False,
+    "p90_ms": False,
+    "p99_ms": False,
+    "peak_rss_mb": False,
+}
+
+
+def run_ingest(path: str, repeat: int) -> dict:
+    """Parse a quote corpus with `Ingestor.parse` and return the best of the repeated timings.
+
+    Small corpora are parsed again until `MIN_INGEST_S` has passed, so their best timing is stable.
+    """
+    from quote_engine.ingestor import Ingestor
+
+    seconds = []
+    while len(seconds) < repeat or sum(seconds) < MIN_INGEST_S:
+        start = time.perf_counter()
+        quotes = sum(1 for _ in Ingestor.parse(path))
+        seconds.append(time.perf_counter() - start)
+    best_s = min(seconds)
+    file_mb = os.path.getsize(path) / 1e6
+    return {"quotes": quotes, "file_mb": file_mb, "best_s": best_s, "quotes_per_s": quotes / best_s,
+            "mb_per_s": file_mb / best_s, "peak_rss_mb": peak_rss_mb()}
+
+
+def run_render(path: str, iterations: int, cold: bool, seed: int) -> dict:
+    """Make memes of distinct quotes from one photo with `MemeEngine.make_meme` and return the latency percentiles."""
+    from meme_engine.meme_engine import MemeEngine
+    from meme_engine.template_cache import TemplateCache
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        # A cache too small for any template decodes the photo for every meme.
+        engine = MemeEngine(output_dir, template_cache=TemplateCache(max_bytes=0) if cold else None)
+        quotes = corpora.iter_quotes(iterations + 1, seed)
+        # The first meme loads the fonts, and for warm renders caches the template.
+        engine.make_meme(path, *next(quotes))
+        latencies = []
+        for body, author in quotes:
+            start = time.perf_counter()
+            engine.make_meme(path, body, author)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return {"memes": len(latencies), **_latency_stats(latencies), "peak_rss_mb": peak_rss_mb()}
+
+
+def run_route(route: str, data_dir: str, clients: int, duration_s: float, seed: int) -> dict:
+    """Serve the app from a snapshot of the synthetic corpora and load one route with concurrent clients."""
+    from snapshot import Snapshot, load_images, load_quotes, save_snapshot
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        snapshot_dir = os.path.join(tmp_dir, "snapshot")
+        quotes_path = corpora.quote_corpus(data_dir, "txt", ROUTE_QUOTE_COUNT, seed)
+        images = load_images(os.path.join(data_dir, "photos"), os.path.join(tmp_dir, "images.json"))
+        save_snapshot(Snapshot(load_quotes([quotes_path]), images), snapshot_dir)
+        urls = _route_urls(route, [image.name for image in images], seed)
+
+        port = multiprocessing.Value("i", 0)
+        server = multiprocessing.Process(target=_serve_app, args=(snapshot_dir, os.path.join(tmp_dir, "static"), port),
+                                         daemon=True)
+        server.start()
+        try:
+            while not port.value:
+                if not server.is_alive():
+                    raise RuntimeError("The app server exited before it started serving.")
+                time.sleep(0.05)
+            base_url = f"http://127.0.0.1:{port.value}"
+            # Warm up every distinct request once, so the load measures the steady state.
+            _load(base_url, urls, 1, requests_per_client=len(urls))
+            start = time.perf_counter()
+            latencies, errors = _load(base_url, urls, clients, duration_s)
+            elapsed_s = time.perf_counter() - start
+            server_rss_mb = peak_rss_mb(server.pid)
+        finally:
+            server.terminate()
+            server.join()
+    return {"requests": len(latencies), "errors": errors, "requests_per_s": len(latencies) / elapsed_s,
+            **_latency_stats(latencies), "peak_rss_mb": server_rss_mb}
+
+
+CASES: Dict[str, Callable[..., dict]] = {
+    "ingest": run_ingest,
+    "render": run_render,
+    "route": run_route,
+}
+
+
+def _latency_stats(latencies: List[float]) -> dict:
+    return {"mean_ms": statistics.fmean(latencies), "p50_ms": percentile(latencies, 50),
+            "p90_ms": percentile(latencies, 90), "p99_ms": percentile(latencies, 99), "max_ms": max(latencies)}
+
+
+def _route_urls(route: str, image_names: List[str], seed: int) -> List[str]:
+    if route == "random":
+        return ["/"]
+    quotes = list(corpora.iter_quotes(64, seed))
+    if route == "render":
+        return [f"/meme.jpg?{urlencode({'image': image_names[i % len(image_names)], 'body': body, 'author': author})}"
+                for i, (body, author) in enumerate(quotes)]
+    if route == "search":
+        # Single terms, prefixes and two-term queries drawn from the quotes' own words.
+        queries = [body.split()[1] for body, _ in quotes[:32]] + [body.split()[2][:2] + "*" for body, _ in quotes[32:48]]
+        queries += [" ".join(body.split()[1:3]) for body, _ in quotes[48:]]
+        return [f"/search?{urlencode({'q': query})}" for query in queries]
+    raise ValueError(f"Unknown route \"{route}\".")
+
+
+def _serve_app(snapshot_dir: str, output_dir: str, port: multiprocessing.Value) -> None:
+    from werkzeug.serving import make_server
+
+    import app
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app.create_app(snapshot_dir, output_dir, image_refresh_s=None), threaded=True)
+    port.value = server.server_port
+    server.serve_forever()
+
+
+def _load(base_url: str, urls: List[str], clients: int, duration_s: Optional[float] = None,
+          requests_per_client: Optional[int] = None) -> Tuple[List[float], int]:
+    """Request the URLs round robin from concurrent clients and return the latencies in milliseconds and the error count.
+
+    Each client stops after the duration, or after its number of requests if one is given.
+    """
+    import requests
+
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration_s if duration_s is not None else None
+
+    def client(offset: int) -> None:
+        session = requests.Session()
+        n = 0
+        while (deadline is None or time.monotonic() < deadline) and (requests_per_client is None or n < requests_per_client):
+            url = base_url + urls[(offset + n) % len(urls)]
+            n += 1
+            start = time.perf_counter()
+            ok = session.get(url).ok
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with lock:
+                if ok:
+                    latencies.append(elapsed_ms)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=client, args=(i * len(urls) // clients,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0]
+
+
+def plan_cases(args: argparse.Namespace) -> List[dict]:
+    """Return the cases selected by the arguments, each a dict of its name, kind and parameters."""
+    cases = []
+    if "ingest" in args.only:
+        for count in args.quotes:
+            for file_format in args.formats:
+                cases.append({"name": f"ingest/{file_format}/{count}", "kind": "ingest",
+                              "params": {"path": corpora.quote_corpus(args.data_dir, file_format, count, args.seed),
+                                         "repeat": args.repeat}})
+    if "render" in args.only or "route" in args.only:
+        # The route cases serve every generated photo, so generate them for either kind.
+        photos = {size: corpora.photo(args.data_dir, size) for size in args.photos}
+    if "render" in args.only:
+        for size, path in photos.items():
+            for mode in ("cold", "warm"):
+                cases.append({"name": f"render/{size}/{mode}", "kind": "render",
+                              "params": {"path": path, "iterations": args.iterations, "cold": mode == "cold",
+                                         "seed": args.seed}})
+    if "route" in args.only:
+        for route in args.routes:
+            cases.append({"name": f"route/{route}", "kind": "route",
+                          "params": {"route": route, "data_dir": args.data_dir, "clients": args.clients,
+                                     "duration_s": args.duration, "seed": args.seed}})
+    return cases
+
+
+def run_case(case: dict) -> dict:
+    """Run a case in a fresh interpreter and return its metrics, or its error."""
+    cmd = [sys.executable, "-m", "benchmarks.suite", "--case", json.dumps(case)]
+    process = subprocess.run(cmd, capture_output=True, text=True)
+    if process.returncode != 0:
+        lines = process.stderr.strip().splitlines()
+        return {"error": lines[-1] if lines else f"exit code {process.returncode}"}
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def environment() -> dict:
+    """Describe the interpreter, machine and revision the results were measured on."""
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        pillow = version("Pillow")
+    except PackageNotFoundError:
+        pillow = None
+    try:
+        revision = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {"python": platform.python_version(), "platform": platform.platform(), "machine": platform.machine(),
+            "cpu_count": os.cpu_count(), "pillow": pillow, "revision": revision}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[Tuple[str, str, float, float, float, bool]]:
+    """Compare every metric of the results with the baseline.
+
+    :param results: A dict of results as written by this suite.
+    :param baseline: A dict of baseline results as written by this suite.
+    :param tolerance: A float of the relative change beyond which a metric counts as changed.
+    :return: A list of (case, metric, baseline, current, relative change, regressed) tuples of the metrics
+        that changed by more than the tolerance, better or worse.
+    """
+    baseline_cases = {case["name"]: case["metrics"] for case in baseline.get("cases", ())}
+    changes = []
+    for case in results["cases"]:
+        before = baseline_cases.get(case["name"], {})
+        for metric, higher_is_better in HIGHER_IS_BETTER.items():
+            old, new = before.get(metric), case["metrics"].get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if abs(change) > tolerance:
+                changes.append((case["name"], metric, old, new, change, (change < 0) == higher_is_better))
+    return changes
+
+
+def _write_json(path: str, data: dict) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def _format_metric(metrics: dict, name: str) -> str:
+    value = metrics.get(name)
+    return "-" if value is None else f"{value:.1f}"
+
+
+def parse_args(argv: List[str] = sys.argv[1:]) -> argparse.Namespace:
+    """Parse input arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=KINDS, default=list(KINDS), help="Kinds of cases to run")
+    parser.add_argument("--quotes", nargs="+", type=int, default=list(DEFAULT_QUOTE_COUNTS), help="Sizes of the quote corpora")
+    parser.add_argument("--formats", nargs="+", choices=corpora.QUOTE_FORMATS, default=list(corpora.QUOTE_FORMATS),
+                        help="Formats of the quote corpora")
+    parser.add_argument("--photos", nargs="+", choices=list(corpora.PHOTO_SIZES), default=list(corpora.PHOTO_SIZES),
+                        help="Sizes of the synthetic photos")
+    parser.add_argument("--routes", nargs="+", choices=ROUTES, default=list(ROUTES), help="Flask routes to load")
+    parser.add_argument("--repeat", type=int, default=3, help="Parses per corpus, of which the best is reported")
+    parser.add_argument("--iterations", type=int, default=50, help="Memes per photo and mode")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent clients loading a route")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per route")
+    parser.add_argument("--seed", type=int, default=corpora.DEFAULT_SEED, help="Seed of the synthetic quotes")
+    parser.add_argument("--quick", action="store_true",
+                        help="Run a smoke-sized suite: 1k and 100k quotes, photos up to 2 MP, 10 memes and 2 s per route")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="Directory the synthetic corpora are kept in")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Path of the JSON results to write")
+    parser.add_argument("--baseline", help="Path of the JSON results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Relative change of a metric beyond which it counts as a regression or improvement")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results to the baseline path as well")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.quotes = [count for count in args.quotes if count <= 100_000]
+        args.photos = [size for size in args.photos if corpora.PHOTO_SIZES[size][0] * corpora.PHOTO_SIZES[size][1] <= 2_000_000]
+        args.iterations = min(args.iterations, 10)
+        args.duration = min(args.duration, 2.0)
+    if args.update_baseline and not args.baseline:
+        parser.error("--update-baseline requires --baseline")
+    return args
+
+
+def main(args: argparse.Namespace) -> int:
+    """Run the cases, write the results, compare them with the baseline and return the exit status."""
+    if args.case:
+        case = json.loads(args.case)
+        print(json.dumps(CASES[case["kind"]](**case["params"])))
+        return 0
+
+    print("Writing the synthetic corpora...", file=sys.stderr, flush=True)
+    cases = plan_cases(args)
+    results = {"version": RESULTS_FORMAT_VERSION,
+               "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+               "environment": environment(), "cases": []}
+    print("case\tthroughput\tp50_ms\tp99_ms\tpeak_rss_mb", flush=True)
+    for case in cases:
+        metrics = run_case(case)
+        results["cases"].append({"name": case["name"], "kind": case["kind"],
+                                 "params": {k: v for k, v in case["params"].items() if k not in ("path", "data_dir")},
+                                 "metrics": metrics})
+        if "error" in metrics:
+            print(f"{case['name']}\terror: {metrics['error']}", flush=True)
+            continue
+        throughput = metrics.get("quotes_per_s", metrics.get("requests_per_s"))
+        print(f"{case['name']}\t{'-' if throughput is None else f'{throughput:.0f}'}\t{_format_metric(metrics, 'p50_ms')}\t"
+              f"{_format_metric(metrics, 'p99_ms')}\t{_format_metric(metrics, 'peak_rss_mb')}", flush=True)
+    _write_json(args.output, results)
+    print(f"Results written to {args.output}")
+
+    status = 0
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("environment", {}).get("platform") != results["environment"]["platform"]:
+            print("Note: the baseline was measured on a different platform.")
+        changes = compare(results, baseline, args.tolerance)
+        print("case\tmetric\tbaseline\tcurrent\tchange")
+        for name, metric, old, new, change, regressed in changes:
+            print(f"{name}\t{metric}\t{old:.1f}\t{new:.1f}\t{change:+.0%}{' REGRESSION' if regressed else ''}")
+        regressions = sum(1 for change in changes if change[-1])
+        print(f"{regressions} regressions and {len(changes) - regressions} improvements beyond {args.tolerance:.0%}")
+        status = 1 if regressions else 0
+    elif args.baseline:
+        print(f"No baseline at {args.baseline} to compare with.")
+    if args.update_baseline:
+        _write_json(args.baseline, results)
+        print(f"Baseline written to {args.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main(parse_args()))
@@ -1,49 +1,167 @@
-"""Provide meme generation tools."""
+"""Provide meme generation tools.
+
+The meme engine and the quote parsers are imported only once a meme is generated, so
+`--help` and argument errors return immediately.
+"""
 import argparse
+import itertools
+import json
 import os
 import random
 import sys
-from typing import List
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional
 
 from quote_engine.quote_model import QuoteModel
-from quote_engine.ingestor import Ingestor
-from meme_engine.meme_engine import MemeEngine
+from quote_engine.quote_store import QuoteStore
+from quote_engine.search_index import SearchIndex
+import snapshot
+
+if TYPE_CHECKING:
+    from meme_engine.image_index import ImageIndex
+    from meme_engine.meme_engine import BatchResult
+
+QUOTE_FILES = snapshot.QUOTE_FILES
+IMAGES_PATH = snapshot.IMAGES_PATH
+OUTPUT_DIR = "./tmp"
+
+
+def load_quotes(snapshot_dir: Optional[str] = None) -> QuoteStore:
+    """Load the quotes from a snapshot, or else from all the quote files, reusing the parsed quotes cached by earlier runs."""
+    if snapshot_dir:
+        return snapshot.load_snapshot(snapshot_dir).quotes
+    return snapshot.load_quotes(QUOTE_FILES)
+
+
+def load_images(snapshot_dir: Optional[str] = None) -> "ImageIndex":
+    """Catalog the images to pick from at random, or load their catalog from a snapshot if one is supplied."""
+    if snapshot_dir:
+        return snapshot.load_snapshot(snapshot_dir).images
+    return snapshot.load_images(IMAGES_PATH)
+
+
+def find_quote(search_index: SearchIndex, query: str, author: Optional[str] = None) -> QuoteModel:
+    """Pick one of the best matches of a search query at random.
+
+    :param search_index: A SearchIndex over the quotes to search.
+    :param query: A String of whitespace-separated terms; a term ending in `*` is a prefix.
+    :param author: A String of the exact author to restrict the search to, or None for any author.
+    :return: A QuoteModel matching the query.
+    """
+    hits = search_index.search(query, author=author)
+    if not hits:
+        raise Exception(f'No quote matches the query "{query}"')
+    return random.choice(hits).quote
+
+
+def generate_meme(path=None, body=None, author=None, query=None, snapshot_dir=None, seed=None):
+    """Generate a meme given an path and a quote, or a search query for the quote, placing the caption by the seed."""
+    from meme_engine.meme_engine import MemeEngine
 
-def generate_meme(path=None, body=None, author=None):
-    """Generate a meme given an path and a quote."""
     img = None
     quote = None
 
     if path is None:
-        images = "./_data/photos/dog/"
-        imgs = []
-        for root, dirs, files in os.walk(images):
-            imgs = [os.path.join(root, name) for name in files]
-
-        img = random.choice(imgs)
+        img = load_images(snapshot_dir).random_image().path
     else:
         img = path
 
-    if body is None:
-        quote_files = ['./_data/DogQuotes/DogQuotesTXT.txt',
-                       './_data/DogQuotes/DogQuotesDOCX.docx',
-                       './_data/DogQuotes/DogQuotesPDF.pdf',
-                       './_data/DogQuotes/DogQuotesCSV.csv']
-        quotes = []
-        for f in quote_files:
-            quotes.extend(Ingestor.parse(f))
-
-        quote = random.choice(quotes)
+    if body is None and query is not None:
+        quote = find_quote(SearchIndex(load_quotes(snapshot_dir)), query, author)
+    elif body is None:
+        quote = load_quotes(snapshot_dir).random_quote()
     else:
         if author is None:
             raise Exception('Author Required if Body is Used')
         quote = QuoteModel(body, author)
 
-    meme = MemeEngine('./tmp')
-    path = meme.make_meme(img, quote.body, quote.author)
+    meme = MemeEngine(OUTPUT_DIR)
+    path = meme.make_meme(img, quote.body, quote.author, seed=seed)
     return path
 
 
+def generate_memes(
+        job_specs: Iterable[Dict[str, str]],
+        processes: Optional[int] = None,
+        snapshot_dir: Optional[str] = None,
+    ) -> Iterator["BatchResult"]:
+    """Generate many memes in parallel and yield their results as they finish.
+
+    Quote files are parsed and the image catalog is loaded at most once per batch.
+    A meme that fails is yielded with its error instead of stopping the batch.
+
+    :param job_specs: An iterable of dicts with optional "path", "body", "author", "query" and "seed" keys,
+        which are filled in like the arguments of `generate_meme`.
+    :param processes: An integer number of worker processes. Defaults to the number of CPUs.
+    :param snapshot_dir: A String path of a snapshot directory to load the quotes and images from.
+    :return: An iterator of BatchResult with the path of each produced meme or its error, in completion order.
+    """
+    from meme_engine.meme_engine import MemeEngine, MemeJob
+
+    images: Optional["ImageIndex"] = None
+    quotes: Optional[QuoteStore] = None
+    search_index: Optional[SearchIndex] = None
+
+    def make_jobs() -> Iterator["MemeJob"]:
+        nonlocal images, quotes, search_index
+        for spec in job_specs:
+            img = spec.get("path")
+            if img is None:
+                images = images if images is not None else load_images(snapshot_dir)
+                img = images.random_image().path
+
+            if spec.get("body") is None:
+                quotes = quotes if quotes is not None else load_quotes(snapshot_dir)
+                if spec.get("query") is not None:
+                    search_index = search_index if search_index is not None else SearchIndex(quotes)
+                    quote = find_quote(search_index, spec["query"], spec.get("author"))
+                else:
+                    quote = quotes.random_quote()
+            else:
+                if spec.get("author") is None:
+                    raise Exception('Author Required if Body is Used')
+                quote = QuoteModel(spec["body"], spec["author"])
+            yield MemeJob(img, quote.body, quote.author, seed=spec.get("seed"))
+
+    # Keep every meme of the batch; a capped store would delete earlier outputs.
+    meme = MemeEngine(OUTPUT_DIR, max_entries=None)
+    yield from meme.make_memes(make_jobs(), processes=processes)
+
+
+def read_jobs_file(jobs_file: str) -> Iterator[Dict[str, str]]:
+    """Read job specs from a JSON Lines file with optional "path", "body", "author", "query" and "seed" keys per line."""
+    with open(jobs_file, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def run_profiled(run: Callable[[], None], profile_output: Optional[str] = None) -> None:
+    """Run a function with instrumentation enabled and print the time spent in each stage to stderr.
+
+    :param run: A function to run.
+    :param profile_output: A String path to also write a cProfile trace of the run to, which
+        `python -m pstats`, snakeviz or flameprof read; None to not profile.
+    """
+    from telemetry import metrics
+
+    metrics.enable()
+    profiler = None
+    if profile_output is not None:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        run()
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_output)
+        for name, labels, description in metrics.registry.summary():
+            print(f"{name}{labels}\t{description}", file=sys.stderr)
+        if profile_output is not None:
+            print(f"Wrote the cProfile trace to \"{profile_output}\".", file=sys.stderr)
+
+
 def parse_args(argv: List[str] = sys.argv[1:]) -> argparse.Namespace:
     """Parse input arguments."""
     parser = argparse.ArgumentParser()
@@ -65,11 +183,94 @@ def parse_args(argv: List[str] = sys.argv[1:]) -> argparse.Namespace:
         "--author",
         type=str,
         required=False,
-        help="Quote author to add to the image",
+        help="Quote author to add to the image, or to restrict --query to",
+    )
+
+    parser.add_argument(
+        "--query",
+        type=str,
+        required=False,
+        help="Search terms to pick the quote by when no --body is supplied, a term ending in * matches as a prefix",
+    )
+
+    parser.add_argument(
+        "--seed",
+        type=int,
+        required=False,
+        help="Seed of the caption placement; the same seed and arguments give the same meme",
+    )
+
+    batch = parser.add_mutually_exclusive_group()
+    batch.add_argument(
+        "--batch",
+        type=int,
+        required=False,
+        help="Number of memes to generate in parallel, using --path, --body, --author and --query for each if supplied",
+    )
+
+    batch.add_argument(
+        "--jobs-file",
+        type=str,
+        required=False,
+        help="Path to a JSON Lines file of memes to generate in parallel, "
+             "with optional \"path\", \"body\", \"author\", \"query\" and \"seed\" keys per line",
+    )
+
+    parser.add_argument(
+        "--processes",
+        type=int,
+        required=False,
+        help="Number of worker processes for --batch and --jobs-file, defaults to the number of CPUs",
+    )
+
+    parser.add_argument(
+        "--snapshot",
+        type=str,
+        required=False,
+        default=os.environ.get("MEME_SNAPSHOT"),
+        help="Directory of a snapshot built by snapshot.py to load quotes and images from, defaults to $MEME_SNAPSHOT",
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print the time spent in each render and ingestion stage, and cache and byte counts, to stderr; "
+             "with --batch and --jobs-file the renders run in worker processes and are not included",
+    )
+
+    parser.add_argument(
+        "--profile-output",
+        type=str,
+        required=False,
+        help="Path to write a cProfile trace of the run to, for pstats, snakeviz or flameprof; implies --profile",
     )
     return parser.parse_args(argv)
 
 
+def main(args: argparse.Namespace) -> None:
+    """Generate the memes the arguments describe and print their paths."""
+    if args.batch is not None or args.jobs_file is not None:
+        if args.jobs_file is not None:
+            job_specs = read_jobs_file(args.jobs_file)
+        else:
+            job_specs = itertools.repeat(
+                {"path": args.path, "body": args.body, "author": args.author, "query": args.query, "seed": args.seed}, args.batch)
+        failed = 0
+        for result in generate_memes(job_specs, processes=args.processes, snapshot_dir=args.snapshot):
+            if result.error is not None:
+                failed += 1
+                print(f"Skipped meme of {result.job.image_path}: {result.error}", file=sys.stderr)
+            else:
+                print("Generated meme image locates at: " + result.path)
+        if failed:
+            sys.exit(f"{failed} memes could not be generated.")
+    else:
+        print("Generated meme image locates at: " + generate_meme(args.path, args.body, args.author, args.query, args.snapshot, args.seed))
+
+
 if __name__ == "__main__":
     args = parse_args()
-    print("Generated meme image locates at: " + generate_meme(args.path, args.body, args.author))
+    if args.profile or args.profile_output:
+        run_profiled(lambda: main(args), args.profile_output)
+    else:
+        main(args)
@@ -0,0 +1,184 @@
+"""Provide streaming of animated images through the resize and caption stages a frame at a time.
+
+`open_animation` opens an animated GIF, WebP or PNG and rejects it before any frame is
+decoded if it exceeds the frame-count or pixel budget of 'AnimationLimits'.
+`iter_frames_resized` then decodes, flattens and resizes one frame at a time, and
+'GifWriter' quantizes and writes each frame to the output file as it arrives, so a
+render holds a constant number of frames whatever the length of the animation.
+
+Every frame is mapped to the palette computed from the first one, which is built
+with the caption already on it, so the caption keeps its colors and the file needs
+a single global color table. Only the region that changed since the previous frame
+is written, and identical frames are merged into one.
+"""
+from types import TracebackType
+from typing import BinaryIO, Iterator, NamedTuple, Optional, Tuple, Type, Union
+
+from PIL import GifImagePlugin, Image, ImageChops, ImageSequence
+
+from telemetry import metrics
+
+from .exception import AnimationTooLarge
+from .image_utils import resize_image_with_aspect_ratio_maintained
+
+# Formats whose extra frames are played as an animation; others with several frames, such as the
+# stereo pairs of MPO photos or the pages of a TIFF, are rendered from their first frame.
+ANIMATED_FORMATS = ("GIF", "WEBP", "PNG")
+MAX_ANIMATION_FRAMES = 600
+# Source pixels decoded across all frames, e.g. 600 frames of 640x640.
+MAX_ANIMATION_PIXELS = 256 * 1024 * 1024
+# Milliseconds a frame without a duration of its own is shown for.
+DEFAULT_FRAME_MS = 100
+# Colors of the palette every frame is mapped to.
+ANIMATION_COLORS = 256
+# Frames are left in place and each delta frame is drawn over them.
+_DISPOSAL_KEEP = 1
+
+
+class AnimationLimits(NamedTuple):
+    """The budgets an animated image must fit in to be rendered, checked before any frame is decoded."""
+
+    max_frames: int = MAX_ANIMATION_FRAMES
+    max_pixels: int = MAX_ANIMATION_PIXELS
+
+
+DEFAULT_ANIMATION_LIMITS = AnimationLimits()
+
+
+def is_animated(image_path: Union[str, BinaryIO]) -> bool:
+    """Return whether an image is an animation of more than one frame, reading only its headers.
+
+    Only the formats in `ANIMATED_FORMATS` are animations.
+
+    :param image_path: A String path of the image file, or a seekable binary file-like object of its content,
+        whose position is left unchanged.
+    :return: A boolean.
+    """
+    position = None if isinstance(image_path, str) else image_path.tell()
+    try:
+        with Image.open(image_path) as image:
+            return image.format in ANIMATED_FORMATS and getattr(image, "is_animated", False)
+    finally:
+        if position is not None:
+            image_path.seek(position)
+
+
+def open_animation(image_path: Union[str, BinaryIO], limits: AnimationLimits = DEFAULT_ANIMATION_LIMITS) -> Image.Image:
+    """Open an animated image after checking it against the limits.
+
+    The frames are counted from their headers, without decoding them.
+
+    :param image_path: A String path of the image file, or a binary file-like object of its content.
+    :param limits: An AnimationLimits of the largest animation to accept.
+    :return: An unloaded `Image.Image` positioned at its first frame, which the caller closes.
+    :raises AnimationTooLarge: If the image has more frames or pixels than the limits allow.
+    """
+    with metrics.timer("meme_stage_seconds", stage="open"):
+        image = Image.open(image_path)
+        n_frames = getattr(image, "n_frames", 1)
+    pixels = n_frames * image.size[0] * image.size[1]
+    if n_frames > limits.max_frames:
+        image.close()
+        raise AnimationTooLarge(f"The animation has {n_frames} frames, more than the limit of {limits.max_frames}.")
+    if pixels > limits.max_pixels:
+        image.close()
+        raise AnimationTooLarge(f"The animation has {pixels} pixels across its frames, more than the limit of {limits.max_pixels}.")
+    return image
+
+
+def iter_frames_resized(image: Image.Image, max_width_px: int) -> Iterator[Tuple[Image.Image, int]]:
+    """Decode the frames of an animation one at a time and yield each resized to the maximum width as an RGB image.
+
+    Transparent pixels are flattened onto the color the decoder gives them.
+
+    :param image: An `Image.Image` as returned by `open_animation`.
+    :param max_width_px: An integer of maximum frame width in pixels; smaller frames are not enlarged.
+    :return: An iterator of (RGB `Image.Image` owned by the caller, integer milliseconds it is shown for) tuples.
+    """
+    for frame in ImageSequence.Iterator(image):
+        with metrics.timer("meme_stage_seconds", stage="decode"):
+            # Converting copies the frame, so seeking to the next one leaves it intact.
+            rgb = frame.convert("RGB")
+        metrics.count("meme_decoded_bytes_total", len(frame.getbands()) * frame.size[0] * frame.size[1])
+        with metrics.timer("meme_stage_seconds", stage="resize"):
+            resize_image_with_aspect_ratio_maintained(rgb, max_width_px)
+        yield rgb, frame.info.get("duration") or DEFAULT_FRAME_MS
+
+
+class GifWriter:
+    """Write an animated GIF to a binary file one frame at a time."""
+
+    frames: int
+
+    def __init__(self, fp: BinaryIO, loop: Optional[int] = 0) -> None:
+        """Construct a new `GifWriter`; use it as a context manager, or call `close` after the last frame.
+
+        At most two frames are held at a time: the previous frame, to find what changed, and the
+        region of the last frame, until the next one shows whether it is a duplicate.
+
+        :param fp: A binary file-like object to write to.
+        :param loop: An integer number of times the animation repeats, 0 forever, or None to play it once.
+        """
+        self.frames = 0
+        self._fp = fp
+        self._loop = loop
+        self._palette: Optional[Image.Image] = None
+        self._previous: Optional[Image.Image] = None
+        self._pending: Optional[Tuple[Image.Image, Tuple[int, int], int]] = None
+
+    def write(self, frame: Image.Image, duration_ms: int) -> None:
+        """Quantize a frame and write it, or extend the previous frame if they are identical.
+
+        :param frame: An RGB `Image.Image` of the size of the first frame.
+        :param duration_ms: An integer of the milliseconds the frame is shown for.
+        """
+        with metrics.timer("meme_stage_seconds", stage="quantize"):
+            if self._palette is None:
+                indexed = frame.quantize(colors=ANIMATION_COLORS)
+            else:
+                # Not dithered, so the unchanged regions of consecutive frames map to the same indexes.
+                indexed = frame.quantize(palette=self._palette, dither=Image.Dither.NONE)
+        self.frames += 1
+
+        if self._previous is None:
+            self._palette = indexed
+            for block in GifImagePlugin.getheader(indexed, info={"loop": self._loop})[0]:
+                self._fp.write(block)
+            self._pending = (indexed, (0, 0), duration_ms)
+        else:
+            bbox = ImageChops.subtract_modulo(indexed, self._previous).getbbox()
+            if bbox is None:
+                region, offset, pending_ms = self._pending
+                self._pending = (region, offset, pending_ms + duration_ms)
+                return
+            self._flush()
+            self._pending = (indexed.crop(bbox), bbox[:2], duration_ms)
+        self._previous = indexed
+
+    def close(self) -> None:
+        """Write the last frame and the end of the file; the file itself is left open."""
+        if self._pending is None:
+            raise ValueError("An animated GIF needs at least one frame.")
+        self._flush()
+        self._fp.write(b";")
+
+    def __enter__(self) -> "GifWriter":
+        """Return the writer."""
+        return self
+
+    def __exit__(
+            self,
+            exc_type: Optional[Type[BaseException]],
+            exc_value: Optional[BaseException],
+            traceback: Optional[TracebackType],
+        ) -> None:
+        """Finish the file unless the block raised, in which case it is left incomplete."""
+        if exc_type is None:
+            self.close()
+
+    def _flush(self) -> None:
+        region, offset, duration_ms = self._pending
+        self._pending = None
+        with metrics.timer("meme_stage_seconds", stage="encode"):
+            for block in GifImagePlugin.getdata(region, offset, duration=duration_ms, disposal=_DISPOSAL_KEEP):
+                self._fp.write(block)
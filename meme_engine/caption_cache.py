@@ -0,0 +1,115 @@
+"""Provide an in-memory cache of pre-rendered caption layers.
+
+'CaptionCache' rasterizes each laid-out quote caption once into a transparent RGBA
+layer, so a render composites the cached layer onto the photo instead of drawing the
+stroked glyphs again. A layer does not depend on the photo or on where the caption
+is placed, so it is reused across photos and positions.
+"""
+import threading
+from collections import OrderedDict
+from typing import Hashable, Tuple
+
+from PIL import Image, ImageDraw
+
+from telemetry import metrics
+
+from .text_layout import TextLayout
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+STROKE_FILL = (255, 255, 255)
+
+
+class CaptionCache:
+    """A thread-safe LRU cache of RGBA caption layers, bounded by memory."""
+
+    max_bytes: int
+    hits: int
+    misses: int
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        """Construct a new `CaptionCache`.
+
+        :param max_bytes: An integer cap on the total size of cached layer pixels in bytes.
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._layers: "OrderedDict[Hashable, Image.Image]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(
+            self,
+            body: TextLayout,
+            body_fill: Tuple[int, int, int],
+            author: TextLayout,
+            author_fill: Tuple[int, int, int],
+            author_offset: Tuple[int, int],
+            stroke_fill: Tuple[int, int, int] = STROKE_FILL,
+        ) -> Image.Image:
+        """Return the RGBA layer of a quote caption, rendering it on a miss.
+
+        The returned layer is shared and must not be modified.
+
+        :param body: A TextLayout of the quote body, drawn at the top-left corner of the layer.
+        :param body_fill: A tuple of the RGB color of the quote body.
+        :param author: A TextLayout of the quote author.
+        :param author_fill: A tuple of the RGB color of the quote author.
+        :param author_offset: A tuple of two integers of the author's top-left corner in the layer.
+        :param stroke_fill: A tuple of the RGB color of the text outline. Defaults to `STROKE_FILL`.
+        :return: An RGBA `Image.Image` as large as the caption's bounding box.
+        """
+        key = (body, body_fill, author, author_fill, author_offset, stroke_fill)
+        with self._lock:
+            layer = self._layers.get(key)
+            if layer is not None:
+                self._layers.move_to_end(key)
+                self.hits += 1
+                metrics.count("meme_cache_requests_total", cache="caption", result="hit")
+                return layer
+            self.misses += 1
+        metrics.count("meme_cache_requests_total", cache="caption", result="miss")
+
+        with metrics.timer("meme_stage_seconds", stage="caption_raster"):
+            layer = _render_layer(body, body_fill, author, author_fill, author_offset, stroke_fill)
+        with self._lock:
+            self._forget(key)
+            self._layers[key] = layer
+            self._total_bytes += _layer_bytes(layer)
+            self._evict()
+        return layer
+
+    def __len__(self) -> int:
+        """Return the number of cached layers."""
+        return len(self._layers)
+
+    def _forget(self, key: Hashable) -> None:
+        layer = self._layers.pop(key, None)
+        if layer is not None:
+            self._total_bytes -= _layer_bytes(layer)
+
+    def _evict(self) -> None:
+        while self._layers and self._total_bytes > self.max_bytes:
+            _, layer = self._layers.popitem(last=False)
+            self._total_bytes -= _layer_bytes(layer)
+
+
+def _render_layer(
+        body: TextLayout,
+        body_fill: Tuple[int, int, int],
+        author: TextLayout,
+        author_fill: Tuple[int, int, int],
+        author_offset: Tuple[int, int],
+        stroke_fill: Tuple[int, int, int],
+    ) -> Image.Image:
+    size = (max(body.width, author_offset[0] + author.width), max(body.height, author_offset[1] + author.height))
+    # Transparent pixels carry the stroke color, so anti-aliased stroke edges keep their color when composited.
+    layer = Image.new("RGBA", size, stroke_fill + (0,))
+    layer_draw = ImageDraw.Draw(layer)
+    body.draw(layer_draw, (0, 0), body_fill, stroke_fill)
+    author.draw(layer_draw, author_offset, author_fill, stroke_fill)
+    return layer
+
+
+def _layer_bytes(layer: Image.Image) -> int:
+    return 4 * layer.size[0] * layer.size[1]
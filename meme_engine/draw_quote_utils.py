@@ -6,12 +6,24 @@ Four concrete classes that realize the 'IngestorInterface' abstract class includ
 'TextIngestor', `DocxIngestor`, `PDFIngestor` and `CSVIngestor`.
 """
 import random
-import textwrap
-from typing import List, Optional, Tuple, Union
+from typing import Optional, Tuple, Union
 
-from PIL import ImageDraw, ImageFont
+from PIL import Image, ImageDraw, ImageFont
+
+from telemetry import metrics
+
+from .caption_cache import STROKE_FILL, CaptionCache
+from .font_registry import font_registry, measure_textlength
+from .placement import SaliencyMap
+from .text_layout import GREEDY, TextLayout, layout_text
+
+Color = Tuple[int, int, int]
 
 BODY_AUTHOR_SHIFT = (0, 10)
+# Mean luminance (0-255) of the region under a caption below which it is drawn light on a dark outline.
+DARK_REGION_LUMINANCE = 80
+LIGHT_CAPTION_FILL = (255, 255, 255)
+DARK_STROKE_FILL = (0, 0, 0)
 
 
 class TextOnImage:
@@ -20,13 +32,11 @@ class TextOnImage:
     _text: str
     _image_draw: ImageDraw.ImageDraw
     _image_font: Union[ImageFont.ImageFont, ImageFont.FreeTypeFont]
+    _font: str
     _font_size: int
     _textlength: int
     _fill: Tuple[int, int, int]
-    _multiline_text: List[str]
-    _multiline_textwidth: int
-    _multiline_textheight: int
-    _multiline_spacing: int
+    _layout: TextLayout
 
     def __init__(
             self,
@@ -46,62 +56,58 @@ class TextOnImage:
         """
         self._text = text
         self._image_draw = image_draw
-        self._image_font = self._set_image_font(font, font_size)
+        self._image_font = font_registry.get(font, font_size)
+        self._font = font
         self._font_size = font_size
-        self._textlength = int(self._image_draw.textlength(self._text, self._image_font))
+        self._textlength = measure_textlength(font, font_size, self._text)
         self._fill = fill if fill else (0, 0, 0)
 
-    def _set_image_font(self, font: str, font_size: int) -> Union[ImageFont.ImageFont, ImageFont.FreeTypeFont]:
-        try:
-            image_font = ImageFont.truetype(font, font_size)
-        except OSError:
-            image_font = ImageFont.load_default(size=font_size)
-        return image_font
-
     @property
     def textlength(self) -> int:
         """Get single-line text length in pixels."""
         return self._textlength
 
+    @property
+    def fill(self) -> Tuple[int, int, int]:
+        """Get the RGB color of the text."""
+        return self._fill
+
+    @property
+    def layout(self) -> TextLayout:
+        """Get the multi-line layout set by `set_multiline_text_attributes`."""
+        return self._layout
+
     @property
     def multiline_textwidth(self) -> int:
-        """Get multi-line text length in pixels."""
-        return self._multiline_textwidth
+        """Get multi-line text length in pixels, the width of its widest line."""
+        return self._layout.width
 
     @property
     def multiline_textheight(self) -> int:
         """Get multi-line text height in pixels."""
-        return self._multiline_textheight
+        return self._layout.height
 
-    def set_multiline_text_attributes(self, max_textlength: int) -> None:
+    def set_multiline_text_attributes(self, max_textlength: int, strategy: str = GREEDY) -> None:
         """Set the attributes for multi-line text.
 
         :param max_textlength: An integer of maximum text-length in pixels.
+        :param strategy: A string of the line breaking strategy of `layout_text`.
         """
-        max_char = int(max_textlength / self._font_size * 1.5)
-        self._multiline_text = textwrap.wrap(self._text, width=max_char)
-        self._multiline_textwidth = int(self._image_draw.textlength(self._multiline_text[0], self._image_font))
-        self._multiline_textheight = self._font_size * len(self._multiline_text)
-        self._multiline_spacing = int(self._font_size / 5)
+        self._layout = layout_text(self._font, self._font_size, self._text, max_textlength, strategy)
 
-    def draw_on_image(self, anchor_coord: Tuple[int, int]) -> None:
+    def draw_on_image(
+            self,
+            anchor_coord: Tuple[int, int],
+            fill: Optional[Tuple[int, int, int]] = None,
+            stroke_fill: Tuple[int, int, int] = STROKE_FILL,
+        ) -> None:
         """Draw the text on the image.
 
-        :param anchor_coord: A tuple of two integers representing the coordinate on the image
+        :param anchor_coord: A tuple of two integers representing the top-left coordinate of the text on the image
+        :param fill: A tuple of the RGB color to draw the text in instead of its own `fill`.
+        :param stroke_fill: A tuple of the RGB color of the text outline.
         """
-        _coord = anchor_coord
-        _offset = (0, self._font_size)
-        for line in self._multiline_text:
-            self._image_draw.multiline_text(
-                xy=_coord,
-                text=line,
-                font=self._image_font,
-                fill=self._fill,
-                stroke_width=1,
-                stroke_fill=(255,255,255),
-                spacing=self._multiline_spacing,
-            )
-            _coord = tuple(map(sum, zip(_coord, _offset)))
+        self._layout.draw(self._image_draw, anchor_coord, fill or self._fill, stroke_fill)
 
 
 class QuoteOnImage:
@@ -110,28 +116,75 @@ class QuoteOnImage:
     _body: TextOnImage
     _author: TextOnImage
     _image_size: Tuple[int, int]
+    _image: Optional[Image.Image]
+    _caption_cache: Optional[CaptionCache]
+    _saliency: Optional[SaliencyMap]
+    _seed: Optional[int]
 
-    def __init__(self, body: TextOnImage, author: TextOnImage, image_size: Tuple[int, int]) -> None:
+    def __init__(
+            self,
+            body: TextOnImage,
+            author: TextOnImage,
+            image_size: Tuple[int, int],
+            image: Optional[Image.Image] = None,
+            caption_cache: Optional[CaptionCache] = None,
+            saliency: Optional[SaliencyMap] = None,
+            seed: Optional[int] = None,
+        ) -> None:
         """Construct a new `QuoteOnImage` instance that has a `draw()` method to draw a quote with its author on an image.
 
+        When both `image` and `caption_cache` are supplied, the caption is rendered once into a
+        cached layer that is composited onto the image, instead of drawing its text on the image.
+        When `saliency` is supplied, the caption is placed on one of the least busy regions of the
+        image, and drawn light on a dark outline if that region is dark; otherwise it is placed anywhere.
+
         :param body: A TextOnImage instance of quote body
         :param author: A TextOnImage instance of quote author
         :param image_size: A tuple of two integers (width, height) representing the size of the image in pixels.
+        :param image: An `Image.Image` the body and author draw on, to composite the cached caption layer onto.
+        :param caption_cache: A CaptionCache of rendered caption layers.
+        :param saliency: A SaliencyMap of the image.
+        :param seed: An integer seed of the placement, so the same seed places the caption at the same position.
+            Defaults to the `random` module's state.
         """
         self._body = body
         self._author = author
         self._image_size = image_size
+        self._image = image
+        self._caption_cache = caption_cache
+        self._saliency = saliency
+        self._seed = seed
 
     def draw(self) -> None:
         """Draw the quote with its author on the image."""
-        max_textlength = self._compute_max_textlength()
-        self._body.set_multiline_text_attributes(max_textlength)
-        self._author.set_multiline_text_attributes(max_textlength)
+        quote_bbox_coord, fills = self._layout()
+        with metrics.timer("meme_stage_seconds", stage="caption"):
+            if self._image is not None and self._caption_cache is not None:
+                self._composite_quote_on_image(quote_bbox_coord, *fills)
+            else:
+                self._draw_quote_on_image(quote_bbox_coord, *fills)
+
+    def render_layer(self) -> Tuple[Image.Image, Tuple[int, int]]:
+        """Lay out the quote with its author and return its caption layer, without drawing it on the image.
 
-        quote_bbox = self._compute_quote_bbox()
-        quote_bbox_coord = self._pick_random_bbox_coord(quote_bbox)
+        The layer can be pasted onto any image of `image_size` that looks like the one the
+        caption was placed on, such as every frame of an animation. Needs `caption_cache`.
 
-        self._draw_quote_on_image(quote_bbox_coord)
+        :return: A tuple of the shared RGBA caption layer and the (x, y) of its top-left corner on the image.
+        """
+        quote_bbox_coord, fills = self._layout()
+        with metrics.timer("meme_stage_seconds", stage="caption"):
+            return self._caption_layer(*fills), quote_bbox_coord
+
+    def _layout(self) -> Tuple[Tuple[int, int], Tuple[Color, Color, Color]]:
+        with metrics.timer("meme_stage_seconds", stage="layout"):
+            max_textlength = self._compute_max_textlength()
+            self._body.set_multiline_text_attributes(max_textlength)
+            self._author.set_multiline_text_attributes(max_textlength)
+
+            quote_bbox = self._compute_quote_bbox()
+            quote_bbox_coord = self._pick_bbox_coord(quote_bbox)
+            return quote_bbox_coord, self._pick_fills(quote_bbox_coord, quote_bbox)
 
     def _compute_max_textlength(self) -> int:
         if max(self._body.textlength, self._author.textlength) >= self._image_size[0]:
@@ -145,13 +198,38 @@ class QuoteOnImage:
         bbox_height = self._body.multiline_textheight + self._author.multiline_textheight + BODY_AUTHOR_SHIFT[1]
         return (bbox_width, bbox_height)
 
-    def _pick_random_bbox_coord(self, quote_bbox: Tuple[int, int]) -> Tuple[int, int]:
-        max_col_id = self._image_size[0] - quote_bbox[0]
-        max_row_id = self._image_size[1] - quote_bbox[1]
-        return (random.randint(0, max_col_id), random.randint(0, max_row_id))
+    def _pick_bbox_coord(self, quote_bbox: Tuple[int, int]) -> Tuple[int, int]:
+        if self._saliency is not None:
+            return self._saliency.place(quote_bbox, self._seed)
+        rng = random.Random(self._seed) if self._seed is not None else random
+        # A caption larger than the image is placed at its edge and clipped rather than failing.
+        max_col_id = max(0, self._image_size[0] - quote_bbox[0])
+        max_row_id = max(0, self._image_size[1] - quote_bbox[1])
+        return (rng.randint(0, max_col_id), rng.randint(0, max_row_id))
 
-    def _draw_quote_on_image(self, quote_bbox_coord: Tuple[int, int]) -> None:
+    def _pick_fills(
+            self,
+            quote_bbox_coord: Tuple[int, int],
+            quote_bbox: Tuple[int, int],
+        ) -> Tuple[Color, Color, Color]:
+        # The body, author and outline colors: light on a dark outline over a dark region of the image.
+        if self._saliency is not None and self._saliency.mean_luminance(quote_bbox_coord, quote_bbox) < DARK_REGION_LUMINANCE:
+            return LIGHT_CAPTION_FILL, LIGHT_CAPTION_FILL, DARK_STROKE_FILL
+        return self._body.fill, self._author.fill, STROKE_FILL
+
+    def _author_offset(self) -> Tuple[int, int]:
+        return (BODY_AUTHOR_SHIFT[0], self._body.multiline_textheight + BODY_AUTHOR_SHIFT[1])
+
+    def _draw_quote_on_image(self, quote_bbox_coord: Tuple[int, int], body_fill: Color, author_fill: Color, stroke_fill: Color) -> None:
         body_coord = quote_bbox_coord
-        author_coord = tuple(map(sum, zip(quote_bbox_coord, (0, self._body.multiline_textheight), BODY_AUTHOR_SHIFT)))
-        self._body.draw_on_image(body_coord)
-        self._author.draw_on_image(author_coord)
+        author_coord = tuple(map(sum, zip(quote_bbox_coord, self._author_offset())))
+        self._body.draw_on_image(body_coord, body_fill, stroke_fill)
+        self._author.draw_on_image(author_coord, author_fill, stroke_fill)
+
+    def _composite_quote_on_image(self, quote_bbox_coord: Tuple[int, int], body_fill: Color, author_fill: Color, stroke_fill: Color) -> None:
+        layer = self._caption_layer(body_fill, author_fill, stroke_fill)
+        self._image.paste(layer, quote_bbox_coord, layer)
+
+    def _caption_layer(self, body_fill: Color, author_fill: Color, stroke_fill: Color) -> Image.Image:
+        return self._caption_cache.get(
+            self._body.layout, body_fill, self._author.layout, author_fill, self._author_offset(), stroke_fill)
@@ -0,0 +1,21 @@
+"""Provide meme_engine specific exceptions."""
+
+class ImageFetchError(Exception):
+	"""An exception for an image that could not be fetched."""
+	pass
+
+class ImageTooLarge(ImageFetchError):
+	"""An exception for a fetched image that exceeds the size limit."""
+	pass
+
+class AnimationTooLarge(ImageTooLarge):
+	"""An exception for an animated image with more frames or pixels than the animation limits."""
+	pass
+
+class ImageFetchTimeout(ImageFetchError):
+	"""An exception for an image fetch that took too long."""
+	pass
+
+class RenderQueueFull(Exception):
+	"""An exception for a render job rejected because too many jobs are pending."""
+	pass
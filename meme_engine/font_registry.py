@@ -0,0 +1,103 @@
+"""Provide a process-wide registry of loaded fonts and memoized text metrics.
+
+'FontRegistry' resolves each (font name, font size) pair once per process and
+hands out the shared font object, so drawing a caption never re-opens font files.
+`measure_textlength` memoizes the single-line measurements `TextOnImage` makes.
+"""
+import functools
+import threading
+from collections import OrderedDict
+from typing import Iterable, Set, Tuple, Union
+
+from PIL import ImageFont
+
+from telemetry import metrics
+
+DEFAULT_MAX_FONTS = 32
+TEXT_METRICS_CACHE_SIZE = 4096
+
+FontSpec = Tuple[str, int]
+ImageFontType = Union[ImageFont.ImageFont, ImageFont.FreeTypeFont]
+
+
+class FontRegistry:
+    """A thread-safe LRU registry of loaded fonts keyed by (font name, font size)."""
+
+    max_fonts: int
+
+    def __init__(self, max_fonts: int = DEFAULT_MAX_FONTS) -> None:
+        """Construct a new `FontRegistry`.
+
+        :param max_fonts: An integer cap on the number of fonts kept besides the warmed-up ones.
+        """
+        self.max_fonts = max_fonts
+        self._fonts: "OrderedDict[FontSpec, ImageFontType]" = OrderedDict()
+        self._pinned: Set[FontSpec] = set()
+        self._lock = threading.Lock()
+
+    def get(self, font: str, font_size: int) -> ImageFontType:
+        """Return the shared font object for the supplied font name and size.
+
+        Falls back to Pillow's default font at the requested size if the font is not
+        available on the system; the fallback is cached the same way.
+
+        :param font: A string of font that is avaiable on the system.
+        :param font_size: An integer of font size.
+        :return: A loaded font object.
+        """
+        spec = (font, font_size)
+        with self._lock:
+            image_font = self._fonts.get(spec)
+            if image_font is not None:
+                self._fonts.move_to_end(spec)
+                return image_font
+
+        with metrics.timer("meme_stage_seconds", stage="font_load"):
+            image_font = _load_font(font, font_size)
+        with self._lock:
+            image_font = self._fonts.setdefault(spec, image_font)
+            self._fonts.move_to_end(spec)
+            self._evict()
+        return image_font
+
+    def warm_up(self, specs: Iterable[FontSpec]) -> None:
+        """Load the supplied fonts ahead of time and keep them for the lifetime of the process.
+
+        :param specs: An iterable of (font name, font size) tuples.
+        """
+        for font, font_size in specs:
+            self.get(font, font_size)
+            with self._lock:
+                self._pinned.add((font, font_size))
+
+    def __len__(self) -> int:
+        """Return the number of loaded fonts."""
+        return len(self._fonts)
+
+    def _evict(self) -> None:
+        unpinned = [spec for spec in self._fonts if spec not in self._pinned]
+        for spec in unpinned[:max(0, len(unpinned) - self.max_fonts)]:
+            del self._fonts[spec]
+
+
+def _load_font(font: str, font_size: int) -> ImageFontType:
+    try:
+        return ImageFont.truetype(font, font_size)
+    except OSError:
+        return ImageFont.load_default(size=font_size)
+
+
+font_registry = FontRegistry()
+
+
+@functools.lru_cache(maxsize=TEXT_METRICS_CACHE_SIZE)
+def measure_textlength(font: str, font_size: int, text: str) -> int:
+    """Return the single-line length of the text in pixels, memoized on (font, font size, text).
+
+    :param font: A string of font that is avaiable on the system.
+    :param font_size: An integer of font size.
+    :param text: A string of text to measure.
+    :return: An integer of text length in pixels.
+    """
+    return int(font_registry.get(font, font_size).getlength(text))
+
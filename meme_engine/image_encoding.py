@@ -0,0 +1,100 @@
+"""Provide in-memory encoding of rendered memes.
+
+'ImageEncoding' describes the output format and its options, and `encode_image`
+encodes an image into a per-thread buffer that is reused across calls, so serving
+a meme needs neither a file nor a freshly grown buffer per response.
+`encode_animation` encodes several images as the frames of one animated WebP or GIF.
+"""
+import io
+import threading
+from typing import Any, Callable, Dict, NamedTuple, Sequence
+
+from PIL import Image
+
+from telemetry import metrics
+
+FORMATS = {
+    "JPEG": ("image/jpeg", ".jpg"),
+    "WEBP": ("image/webp", ".webp"),
+    "PNG": ("image/png", ".png"),
+    "GIF": ("image/gif", ".gif"),
+}
+# Formats `encode_animation` can write several frames in.
+ANIMATED_FORMATS = ("WEBP", "GIF")
+
+_buffers = threading.local()
+
+
+class ImageEncoding(NamedTuple):
+    """The format and options a meme is encoded with."""
+
+    format: str = "JPEG"
+    quality: int = 75
+    progressive: bool = False
+    optimize: bool = False
+    lossless: bool = False
+
+    @property
+    def mimetype(self) -> str:
+        """Get the MIME type of the encoded image."""
+        return FORMATS[self.format][0]
+
+    @property
+    def extension(self) -> str:
+        """Get the file extension of the encoded image, including the dot."""
+        return FORMATS[self.format][1]
+
+    def save_options(self) -> Dict[str, Any]:
+        """Return the keyword arguments of `Image.save` for this encoding.
+
+        JPEG uses `quality`, `progressive` and `optimize`; WebP uses `quality` and
+        `lossless`; PNG and GIF are always lossless and only use `optimize`.
+        """
+        if self.format == "JPEG":
+            return {"quality": self.quality, "progressive": self.progressive, "optimize": self.optimize}
+        if self.format == "WEBP":
+            return {"quality": self.quality, "lossless": self.lossless}
+        if self.format in ("PNG", "GIF"):
+            return {"optimize": self.optimize}
+        raise ValueError(f"Unsupported image format \"{self.format}\".")
+
+
+DEFAULT_ENCODING = ImageEncoding()
+
+
+def encode_image(image: Image.Image, encoding: ImageEncoding = DEFAULT_ENCODING) -> bytes:
+    """Encode the image in memory and return the encoded bytes.
+
+    :param image: An `Image.Image` to encode.
+    :param encoding: An ImageEncoding of the output format and its options.
+    :return: A bytes object of the encoded image.
+    """
+    return _encode(encoding, lambda buffer: image.save(buffer, format=encoding.format, **encoding.save_options()))
+
+
+def encode_animation(frames: Sequence[Image.Image], encoding: ImageEncoding, frame_ms: int) -> bytes:
+    """Encode the images as the frames of a looping animation and return the encoded bytes.
+
+    :param frames: A non-empty sequence of `Image.Image` of the same size.
+    :param encoding: An ImageEncoding of a format of `ANIMATED_FORMATS` and its options.
+    :param frame_ms: An integer of the milliseconds each frame is shown for.
+    :return: A bytes object of the encoded animation.
+    """
+    if encoding.format not in ANIMATED_FORMATS:
+        raise ValueError(f"Image format \"{encoding.format}\" does not support animation.")
+    options = dict(encoding.save_options(), save_all=True, append_images=list(frames[1:]), duration=frame_ms, loop=0)
+    return _encode(encoding, lambda buffer: frames[0].save(buffer, format=encoding.format, **options))
+
+
+def _encode(encoding: ImageEncoding, save: Callable[[io.BytesIO], None]) -> bytes:
+    buffer = getattr(_buffers, "buffer", None)
+    if buffer is None:
+        buffer = _buffers.buffer = io.BytesIO()
+    # Overwrite from the start instead of truncating, so the buffer keeps its capacity.
+    buffer.seek(0)
+    with metrics.timer("meme_stage_seconds", stage="encode"):
+        save(buffer)
+    size = buffer.tell()
+    metrics.count("meme_encoded_bytes_total", size, format=encoding.format)
+    with buffer.getbuffer() as view:
+        return bytes(view[:size])
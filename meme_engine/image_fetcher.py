@@ -0,0 +1,154 @@
+"""Provide a bounded, in-memory fetcher for remote images.
+
+'ImageFetcher' streams an image over a pooled HTTP session into memory, enforcing a
+size limit and timeouts, and returns a file-like object `MemeEngine` can read directly.
+The read timeout only bounds each receive, so a server trickling bytes in could keep a
+fetch going for ever; the connection is hung up on once the fetch's deadline passes.
+`requests` is imported by the first fetch, so constructing a fetcher at startup is free.
+"""
+from __future__ import annotations
+
+import io
+import os
+import socket
+import threading
+import time
+from typing import TYPE_CHECKING, Optional, Tuple
+
+if TYPE_CHECKING:
+    import requests
+
+from .exception import ImageFetchError, ImageFetchTimeout, ImageTooLarge
+
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_TIMEOUT = (3.05, 10.0)
+DEFAULT_DEADLINE_S = 20.0
+DEFAULT_POOL_MAXSIZE = 10
+_CHUNK_BYTES = 64 * 1024
+
+
+class ImageFetcher:
+    """Fetch remote images into memory over a pooled `requests.Session`."""
+
+    max_bytes: int
+    timeout: Tuple[float, float]
+    deadline_s: float
+
+    def __init__(
+            self,
+            max_bytes: int = DEFAULT_MAX_BYTES,
+            timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+            deadline_s: float = DEFAULT_DEADLINE_S,
+            pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+            session: Optional[requests.Session] = None,
+        ) -> None:
+        """Construct a new `ImageFetcher`.
+
+        :param max_bytes: An integer of the maximum image size in bytes.
+        :param timeout: A tuple of the connect and read timeouts in seconds.
+        :param deadline_s: A float of the maximum total duration of a fetch in seconds.
+        :param pool_maxsize: An integer of the number of connections kept open per host.
+        :param session: A requests.Session to fetch with. Defaults to a new pooled session.
+        """
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.deadline_s = deadline_s
+        self._pool_maxsize = pool_maxsize
+        self._session = session
+        self._session_lock = threading.Lock()
+
+    def fetch(self, url: str, deadline_s: Optional[float] = None) -> io.BytesIO:
+        """Download the image at the URL into memory.
+
+        :param url: A String URL of the image.
+        :param deadline_s: A float of the maximum duration of this fetch in seconds, capped at and defaulting to
+            the fetcher's `deadline_s`.
+        :return: A BytesIO positioned at the start of the image content.
+        :raises ImageTooLarge: If the image is larger than `max_bytes`.
+        :raises ImageFetchTimeout: If the server is too slow or the fetch exceeds its deadline.
+        :raises ImageFetchError: If the image could not be fetched for any other reason.
+        """
+        import requests
+
+        deadline_s = self.deadline_s if deadline_s is None else min(deadline_s, self.deadline_s)
+        if deadline_s <= 0:
+            raise ImageFetchTimeout(f"No time was left to fetch \"{url}\".")
+        session = self._get_session()
+        deadline = time.monotonic() + deadline_s
+        # Each receive of the headers waits at most until the deadline; the body is cut off at the deadline itself.
+        timeout = (min(self.timeout[0], deadline_s), min(self.timeout[1], deadline_s))
+        buffer = io.BytesIO()
+        try:
+            with session.get(url, stream=True, timeout=timeout) as response:
+                if response.status_code != 200:
+                    raise ImageFetchError(f"Fetching \"{url}\" returned HTTP status {response.status_code}.")
+                content_length = response.headers.get("Content-Length", "")
+                if content_length.isdigit() and int(content_length) > self.max_bytes:
+                    raise ImageTooLarge(f"The image at \"{url}\" is larger than {self.max_bytes} bytes.")
+
+                with _Watchdog(response, deadline - time.monotonic()):
+                    for chunk in response.iter_content(_CHUNK_BYTES):
+                        if buffer.tell() + len(chunk) > self.max_bytes:
+                            raise ImageTooLarge(f"The image at \"{url}\" is larger than {self.max_bytes} bytes.")
+                        buffer.write(chunk)
+                        if time.monotonic() > deadline:
+                            break
+                if time.monotonic() > deadline:
+                    raise ImageFetchTimeout(f"Fetching \"{url}\" took longer than {deadline_s} seconds.")
+        except requests.Timeout as e:
+            raise ImageFetchTimeout(f"Fetching \"{url}\" timed out.") from e
+        except requests.RequestException as e:
+            if time.monotonic() > deadline:
+                raise ImageFetchTimeout(f"Fetching \"{url}\" took longer than {deadline_s} seconds.") from e
+            raise ImageFetchError(f"Failed to fetch \"{url}\".") from e
+
+        buffer.seek(0)
+        return buffer
+
+    def close(self) -> None:
+        """Close the pooled connections."""
+        if self._session is not None:
+            self._session.close()
+
+    def _get_session(self) -> requests.Session:
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self._pool_maxsize, pool_maxsize=self._pool_maxsize)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
+
+class _Watchdog:
+    def __init__(self, response: requests.Response, delay_s: float) -> None:
+        self._response = response
+        self._stopped = False
+        self._lock = threading.Lock()
+        self._timer = threading.Timer(max(0.0, delay_s), self._hang_up)
+        self._timer.daemon = True
+
+    def __enter__(self) -> "_Watchdog":
+        self._timer.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        with self._lock:
+            self._stopped = True
+        self._timer.cancel()
+
+    def _hang_up(self) -> None:
+        with self._lock:
+            if self._stopped:
+                return
+            # Shutting the connection down wakes up the receive the fetching thread is blocked in. The socket is
+            # reached through a duplicate of its descriptor, since the response may own it instead of the connection.
+            try:
+                with socket.socket(fileno=os.dup(self._response.raw.fileno())) as sock:
+                    sock.shutdown(socket.SHUT_RDWR)
+            except (OSError, ValueError):
+                pass
@@ -0,0 +1,317 @@
+"""Provide a persisted catalog of the images in a photo tree.
+
+'ImageIndex' walks a directory tree once, records the dimensions, format and content
+hash of every image it can decode, and sets aside files that are unreadable or not
+supported, so a render never picks a file that fails. The catalog is saved to a JSON
+file and reloaded on start; a refresh only lists the directories whose mtime changed
+and only decodes the files that are new or whose size or mtime changed, so large trees
+are not rescanned.
+"""
+import concurrent.futures
+import hashlib
+import io
+import json
+import os
+import random
+import threading
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+# Raised when the images accepted change, so images rejected by an older version are checked again.
+CATALOG_FORMAT_VERSION = 2
+DEFAULT_CATALOG_PATH = "./.cache/images.json"
+DEFAULT_MAX_WORKERS = 4
+# Formats the meme engine can decode and convert to RGB.
+SUPPORTED_FORMATS = ("JPEG", "MPO", "PNG", "WEBP", "GIF", "BMP", "TIFF")
+# Size an image is decoded at to check that it is readable; JPEG decodes at a reduced scale.
+_CHECK_DECODE_SIZE = (64, 64)
+
+
+class ImageInfo(NamedTuple):
+    """An image of the catalog, addressed by its path below the catalog root."""
+
+    name: str
+    path: str
+    width: int
+    height: int
+    format: str
+    size: int
+    mtime_ns: int
+    sha256: str
+
+
+class RefreshStats(NamedTuple):
+    """The number of catalog changes made by one `ImageIndex.refresh`."""
+
+    added: int = 0
+    updated: int = 0
+    removed: int = 0
+    rejected: int = 0
+
+    @property
+    def changed(self) -> bool:
+        """Get whether the refresh changed the catalog."""
+        return any(self)
+
+
+class _Rejected(NamedTuple):
+    size: int
+    mtime_ns: int
+    reason: str
+
+
+class ImageIndex:
+    """A thread-safe catalog of the readable images below a root directory."""
+
+    root: str
+    catalog_path: Optional[str]
+
+    def __init__(self, root: str, catalog_path: Optional[str] = DEFAULT_CATALOG_PATH) -> None:
+        """Construct a new `ImageIndex` of the images below the root directory.
+
+        The catalog saved at `catalog_path` is loaded if it was built for the same root;
+        call `refresh` to bring it up to date with the directory.
+
+        :param root: A String path of the directory tree of images.
+        :param catalog_path: A String path of the JSON file the catalog is saved to, or None to keep it in memory only.
+        """
+        self.root = root
+        self.catalog_path = catalog_path
+        # The images by name and their sorted names, replaced together so readers need no lock.
+        self._catalog: Tuple[Dict[str, ImageInfo], Tuple[str, ...]] = ({}, ())
+        self._rejected: Dict[str, _Rejected] = {}
+        self._dirs: Dict[str, int] = {}
+        self._refresh_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+        if catalog_path is not None:
+            self._load(catalog_path)
+
+    @classmethod
+    def load(cls, catalog_path: str) -> "ImageIndex":
+        """Construct an `ImageIndex` from a saved catalog, with the root it was built for.
+
+        :param catalog_path: A String path of a catalog saved by `save`.
+        :return: An ImageIndex.
+        """
+        with open(catalog_path, "r", encoding="utf-8") as f:
+            root = json.load(f)["root"]
+        return cls(root, catalog_path)
+
+    def __len__(self) -> int:
+        """Return the number of readable images."""
+        return len(self._catalog[1])
+
+    def __iter__(self) -> Iterator[ImageInfo]:
+        """Iterate over the readable images in name order."""
+        images, names = self._catalog
+        return (images[name] for name in names)
+
+    def paths(self) -> List[str]:
+        """Return the String paths of the readable images in name order."""
+        return [image.path for image in self]
+
+    def get(self, name: str) -> Optional[ImageInfo]:
+        """Get an image by its path below the root.
+
+        :param name: A String path relative to the root, as in `ImageInfo.name`.
+        :return: An ImageInfo, or None if there is no readable image of that name.
+        """
+        return self._catalog[0].get(name)
+
+    def random_image(self) -> ImageInfo:
+        """Pick a readable image uniformly at random.
+
+        :return: An ImageInfo.
+        :raises IndexError: If the catalog has no readable image.
+        """
+        images, names = self._catalog
+        return images[random.choice(names)]
+
+    @property
+    def rejected(self) -> Dict[str, str]:
+        """Get the reason each unreadable or unsupported file was left out, by its path below the root."""
+        return {name: rejected.reason for name, rejected in self._rejected.items()}
+
+    def refresh(self, full: bool = False, max_workers: int = DEFAULT_MAX_WORKERS) -> RefreshStats:
+        """Bring the catalog up to date with the directory tree.
+
+        Only directories whose mtime changed since the last refresh are listed, which catches
+        files being added, removed or renamed; a file is decoded only if it is new or its size
+        or mtime changed. A file rewritten in place in an unchanged directory is picked up by a
+        full refresh, which lists every directory.
+
+        :param full: A boolean whether to list every directory, whatever its mtime.
+        :param max_workers: An integer number of threads that hash and decode new files.
+        :return: A RefreshStats of the changes.
+        """
+        with self._refresh_lock:
+            images, rejected, dirs = self._catalog[0], self._rejected, self._dirs
+            files_by_dir: Dict[str, List[str]] = {}
+            for name in (*images, *rejected):
+                files_by_dir.setdefault(os.path.dirname(name), []).append(name)
+            subdirs_by_dir: Dict[str, List[str]] = {}
+            for directory in dirs:
+                if directory:
+                    subdirs_by_dir.setdefault(os.path.dirname(directory), []).append(directory)
+
+            new_dirs: Dict[str, int] = {}
+            present: Dict[str, Tuple[int, int]] = {}
+            kept: List[str] = []
+            pending = [""]
+            while pending:
+                directory = pending.pop()
+                try:
+                    mtime_ns = os.stat(os.path.join(self.root, directory)).st_mtime_ns
+                except OSError:
+                    continue
+                if not full and dirs.get(directory) == mtime_ns:
+                    # The listing is unchanged: keep its files and visit its known subdirectories.
+                    new_dirs[directory] = mtime_ns
+                    kept.extend(files_by_dir.get(directory, ()))
+                    pending.extend(subdirs_by_dir.get(directory, ()))
+                    continue
+                try:
+                    with os.scandir(os.path.join(self.root, directory)) as entries:
+                        for entry in entries:
+                            if entry.name.startswith("."):
+                                continue
+                            name = os.path.join(directory, entry.name)
+                            if entry.is_dir():
+                                pending.append(name)
+                            elif entry.is_file():
+                                stat = entry.stat()
+                                present[name] = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    continue
+                new_dirs[directory] = mtime_ns
+
+            new_images = {name: images[name] for name in kept if name in images}
+            new_rejected = {name: rejected[name] for name in kept if name in rejected}
+            to_check = []
+            for name, (size, mtime_ns) in present.items():
+                known = images.get(name) or rejected.get(name)
+                if known is not None and (known.size, known.mtime_ns) == (size, mtime_ns):
+                    if name in images:
+                        new_images[name] = known
+                    else:
+                        new_rejected[name] = known
+                else:
+                    to_check.append(name)
+
+            added = updated = newly_rejected = 0
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+                for name, result in zip(to_check, pool.map(self._check, to_check)):
+                    if isinstance(result, _Rejected):
+                        new_rejected[name] = result
+                        newly_rejected += 1
+                    else:
+                        new_images[name] = result
+                        if name in images:
+                            updated += 1
+                        else:
+                            added += 1
+            removed = sum(1 for name in images if name not in new_images)
+
+            self._swap(new_images, new_rejected, new_dirs)
+            return RefreshStats(added, updated, removed, newly_rejected)
+
+    def save(self, catalog_path: Optional[str] = None) -> None:
+        """Write the catalog to a JSON file, replacing it atomically.
+
+        :param catalog_path: A String path of the file to write. Defaults to `catalog_path`.
+        """
+        catalog_path = catalog_path or self.catalog_path
+        if catalog_path is None:
+            raise ValueError("No catalog path to save the image index to.")
+        catalog = {
+            "version": CATALOG_FORMAT_VERSION,
+            "root": self.root,
+            "dirs": self._dirs,
+            "images": [(image.name, image.width, image.height, image.format, image.size, image.mtime_ns, image.sha256)
+                       for image in self],
+            "rejected": [(name, *rejected) for name, rejected in self._rejected.items()],
+        }
+        directory = os.path.dirname(catalog_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{catalog_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(catalog, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, catalog_path)
+
+    def start_watching(self, interval_s: float = 30.0) -> None:
+        """Refresh the catalog every interval on a background thread, saving it when it changes.
+
+        :param interval_s: A float of the seconds between refreshes.
+        """
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval_s,), name="image-index-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        """Stop the background refreshes started by `start_watching`."""
+        self._stop_watching.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self, interval_s: float) -> None:
+        while not self._stop_watching.wait(interval_s):
+            try:
+                if self.refresh().changed and self.catalog_path is not None:
+                    self.save()
+            except Exception as e:
+                print(f"Failed to refresh the image index of \"{self.root}\": {e!r}")
+
+    def _check(self, name: str) -> Union[ImageInfo, _Rejected]:
+        # Imported here, so loading a saved catalog does not import Pillow.
+        from PIL import Image, UnidentifiedImageError
+
+        path = os.path.join(self.root, name)
+        try:
+            with open(path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                data = f.read()
+        except OSError as e:
+            return _Rejected(-1, -1, f"{type(e).__name__}: {e}")
+
+        try:
+            image = Image.open(io.BytesIO(data))
+        except UnidentifiedImageError:
+            return _Rejected(stat.st_size, stat.st_mtime_ns, "Not an image of a known format.")
+        except Exception as e:
+            return _Rejected(stat.st_size, stat.st_mtime_ns, f"{type(e).__name__}: {e}")
+
+        try:
+            with image:
+                size = image.size
+                image_format = image.format
+                if image_format not in SUPPORTED_FORMATS:
+                    return _Rejected(stat.st_size, stat.st_mtime_ns, f"Unsupported image format {image_format}.")
+                image.draft("RGB", _CHECK_DECODE_SIZE)
+                image.load()
+        except Exception as e:
+            return _Rejected(stat.st_size, stat.st_mtime_ns, f"{type(e).__name__}: {e}")
+        return ImageInfo(name, path, size[0], size[1], image_format, stat.st_size, stat.st_mtime_ns,
+                         hashlib.sha256(data).hexdigest())
+
+    def _swap(self, images: Dict[str, ImageInfo], rejected: Dict[str, _Rejected], dirs: Dict[str, int]) -> None:
+        self._catalog = (images, tuple(sorted(images)))
+        self._rejected = rejected
+        self._dirs = dirs
+
+    def _load(self, catalog_path: str) -> None:
+        try:
+            with open(catalog_path, "r", encoding="utf-8") as f:
+                catalog = json.load(f)
+        except (OSError, ValueError):
+            return
+        if catalog.get("version") != CATALOG_FORMAT_VERSION or catalog.get("root") != self.root:
+            return
+        images = {}
+        for name, width, height, image_format, size, mtime_ns, sha256 in catalog["images"]:
+            images[name] = ImageInfo(name, os.path.join(self.root, name), width, height, image_format, size, mtime_ns, sha256)
+        rejected = {name: _Rejected(size, mtime_ns, reason) for name, size, mtime_ns, reason in catalog["rejected"]}
+        self._swap(images, rejected, catalog["dirs"])
@@ -0,0 +1,62 @@
+"""Provide utilities to load images resized to a target width.
+
+`open_image_resized` decodes an image as close to the target width as the format
+allows and resamples it to that width while maintaining the aspect ratio.
+"""
+from typing import BinaryIO, Union
+
+from PIL import Image
+
+from telemetry import metrics
+
+# How much larger than the target size a reduced-resolution decode may be before the final resample.
+DRAFT_REDUCING_GAP = 1.0
+
+
+def open_image_resized(image_path: Union[str, BinaryIO], max_width_px: int) -> Image.Image:
+    """Open an image and return it resized to the maximum width as an RGB image.
+
+    :param image_path: A String path of the image file, or a binary file-like object of its content.
+    :param max_width_px: An integer of maximum image width in pixels; smaller images are not enlarged.
+    :return: A loaded RGB `Image.Image`.
+    """
+    with metrics.timer("meme_stage_seconds", stage="open"):
+        image = Image.open(image_path)
+        _request_reduced_decode(image, max_width_px)
+    with metrics.timer("meme_stage_seconds", stage="decode"):
+        if image.mode in ("1", "P"):
+            # Palette images would otherwise be resized with nearest-neighbour sampling.
+            image = image.convert("RGB")
+        image.load()
+    metrics.count("meme_decoded_bytes_total", len(image.getbands()) * image.size[0] * image.size[1])
+    with metrics.timer("meme_stage_seconds", stage="resize"):
+        resize_image_with_aspect_ratio_maintained(image, max_width_px)
+        return image if image.mode == "RGB" else image.convert("RGB")
+
+
+def _request_reduced_decode(image: Image.Image, max_width_px: int) -> None:
+    """Ask the decoder to decode close to the target width instead of at full resolution.
+
+    JPEG images are decoded with DCT scaling and JPEG 2000 images at a lower resolution
+    level; other formats are always decoded at full resolution.
+    """
+    min_width_px = int(max_width_px * DRAFT_REDUCING_GAP)
+    if image.size[0] <= min_width_px:
+        return
+    scale = image.size[0] / min_width_px
+    if image.format == "JPEG":
+        image.draft(None, (min_width_px, int(image.size[1] / scale)))
+    elif image.format == "JPEG2000":
+        # The decoder halves each dimension per resolution level, rounding up.
+        image.reduce = max(0, int(scale).bit_length() - 1)
+
+
+def resize_image_with_aspect_ratio_maintained(image: Image.Image, max_width_px: int) -> None:
+    """Resize the image in place to the maximum width while maintaining its aspect ratio.
+
+    :param image: An `Image.Image` to resize.
+    :param max_width_px: An integer of maximum image width in pixels; smaller images are not enlarged.
+    """
+    w_percent = (max_width_px / float(image.size[0]))
+    h_px = int((float(image.size[1]) * float(w_percent)))
+    image.thumbnail((max_width_px, h_px), Image.Resampling.LANCZOS)
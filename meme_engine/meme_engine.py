@@ -1,71 +1,554 @@
 """Provide meme engine that makes meme."""
+import concurrent.futures
+import itertools
 import os
+import zlib
+from typing import BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
 from PIL import Image, ImageDraw
-from .draw_quote_utils import TextOnImage, QuoteOnImage
+from telemetry import metrics
+from .animation import (ANIMATION_COLORS, DEFAULT_ANIMATION_LIMITS, DEFAULT_FRAME_MS, AnimationLimits, GifWriter,
+                        is_animated, iter_frames_resized, open_animation)
+from .caption_cache import CaptionCache
+from .draw_quote_utils import DARK_REGION_LUMINANCE, TextOnImage, QuoteOnImage
+from .font_registry import font_registry
+from .image_encoding import DEFAULT_ENCODING, ImageEncoding, encode_animation, encode_image
+from .image_utils import open_image_resized, resize_image_with_aspect_ratio_maintained
+from .output_store import DEFAULT_MAX_ENTRIES, OutputStore, file_digest, stream_digest, write_atomically
+from .placement import PLACEMENT_CANDIDATE_FRACTION, SALIENCY_CELL_PX, SaliencyMap
+from .template_cache import TemplateCache
 
 MAX_IMAGE_WIDTH_PX = 500
+# Bumped whenever a change to the renderer changes the pixels of memes it rendered before, so they are not served stale.
+RENDERER_VERSION = 2
+
+BODY_FONT = "LiberationMono-Bold"
+BODY_FONT_SIZE = 20
+BODY_FILL = (0, 80, 0)
+AUTHOR_FONT = "FreeMonoBold"
+AUTHOR_FONT_SIZE = 16
+AUTHOR_FILL = (0, 0, 0)
+CAPTION_FONTS = ((BODY_FONT, BODY_FONT_SIZE), (AUTHOR_FONT, AUTHOR_FONT_SIZE))
+# Everything besides the source image, quote, width and seed that affects the rendered pixels.
+_STYLE_KEY = (RENDERER_VERSION, BODY_FONT, BODY_FONT_SIZE, BODY_FILL, AUTHOR_FONT, AUTHOR_FONT_SIZE, AUTHOR_FILL,
+              SALIENCY_CELL_PX, PLACEMENT_CANDIDATE_FRACTION, DARK_REGION_LUMINANCE)
+# Everything besides `_STYLE_KEY` that affects the frames of an animated meme.
+_ANIMATION_STYLE_KEY = (ANIMATION_COLORS, DEFAULT_FRAME_MS)
+# File extensions of still and animated memes in the output store.
+STILL_SUFFIX = ".jpg"
+ANIMATION_SUFFIX = ".gif"
+# Source images each batch worker decodes ahead of its first job.
+MAX_WARM_UP_TEMPLATES = 64
+# Milliseconds each caption is shown for in the animations of `MemeEngine.render_animations`.
+ANIMATION_FRAME_MS = 2000
+SPRITE_SHEET_BACKGROUND = (255, 255, 255)
+
+
+class MemeJob(NamedTuple):
+    """Parameters of one meme in a batch passed to `MemeEngine.make_memes`."""
+
+    image_path: str
+    quote_body: str
+    quote_author: str
+    width_px: int = MAX_IMAGE_WIDTH_PX
+    seed: Optional[int] = None
+
+
+class BatchResult(NamedTuple):
+    """The outcome of one job of `MemeEngine.make_memes`: the path of its meme, or the error that stopped it."""
+
+    job: MemeJob
+    path: Optional[str] = None
+    error: Optional[Exception] = None
+
+
+class RenderedMeme(NamedTuple):
+    """An encoded meme returned by `MemeEngine.render_bytes`."""
+
+    data: bytes
+    etag: str
+    mimetype: str
+
+
+class MemeVariant(NamedTuple):
+    """One caption at one width of the memes returned by `MemeEngine.render_variants`."""
+
+    width_px: int
+    quote_body: str
+    quote_author: str
+    meme: RenderedMeme
+
+
+class SpriteBox(NamedTuple):
+    """Where one caption at one width sits in a sprite sheet, in pixels from its top left corner."""
+
+    width_px: int
+    quote_body: str
+    quote_author: str
+    x: int
+    y: int
+    width: int
+    height: int
+
+
+class SpriteSheet(NamedTuple):
+    """An encoded sheet of memes returned by `MemeEngine.render_sprite_sheet`, with the box of each."""
+
+    meme: RenderedMeme
+    boxes: List[SpriteBox]
 
 
 class MemeEngine:
     """Base class that creates memes."""
 
-    output_image_path: str
+    output_store: OutputStore
+    template_cache: TemplateCache
+    caption_cache: CaptionCache
+    animation_limits: AnimationLimits
 
-    def __init__(self, output_dir) -> None:
+    def __init__(
+            self,
+            output_dir: str,
+            max_entries: Optional[int] = DEFAULT_MAX_ENTRIES,
+            max_bytes: Optional[int] = None,
+            template_cache: Optional[TemplateCache] = None,
+            caption_cache: Optional[CaptionCache] = None,
+            animation_limits: AnimationLimits = DEFAULT_ANIMATION_LIMITS,
+        ) -> None:
         """Construct a new `MemeEngine` that would write output images to the specified directory.
 
+        Each distinct meme is written to its own file named after a hash of its render
+        parameters, so concurrent renders never overwrite each other and repeated
+        requests are served from the directory without being drawn again.
+        Source images are decoded and resized once and then kept in `template_cache`, and
+        captions are rasterized once and then kept as layers in `caption_cache`.
+        Memes of animated images are animated GIFs, kept in `output_store` alongside the
+        still memes and counted against the same caps.
+
         :param output_dir: A string of output directory path
+        :param max_entries: An integer cap on the number of kept output images, or None for no cap.
+        :param max_bytes: An integer cap on the total size of kept output images in bytes, or None for no cap.
+        :param template_cache: A TemplateCache of resized source images. Defaults to a new one with the default budget.
+        :param caption_cache: A CaptionCache of rendered caption layers. Defaults to a new one with the default budget.
+        :param animation_limits: An AnimationLimits of the largest animated image `make_meme` renders.
         """
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-        self.output_image_path = str(os.path.join(output_dir, "output.jpg"))
+        self.output_store = OutputStore(output_dir, max_entries=max_entries, max_bytes=max_bytes,
+                                        suffixes=(STILL_SUFFIX, ANIMATION_SUFFIX))
+        self.template_cache = template_cache if template_cache is not None else TemplateCache()
+        self.caption_cache = caption_cache if caption_cache is not None else CaptionCache()
+        self.animation_limits = animation_limits
+        font_registry.warm_up(CAPTION_FONTS)
 
     def make_meme(
             self,
-            image_path: str,
+            image_path: Union[str, BinaryIO],
             quote_body: str,
             quote_author: str,
-            width_px: int = MAX_IMAGE_WIDTH_PX
+            width_px: int = MAX_IMAGE_WIDTH_PX,
+            seed: Optional[int] = None,
         ) -> str:
         """Create a meme image with the supplied quote and return the output file path.
 
-        :param image_path: A String path of the supplied image file.
+        The caption is placed on one of the least busy regions of the image, picked by the seed,
+        so the same parameters always give the same meme. An animated image gives an animated
+        GIF, rendered and written a frame at a time with the caption of its first frame.
+
+        :param image_path: A String path of the supplied image file, or a seekable binary file-like object of its content.
         :param quote_body: A String of quote body.
         :param quote_author: A String of quote author.
         :param width_px: A integer of image width in pixels that the image should be resized to. Defaults to `MAX_IMAGE_WIDTH_PX`.
+        :param seed: An integer seed of the caption placement. Defaults to one derived from the quote.
         :return: A String path of the produced meme image file with a quote caption.
+        :raises AnimationTooLarge: If the image is animated and exceeds `animation_limits`.
+        """
+        key = _make_output_key(_image_digest(image_path), quote_body, quote_author, width_px, seed)
+        animated = is_animated(image_path)
+        if animated:
+            key = _make_animation_key(key)
+        suffix = ANIMATION_SUFFIX if animated else STILL_SUFFIX
+        output_path = self.output_store.get(key, suffix)
+        if output_path is not None:
+            return output_path
+
+        if animated:
+            return self.output_store.put(key, lambda path: _save_animated_meme(
+                path, image_path, quote_body, quote_author, width_px, seed, self.caption_cache, self.animation_limits),
+                suffix)
+
+        img = self._render(image_path, quote_body, quote_author, width_px, seed)
+        return self.output_store.put(key, lambda path: _save_jpeg(img, path), suffix)
+
+    def render_bytes(
+            self,
+            image_path: Union[str, BinaryIO],
+            quote_body: str,
+            quote_author: str,
+            width_px: int = MAX_IMAGE_WIDTH_PX,
+            encoding: ImageEncoding = DEFAULT_ENCODING,
+            seed: Optional[int] = None,
+        ) -> RenderedMeme:
+        """Create a meme image with the supplied quote and return it encoded in memory, without touching the output store.
+
+        :param image_path: A String path of the supplied image file, or a seekable binary file-like object of its content.
+        :param quote_body: A String of quote body.
+        :param quote_author: A String of quote author.
+        :param width_px: A integer of image width in pixels that the image should be resized to. Defaults to `MAX_IMAGE_WIDTH_PX`.
+        :param encoding: An ImageEncoding of the output format and its options. Defaults to JPEG.
+        :param seed: An integer seed of the caption placement. Defaults to one derived from the quote.
+        :return: A RenderedMeme with the encoded bytes, their MIME type and an ETag identifying the render.
+        """
+        etag = self.render_etag(image_path, quote_body, quote_author, width_px, encoding, seed)
+        img = self._render(image_path, quote_body, quote_author, width_px, seed)
+        return RenderedMeme(encode_image(img, encoding), etag, encoding.mimetype)
+
+    def render_etag(
+            self,
+            image_path: Union[str, BinaryIO],
+            quote_body: str,
+            quote_author: str,
+            width_px: int = MAX_IMAGE_WIDTH_PX,
+            encoding: ImageEncoding = DEFAULT_ENCODING,
+            seed: Optional[int] = None,
+        ) -> str:
+        """Return the ETag `render_bytes` gives the meme, without rendering it.
+
+        The ETag is a hash of everything that determines the encoded bytes, so a client
+        holding a meme with the same ETag can be answered without rendering.
+
+        :param image_path: A String path of the supplied image file, or a seekable binary file-like object of its content.
+        :param quote_body: A String of quote body.
+        :param quote_author: A String of quote author.
+        :param width_px: A integer of image width in pixels.
+        :param encoding: An ImageEncoding of the output format and its options.
+        :param seed: An integer seed of the caption placement.
+        :return: A String hex digest.
+        """
+        return OutputStore.make_key(_make_output_key(_image_digest(image_path), quote_body, quote_author, width_px, seed),
+                                    encoding)
+
+    def render_variants(
+            self,
+            image_path: Union[str, BinaryIO],
+            captions: Sequence[Tuple[str, str]],
+            widths: Sequence[int] = (MAX_IMAGE_WIDTH_PX,),
+            encoding: ImageEncoding = DEFAULT_ENCODING,
+            seed: Optional[int] = None,
+        ) -> List[MemeVariant]:
+        """Create a meme of every caption at every width, decoding the source image only once.
+
+        The image is decoded and resized to the largest width, and every smaller width is
+        resized from the next larger one, so M widths and N captions cost one decode and M
+        resizes instead of M * N of each. Memes at the largest width are identical to those
+        of `render_bytes`, and share their ETag.
+
+        :param image_path: A String path of the supplied image file, or a seekable binary file-like object of its content.
+        :param captions: A non-empty sequence of (quote body, quote author) String tuples.
+        :param widths: A non-empty sequence of integer widths in pixels. Defaults to `MAX_IMAGE_WIDTH_PX`.
+        :param encoding: An ImageEncoding of the output format and its options. Defaults to JPEG.
+        :param seed: An integer seed of the caption placements. Defaults to one derived from each quote.
+        :return: A list of MemeVariant from the largest width to the smallest, and by caption within a width.
+        """
+        return [MemeVariant(width_px, body, author, RenderedMeme(encode_image(img, encoding), OutputStore.make_key(key, encoding),
+                                                                 encoding.mimetype))
+                for width_px, body, author, key, img in self._render_variants(image_path, captions, widths, seed)]
+
+    def render_sprite_sheet(
+            self,
+            image_path: Union[str, BinaryIO],
+            captions: Sequence[Tuple[str, str]],
+            widths: Sequence[int] = (MAX_IMAGE_WIDTH_PX,),
+            encoding: ImageEncoding = DEFAULT_ENCODING,
+            seed: Optional[int] = None,
+        ) -> SpriteSheet:
+        """Create the memes of `render_variants` packed into one image, a row per width and a column per caption.
+
+        :param image_path: A String path of the supplied image file, or a seekable binary file-like object of its content.
+        :param captions: A non-empty sequence of (quote body, quote author) String tuples.
+        :param widths: A non-empty sequence of integer widths in pixels. Defaults to `MAX_IMAGE_WIDTH_PX`.
+        :param encoding: An ImageEncoding of the output format and its options. Defaults to JPEG.
+        :param seed: An integer seed of the caption placements. Defaults to one derived from each quote.
+        :return: A SpriteSheet of the encoded sheet and the box of every meme in it.
+        """
+        rows: Dict[int, List[Tuple[str, str, str, Image.Image]]] = {}
+        for width_px, body, author, key, img in self._render_variants(image_path, captions, widths, seed):
+            rows.setdefault(width_px, []).append((body, author, key, img))
+
+        sheet_width = max(sum(img.size[0] for *_, img in row) for row in rows.values())
+        sheet_height = sum(max(img.size[1] for *_, img in row) for row in rows.values())
+        sheet = Image.new("RGB", (sheet_width, sheet_height), SPRITE_SHEET_BACKGROUND)
+        boxes = []
+        y = 0
+        for width_px, row in rows.items():
+            x = 0
+            for body, author, _, img in row:
+                sheet.paste(img, (x, y))
+                boxes.append(SpriteBox(width_px, body, author, x, y, img.size[0], img.size[1]))
+                x += img.size[0]
+            y += max(img.size[1] for *_, img in row)
+
+        etag = OutputStore.make_key("sprite", tuple(key for row in rows.values() for _, _, key, _ in row), encoding)
+        return SpriteSheet(RenderedMeme(encode_image(sheet, encoding), etag, encoding.mimetype), boxes)
+
+    def render_animations(
+            self,
+            image_path: Union[str, BinaryIO],
+            captions: Sequence[Tuple[str, str]],
+            widths: Sequence[int] = (MAX_IMAGE_WIDTH_PX,),
+            encoding: ImageEncoding = ImageEncoding(format="WEBP"),
+            frame_ms: int = ANIMATION_FRAME_MS,
+            seed: Optional[int] = None,
+        ) -> Dict[int, RenderedMeme]:
+        """Create the memes of `render_variants` as one looping animation per width, a frame per caption.
+
+        :param image_path: A String path of the supplied image file, or a seekable binary file-like object of its content.
+        :param captions: A non-empty sequence of (quote body, quote author) String tuples.
+        :param widths: A non-empty sequence of integer widths in pixels. Defaults to `MAX_IMAGE_WIDTH_PX`.
+        :param encoding: An ImageEncoding of an animated format, WEBP or GIF, and its options. Defaults to WebP.
+        :param frame_ms: An integer of the milliseconds each caption is shown for. Defaults to `ANIMATION_FRAME_MS`.
+        :param seed: An integer seed of the caption placements. Defaults to one derived from each quote.
+        :return: A dict of the encoded animation by width, from the largest width to the smallest.
+        """
+        frames: Dict[int, List[Tuple[str, Image.Image]]] = {}
+        for width_px, _, _, key, img in self._render_variants(image_path, captions, widths, seed):
+            frames.setdefault(width_px, []).append((key, img))
+        return {width_px: RenderedMeme(encode_animation([img for _, img in row], encoding, frame_ms),
+                                       OutputStore.make_key("animation", tuple(key for key, _ in row), encoding, frame_ms),
+                                       encoding.mimetype)
+                for width_px, row in frames.items()}
+
+    def _render_variants(
+            self,
+            image_path: Union[str, BinaryIO],
+            captions: Sequence[Tuple[str, str]],
+            widths: Sequence[int],
+            seed: Optional[int],
+        ) -> Iterator[Tuple[int, str, str, str, Image.Image]]:
+        if not captions or not widths:
+            raise ValueError("At least one caption and one width are needed to render variants.")
+        widths = sorted(set(widths), reverse=True)
+        digest = _image_digest(image_path)
+        if isinstance(image_path, str):
+            level, saliency = self.template_cache.get_with_saliency(image_path, widths[0])
+        else:
+            level = open_image_resized(image_path, widths[0])
+            saliency = _saliency_map(level)
+        for i, width_px in enumerate(widths):
+            if i:
+                # Each level of the pyramid is resampled from the one above, which is no longer needed.
+                with metrics.timer("meme_stage_seconds", stage="resize"):
+                    resize_image_with_aspect_ratio_maintained(level, width_px)
+                saliency = _saliency_map(level)
+            for quote_body, quote_author in captions:
+                key = _make_output_key(digest, quote_body, quote_author, width_px, seed)
+                if i:
+                    # Resampled from a smaller image than `render_bytes` resizes from, so its pixels differ slightly.
+                    key = OutputStore.make_key(key, "pyramid", tuple(widths[:i]))
+                with metrics.timer("meme_render_seconds"):
+                    img = level.copy()
+                    _add_quote_in_image(img, quote_body, quote_author, self.caption_cache, saliency, seed)
+                yield width_px, quote_body, quote_author, key, img
+
+    def _render(
+            self,
+            image_path: Union[str, BinaryIO],
+            quote_body: str,
+            quote_author: str,
+            width_px: int,
+            seed: Optional[int],
+        ) -> Image.Image:
+        with metrics.timer("meme_render_seconds"):
+            # One-off uploads are not worth a place in the template cache.
+            if isinstance(image_path, str):
+                img, saliency = self.template_cache.get_with_saliency(image_path, width_px)
+            else:
+                img = open_image_resized(image_path, width_px)
+                saliency = _saliency_map(img)
+            _add_quote_in_image(img, quote_body, quote_author, self.caption_cache, saliency, seed)
+        return img
+
+    def make_memes(
+            self,
+            jobs: Iterable[MemeJob],
+            processes: Optional[int] = None,
+            max_pending: Optional[int] = None,
+        ) -> Iterator[BatchResult]:
+        """Create many memes across a pool of worker processes and yield them as they finish.
+
+        Jobs whose meme is already in the output store are yielded without being
+        rendered again. A job that fails, such as one whose image cannot be read, is
+        yielded with its error and the rest of the batch carries on. Every worker warms up the caption fonts and the first distinct
+        source images of the batch before rendering, and keeps its own template cache.
+        Animated images give animated GIFs, as with `make_meme`.
+
+        :param jobs: An iterable of `MemeJob`; image paths must be String paths.
+        :param processes: An integer number of worker processes. Defaults to the number of CPUs.
+        :param max_pending: An integer cap on the number of jobs submitted but not yet yielded.
+            Defaults to four times the number of worker processes.
+        :return: An iterator of BatchResult in completion order.
         """
-        img = Image.open(image_path)
-        _resize_image_with_aspect_ratio_maintained(img, width_px)
-        _add_quote_in_image(img, quote_body, quote_author)
-        img.save(self.output_image_path)
+        jobs = iter(jobs)
+        processes = processes or os.cpu_count() or 1
+        max_pending = max_pending or 4 * processes
+        head = list(itertools.islice(jobs, max_pending))
+        warm_up_templates = list(dict.fromkeys((job.image_path, job.width_px) for job in head))[:MAX_WARM_UP_TEMPLATES]
+        pending: Dict[concurrent.futures.Future, Tuple[MemeJob, str, str]] = {}
 
-        return self.output_image_path
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=processes,
+                initializer=_init_batch_worker,
+                initargs=(warm_up_templates, self.template_cache.max_bytes, self.caption_cache.max_bytes, self.animation_limits),
+            ) as executor:
+            for job in itertools.chain(head, jobs):
+                try:
+                    key = _make_output_key(file_digest(job.image_path), job.quote_body, job.quote_author, job.width_px, job.seed)
+                    animated = is_animated(job.image_path)
+                    if animated:
+                        key = _make_animation_key(key)
+                    suffix = ANIMATION_SUFFIX if animated else STILL_SUFFIX
+                    output_path = self.output_store.get(key, suffix)
+                except Exception as e:
+                    yield BatchResult(job, error=e)
+                    continue
+                if output_path is not None:
+                    yield BatchResult(job, output_path)
+                    continue
+                pending[executor.submit(_render_batch_job, job, self.output_store.path_for(key, suffix), animated)] = (job, key, suffix)
+                if len(pending) >= max_pending:
+                    yield from self._collect_batch_results(pending, concurrent.futures.FIRST_COMPLETED)
+            yield from self._collect_batch_results(pending, concurrent.futures.ALL_COMPLETED)
 
+    def _collect_batch_results(self, pending, return_when: str) -> Iterator[BatchResult]:
+        done, _ = concurrent.futures.wait(pending, return_when=return_when)
+        for future in done:
+            job, key, suffix = pending.pop(future)
+            error = future.exception()
+            yield BatchResult(job, error=error) if error is not None else BatchResult(job, self.output_store.adopt(key, suffix))
 
-def _resize_image_with_aspect_ratio_maintained(image: Image.Image, max_width_px: int) -> None:
-    w_percent = (max_width_px / float(image.size[0]))
-    h_px = int((float(image.size[1]) * float(w_percent)))
-    image.thumbnail((max_width_px, h_px), Image.Resampling.LANCZOS)
 
+def _add_quote_in_image(
+        image: Image.Image,
+        quote_body: str,
+        quote_author: str,
+        caption_cache: Optional[CaptionCache] = None,
+        saliency: Optional[SaliencyMap] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+    _quote_on_image(image, quote_body, quote_author, caption_cache, saliency, seed).draw()
 
-def _add_quote_in_image(image: Image.Image, quote_body: str, quote_author: str) -> None:
+
+def _quote_on_image(
+        image: Image.Image,
+        quote_body: str,
+        quote_author: str,
+        caption_cache: Optional[CaptionCache],
+        saliency: Optional[SaliencyMap],
+        seed: Optional[int],
+    ) -> QuoteOnImage:
+    if seed is None:
+        # Derived from the quote, so a meme without a seed is still reproducible.
+        seed = zlib.crc32(f"{quote_body}\n{quote_author}".encode("utf-8"))
     image_draw = ImageDraw.Draw(image)
-    quote_on_image = QuoteOnImage(
+    return QuoteOnImage(
         body=TextOnImage(
             text=f"\"{quote_body}\"",
             image_draw=image_draw,
-            font="LiberationMono-Bold",
-            font_size=20,
-            fill=(0, 80, 0),
+            font=BODY_FONT,
+            font_size=BODY_FONT_SIZE,
+            fill=BODY_FILL,
         ),
         author=TextOnImage(
             text=f"- {quote_author}",
             image_draw=image_draw,
-            font="FreeMonoBold",
-            font_size=16,
-            fill=(0, 0, 0),
+            font=AUTHOR_FONT,
+            font_size=AUTHOR_FONT_SIZE,
+            fill=AUTHOR_FILL,
         ),
         image_size=image.size,
+        image=image,
+        caption_cache=caption_cache,
+        saliency=saliency,
+        seed=seed,
     )
-    quote_on_image.draw()
+
+
+def _save_animated_meme(
+        path: str,
+        image_path: Union[str, BinaryIO],
+        quote_body: str,
+        quote_author: str,
+        width_px: int,
+        seed: Optional[int],
+        caption_cache: CaptionCache,
+        limits: AnimationLimits,
+    ) -> None:
+    with metrics.timer("meme_render_seconds"), open_animation(image_path, limits) as image, open(path, "wb") as f:
+        with GifWriter(f, image.info.get("loop")) as writer:
+            for frame, duration_ms in iter_frames_resized(image, width_px):
+                if not writer.frames:
+                    # Laid out and placed once, on the first frame, and pasted unchanged onto every frame.
+                    layer, coord = _quote_on_image(
+                        frame, quote_body, quote_author, caption_cache, _saliency_map(frame), seed).render_layer()
+                with metrics.timer("meme_stage_seconds", stage="caption"):
+                    frame.paste(layer, coord, layer)
+                writer.write(frame, duration_ms)
+        size = f.tell()
+    metrics.count("meme_encoded_bytes_total", size, format="GIF")
+
+
+def _save_jpeg(image: Image.Image, path: str) -> None:
+    with metrics.timer("meme_stage_seconds", stage="encode"):
+        image.save(path, format="JPEG")
+    if metrics.is_enabled():
+        metrics.count("meme_encoded_bytes_total", os.path.getsize(path), format="JPEG")
+
+
+def _image_digest(image_path: Union[str, BinaryIO]) -> str:
+    return file_digest(image_path) if isinstance(image_path, str) else stream_digest(image_path)
+
+
+def _make_output_key(image_digest: str, quote_body: str, quote_author: str, width_px: int, seed: Optional[int]) -> str:
+    return OutputStore.make_key(image_digest, quote_body, quote_author, width_px, seed, _STYLE_KEY)
+
+
+def _make_animation_key(output_key: str) -> str:
+    return OutputStore.make_key(output_key, _ANIMATION_STYLE_KEY)
+
+
+def _saliency_map(image: Image.Image) -> SaliencyMap:
+    with metrics.timer("meme_stage_seconds", stage="saliency"):
+        return SaliencyMap.from_image(image)
+
+
+_worker_template_cache: Optional[TemplateCache] = None
+_worker_caption_cache: Optional[CaptionCache] = None
+_worker_animation_limits: AnimationLimits = DEFAULT_ANIMATION_LIMITS
+
+
+def _init_batch_worker(
+        warm_up_templates: List[Tuple[str, int]],
+        template_cache_bytes: int,
+        caption_cache_bytes: int,
+        animation_limits: AnimationLimits,
+    ) -> None:
+    global _worker_template_cache, _worker_caption_cache, _worker_animation_limits
+    font_registry.warm_up(CAPTION_FONTS)
+    _worker_template_cache = TemplateCache(max_bytes=template_cache_bytes)
+    _worker_caption_cache = CaptionCache(max_bytes=caption_cache_bytes)
+    _worker_animation_limits = animation_limits
+    for image_path, width_px in warm_up_templates:
+        try:
+            _worker_template_cache.get(image_path, width_px)
+        except Exception:
+            # Left to fail its job instead of the whole pool, whose initializer this is.
+            pass
+
+
+def _render_batch_job(job: MemeJob, output_path: str, animated: bool) -> None:
+    if animated:
+        write_atomically(output_path, lambda path: _save_animated_meme(
+            path, job.image_path, job.quote_body, job.quote_author, job.width_px, job.seed,
+            _worker_caption_cache, _worker_animation_limits))
+        return
+    with metrics.timer("meme_render_seconds"):
+        img, saliency = _worker_template_cache.get_with_saliency(job.image_path, job.width_px)
+        _add_quote_in_image(img, job.quote_body, job.quote_author, _worker_caption_cache, saliency, job.seed)
+    write_atomically(output_path, lambda path: _save_jpeg(img, path))
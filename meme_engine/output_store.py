@@ -0,0 +1,246 @@
+"""Provide a content-addressed store for produced meme images.
+
+'OutputStore' keeps every rendered meme under a file name derived from a hash of
+everything that determines its pixels, so identical requests are served from disk
+instead of being decoded and drawn again.
+"""
+import hashlib
+import io
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, Callable, Dict, Optional, Sequence, Tuple
+
+from telemetry import metrics
+
+DEFAULT_MAX_ENTRIES = 1024
+_DIGEST_CHUNK_BYTES = 1 << 16
+_MAX_MEMOIZED_DIGESTS = 4096
+# Names of stored images are keys returned by `make_key`; other files in the directory are never adopted or evicted.
+_KEY_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+
+class OutputStore:
+    """A directory of meme images keyed by render parameters and file extension, with LRU eviction."""
+
+    directory: str
+    max_entries: Optional[int]
+    max_bytes: Optional[int]
+    suffixes: Tuple[str, ...]
+    hits: int
+    misses: int
+    evictions: int
+
+    def __init__(
+            self,
+            directory: str,
+            max_entries: Optional[int] = DEFAULT_MAX_ENTRIES,
+            max_bytes: Optional[int] = None,
+            suffixes: Sequence[str] = (".jpg",),
+        ) -> None:
+        """Construct a new `OutputStore` that keeps images in the specified directory.
+
+        Images already present in the directory are adopted, oldest first, so the
+        cache survives restarts. Only files named after a key are adopted, so other
+        files sharing the directory are never evicted. Images of every suffix share
+        one LRU order and the caps.
+
+        :param directory: A string of the directory path to store images in.
+        :param max_entries: An integer cap on the number of stored images, or None for no cap.
+        :param max_bytes: An integer cap on the total size of stored images in bytes, or None for no cap.
+        :param suffixes: A sequence of the file extensions of stored images, the first being the default.
+        """
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.suffixes = tuple(suffixes)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Sizes of the stored images by file name, least recently used first.
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load_existing_entries()
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Return a hex digest identifying a render from its parameters.
+
+        :param parts: Any values whose `repr` fully describes the render.
+        :return: A String hex digest.
+        """
+        return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str, suffix: Optional[str] = None) -> str:
+        """Return the file path an image with the supplied key and suffix is stored at."""
+        return os.path.join(self.directory, self._name(key, suffix))
+
+    def get(self, key: str, suffix: Optional[str] = None) -> Optional[str]:
+        """Return the path of a stored image, or None if it is not stored.
+
+        :param key: A String key as returned by `make_key`.
+        :param suffix: A String of one of `suffixes`. Defaults to the first.
+        :return: A String path of the stored image, or None on a miss.
+        """
+        name = self._name(key, suffix)
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            if name in self._entries and os.path.exists(path):
+                self._entries.move_to_end(name)
+                self.hits += 1
+                metrics.count("meme_cache_requests_total", cache="output", result="hit")
+                return path
+            self._forget(name)
+            self.misses += 1
+        metrics.count("meme_cache_requests_total", cache="output", result="miss")
+        return None
+
+    def put(self, key: str, write: Callable[[str], None], suffix: Optional[str] = None) -> str:
+        """Store an image under the supplied key and return its path.
+
+        The image is written to a temporary file in the store directory which is then
+        atomically renamed, so readers never observe a partially written image.
+
+        :param key: A String key as returned by `make_key`.
+        :param write: A callable that writes the image to the file path it is given.
+        :param suffix: A String of one of `suffixes`. Defaults to the first.
+        :return: A String path of the stored image.
+        """
+        write_atomically(self.path_for(key, suffix), write)
+        return self.adopt(key, suffix)
+
+    def adopt(self, key: str, suffix: Optional[str] = None) -> str:
+        """Start tracking an image another process has already written to `path_for(key, suffix)`.
+
+        :param key: A String key as returned by `make_key`.
+        :param suffix: A String of one of `suffixes`. Defaults to the first.
+        :return: A String path of the stored image.
+        """
+        name = self._name(key, suffix)
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            self._forget(name)
+            size = os.path.getsize(path)
+            self._entries[name] = size
+            self._total_bytes += size
+            self._evict()
+        return path
+
+    def stats(self) -> Dict[str, int]:
+        """Return the hit, miss and eviction counters along with the current store size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+            }
+
+    def _name(self, key: str, suffix: Optional[str]) -> str:
+        if suffix is None:
+            return key + self.suffixes[0]
+        if suffix not in self.suffixes:
+            raise ValueError(f"The store does not keep \"{suffix}\" images.")
+        return key + suffix
+
+    def _forget(self, name: str) -> None:
+        size = self._entries.pop(name, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _is_over_capacity(self) -> bool:
+        if self.max_entries is not None and len(self._entries) > self.max_entries:
+            return True
+        return self.max_bytes is not None and self._total_bytes > self.max_bytes
+
+    def _evict(self) -> None:
+        # Never evict the entry that was just written, even if it alone exceeds `max_bytes`.
+        while len(self._entries) > 1 and self._is_over_capacity():
+            name, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            _remove_quietly(os.path.join(self.directory, name))
+
+    def _load_existing_entries(self) -> None:
+        existing = []
+        for entry in os.scandir(self.directory):
+            key, suffix = os.path.splitext(entry.name)
+            if suffix in self.suffixes and _KEY_PATTERN.fullmatch(key) and entry.is_file():
+                stat = entry.stat()
+                existing.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(existing):
+            self._entries[name] = size
+            self._total_bytes += size
+        self._evict()
+
+
+_file_digests: Dict[Tuple[str, int, int], str] = {}
+
+
+def file_digest(path: str) -> str:
+    """Return a hex digest of a file's content, memoized on its path, size and mtime.
+
+    :param path: A String path of the file.
+    :return: A String hex digest of the file content.
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    digest = _file_digests.get(memo_key)
+    if digest is None:
+        hasher = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_DIGEST_CHUNK_BYTES), b""):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+        if len(_file_digests) >= _MAX_MEMOIZED_DIGESTS:
+            _file_digests.clear()
+        _file_digests[memo_key] = digest
+    return digest
+
+
+def stream_digest(stream: BinaryIO) -> str:
+    """Return a hex digest of a binary stream's content, leaving its position unchanged.
+
+    :param stream: A seekable binary file-like object.
+    :return: A String hex digest of the stream content.
+    """
+    if isinstance(stream, io.BytesIO):
+        with stream.getbuffer() as view:
+            return hashlib.sha256(view).hexdigest()
+
+    position = stream.tell()
+    stream.seek(0)
+    hasher = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(_DIGEST_CHUNK_BYTES), b""):
+        hasher.update(chunk)
+    stream.seek(position)
+    return hasher.hexdigest()
+
+
+def write_atomically(path: str, write: Callable[[str], None]) -> None:
+    """Write a file through a temporary file in the same directory and rename it into place.
+
+    :param path: A String path of the file to write.
+    :param write: A callable that writes the file content to the path it is given.
+    """
+    directory, name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(suffix=os.path.splitext(name)[1], prefix=".tmp-", dir=directory or ".")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        _remove_quietly(tmp_path)
+        raise
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,136 @@
+"""Provide placement of captions on the least busy region of a template image.
+
+'SaliencyMap' divides an image into cells and records how busy each cell is, from the
+strength of the edges in it, and how bright it is. Both are kept as summed-area tables,
+so the busy-ness or brightness of any rectangle of cells is read from its four corners
+in constant time. Placing a caption scores every position it fits in with a few array
+operations over the cells and never reads the image's pixels, so the map is computed
+once per template and cached with it by 'TemplateCache'.
+
+`SaliencyMap.place` picks among the least busy positions with a `random.Random` seeded
+by the caller, so the same seed places a caption at the same position.
+"""
+import math
+import random
+from typing import TYPE_CHECKING, Optional, Tuple
+
+from PIL import Image
+
+if TYPE_CHECKING:
+    import numpy
+
+# Side of a cell of the map in image pixels.
+SALIENCY_CELL_PX = 8
+# Fraction of the positions a caption fits in, least busy first, that a placement picks from.
+PLACEMENT_CANDIDATE_FRACTION = 0.05
+# Samples per cell side the image is reduced to before its edges are measured.
+_SAMPLES_PER_CELL = 4
+
+
+class SaliencyMap:
+    """Summed-area tables of the busy-ness and brightness of an image, by cell."""
+
+    size: Tuple[int, int]
+    cell_size: Tuple[float, float]
+
+    def __init__(self, size: Tuple[int, int], busy_table: "numpy.ndarray", luminance_table: "numpy.ndarray") -> None:
+        """Construct a new `SaliencyMap`; use `from_image` to compute one.
+
+        :param size: A tuple of the (width, height) in pixels of the image the map describes.
+        :param busy_table: A summed-area table of the busy-ness of the cells, one row and column larger than the cells.
+        :param luminance_table: A summed-area table of the mean luminance of the cells, the shape of `busy_table`.
+        """
+        self.size = size
+        self._rows = busy_table.shape[0] - 1
+        self._cols = busy_table.shape[1] - 1
+        self.cell_size = (size[0] / self._cols, size[1] / self._rows)
+        self._busy_table = busy_table
+        self._luminance_table = luminance_table
+
+    @classmethod
+    def from_image(cls, image: Image.Image, cell_px: int = SALIENCY_CELL_PX) -> "SaliencyMap":
+        """Compute the map of an image.
+
+        :param image: An `Image.Image`.
+        :param cell_px: An integer of the side of a cell in image pixels.
+        :return: A SaliencyMap.
+        """
+        # Imported here, so loading the meme engine does not import NumPy.
+        import numpy as np
+
+        cols = max(1, round(image.size[0] / cell_px))
+        rows = max(1, round(image.size[1] / cell_px))
+        gray = image.convert("L").resize((cols * _SAMPLES_PER_CELL, rows * _SAMPLES_PER_CELL), Image.Resampling.BOX)
+        gray = np.asarray(gray, dtype=np.float32)
+        edges = np.zeros_like(gray)
+        edges[:, 1:] += np.abs(np.diff(gray, axis=1))
+        edges[1:, :] += np.abs(np.diff(gray, axis=0))
+        busy = edges.reshape(rows, _SAMPLES_PER_CELL, cols, _SAMPLES_PER_CELL).mean(axis=(1, 3))
+        luminance = gray.reshape(rows, _SAMPLES_PER_CELL, cols, _SAMPLES_PER_CELL).mean(axis=(1, 3))
+        return cls(image.size, _summed_area_table(busy), _summed_area_table(luminance))
+
+    @property
+    def nbytes(self) -> int:
+        """Get the size of the tables in bytes."""
+        return self._busy_table.nbytes + self._luminance_table.nbytes
+
+    def busyness(self, coord: Tuple[int, int], box_size: Tuple[int, int]) -> float:
+        """Return the mean busy-ness of the cells a box covers.
+
+        :param coord: A tuple of the (x, y) of the box's top-left corner in pixels.
+        :param box_size: A tuple of the (width, height) of the box in pixels.
+        :return: A float of the mean absolute difference between neighbouring samples, 0 for a flat region.
+        """
+        return self._mean(self._busy_table, coord, box_size)
+
+    def mean_luminance(self, coord: Tuple[int, int], box_size: Tuple[int, int]) -> float:
+        """Return the mean luminance of the cells a box covers.
+
+        :param coord: A tuple of the (x, y) of the box's top-left corner in pixels.
+        :param box_size: A tuple of the (width, height) of the box in pixels.
+        :return: A float between 0 (black) and 255 (white).
+        """
+        return self._mean(self._luminance_table, coord, box_size)
+
+    def place(self, box_size: Tuple[int, int], seed: Optional[int] = None) -> Tuple[int, int]:
+        """Pick the top-left corner of a box among the least busy positions it fits in.
+
+        :param box_size: A tuple of the (width, height) of the box in pixels. A box larger than the
+            image is placed at its edge and clipped rather than failing.
+        :param seed: An integer seed of the pick; None picks from the `random` module's state.
+        :return: A tuple of the (x, y) of the box's top-left corner in pixels.
+        """
+        import numpy as np
+
+        span_cols = min(self._cols, max(1, math.ceil(box_size[0] / self.cell_size[0])))
+        span_rows = min(self._rows, max(1, math.ceil(box_size[1] / self.cell_size[1])))
+        costs = _window_sums(self._busy_table, span_rows, span_cols)
+        count = max(1, int(costs.size * PLACEMENT_CANDIDATE_FRACTION))
+        # Sorted, so the seed picks the same candidate whatever order the partition leaves them in.
+        candidates = np.sort(np.argpartition(costs, count - 1, axis=None)[:count])
+        rng = random.Random(seed) if seed is not None else random
+        row, col = divmod(int(candidates[rng.randrange(count)]), costs.shape[1])
+        x = min(int(col * self.cell_size[0]), max(0, self.size[0] - box_size[0]))
+        y = min(int(row * self.cell_size[1]), max(0, self.size[1] - box_size[1]))
+        return (x, y)
+
+    def _mean(self, table: "numpy.ndarray", coord: Tuple[int, int], box_size: Tuple[int, int]) -> float:
+        col0 = min(self._cols - 1, max(0, int(coord[0] / self.cell_size[0])))
+        row0 = min(self._rows - 1, max(0, int(coord[1] / self.cell_size[1])))
+        col1 = min(self._cols, max(col0 + 1, math.ceil((coord[0] + box_size[0]) / self.cell_size[0])))
+        row1 = min(self._rows, max(row0 + 1, math.ceil((coord[1] + box_size[1]) / self.cell_size[1])))
+        total = table[row1, col1] - table[row0, col1] - table[row1, col0] + table[row0, col0]
+        return float(total) / ((row1 - row0) * (col1 - col0))
+
+
+def _summed_area_table(cells: "numpy.ndarray") -> "numpy.ndarray":
+    import numpy as np
+
+    table = np.zeros((cells.shape[0] + 1, cells.shape[1] + 1), dtype=np.float64)
+    np.cumsum(np.cumsum(cells, axis=0, dtype=np.float64), axis=1, out=table[1:, 1:])
+    return table
+
+
+def _window_sums(table: "numpy.ndarray", rows: int, cols: int) -> "numpy.ndarray":
+    """Return the sum of every window of rows x cols cells, indexed by the window's top-left cell."""
+    return table[rows:, cols:] - table[:-rows, cols:] - table[rows:, :-cols] + table[:-rows, :-cols]
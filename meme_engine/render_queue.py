@@ -0,0 +1,230 @@
+"""Provide a bounded queue that renders memes in the background.
+
+'RenderQueue' runs render jobs on a fixed pool of worker threads, so a request that
+submits a job returns immediately and a slow download only occupies a worker. The
+queue rejects jobs once too many are pending, reports jobs that exceed their
+deadline as timed out, supports cancellation and coalesces identical jobs that are
+in flight into one render.
+"""
+import concurrent.futures
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from .exception import RenderQueueFull
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_MAX_PENDING = 32
+DEFAULT_JOB_TIMEOUT_S = 30.0
+DEFAULT_MAX_FINISHED = 1024
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TIMED_OUT = "timed_out"
+FINISHED_STATES = (DONE, FAILED, CANCELLED, TIMED_OUT)
+
+
+class RenderJob:
+    """A render submitted to a `RenderQueue`, shared by every identical submission while it is in flight."""
+
+    job_id: str
+    key: Hashable
+    state: str
+    result: Any
+    error: Optional[Exception]
+    submitted_at: float
+    deadline: float
+
+    def __init__(self, key: Hashable, timeout_s: float) -> None:
+        """Construct a new queued `RenderJob`.
+
+        :param key: A hashable value identifying the render, used to coalesce identical jobs.
+        :param timeout_s: A float of the seconds after submission at which the job times out.
+        """
+        self.job_id = uuid.uuid4().hex
+        self.key = key
+        self.state = QUEUED
+        self.result = None
+        self.error = None
+        self.submitted_at = time.monotonic()
+        self.deadline = self.submitted_at + timeout_s
+        self._finished = threading.Event()
+        self._future: Optional[concurrent.futures.Future] = None
+
+    @property
+    def finished(self) -> bool:
+        """Get whether the job is done, failed, cancelled or timed out."""
+        return self.state in FINISHED_STATES
+
+
+class RenderQueue:
+    """Run render jobs on a bounded pool of worker threads."""
+
+    max_pending: int
+    job_timeout_s: float
+    max_finished: int
+    submitted: int
+    coalesced: int
+    rejected: int
+
+    def __init__(
+            self,
+            max_workers: int = DEFAULT_MAX_WORKERS,
+            max_pending: int = DEFAULT_MAX_PENDING,
+            job_timeout_s: float = DEFAULT_JOB_TIMEOUT_S,
+            max_finished: int = DEFAULT_MAX_FINISHED,
+        ) -> None:
+        """Construct a new `RenderQueue`.
+
+        :param max_workers: An integer number of worker threads rendering jobs concurrently.
+        :param max_pending: An integer cap on the jobs that are queued or running; further jobs are rejected.
+        :param job_timeout_s: A float of the seconds after submission at which a job times out.
+        :param max_finished: An integer number of finished jobs kept so their results can still be polled.
+        """
+        self.max_pending = max_pending
+        self.job_timeout_s = job_timeout_s
+        self.max_finished = max_finished
+        self.submitted = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="render")
+        self._jobs: "OrderedDict[str, RenderJob]" = OrderedDict()
+        self._in_flight: Dict[Hashable, RenderJob] = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, key: Hashable, render: Callable[[], Any]) -> RenderJob:
+        """Queue a render, or join the identical render already in flight.
+
+        :param key: A hashable value identifying the render; jobs with equal keys are coalesced.
+        :param render: A callable without arguments that renders and returns the result.
+        :return: A RenderJob to poll or wait on.
+        :raises RenderQueueFull: If `max_pending` jobs are already queued or running.
+        """
+        with self._lock:
+            job = self._in_flight.get(key)
+            if job is not None:
+                self._expire(job)
+                if not job.finished:
+                    self.coalesced += 1
+                    return job
+
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise RenderQueueFull(f"{self._pending} render jobs are already pending.")
+
+            job = RenderJob(key, self.job_timeout_s)
+            self._jobs[job.job_id] = job
+            self._in_flight[key] = job
+            self._pending += 1
+            self.submitted += 1
+            job._future = self._executor.submit(self._run, job, render)
+            return job
+
+    def get(self, job_id: str) -> Optional[RenderJob]:
+        """Return the job with the id, or None if it is unknown or has been forgotten.
+
+        :param job_id: A String job id as returned in `RenderJob.job_id`.
+        :return: A RenderJob, or None.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._expire(job)
+            return job
+
+    def wait(self, job: RenderJob, timeout: Optional[float] = None) -> bool:
+        """Block until the job has finished, it reaches its deadline or the timeout elapses.
+
+        :param job: A RenderJob of this queue.
+        :param timeout: A float of the maximum seconds to wait, or None to wait up to the job deadline.
+        :return: A boolean whether the job has finished.
+        """
+        remaining = job.deadline - time.monotonic()
+        job._finished.wait(max(0.0, remaining if timeout is None else min(timeout, remaining)))
+        with self._lock:
+            self._expire(job)
+        return job.finished
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that has not finished.
+
+        A queued job never starts; the result of a running job is discarded when its render returns.
+        The job is cancelled for every submission it was coalesced with.
+
+        :param job_id: A String job id as returned in `RenderJob.job_id`.
+        :return: A boolean whether the job was cancelled.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            self._expire(job)
+            if job.finished:
+                return False
+            self._finish(job, CANCELLED)
+            if job._future.cancel():
+                self._pending -= 1
+            return True
+
+    def stats(self) -> Dict[str, int]:
+        """Return the submission counters along with the number of pending and retained jobs."""
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "coalesced": self.coalesced,
+                "rejected": self.rejected,
+                "pending": self._pending,
+                "jobs": len(self._jobs),
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the workers, cancelling the jobs that have not started."""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, job: RenderJob, render: Callable[[], Any]) -> None:
+        try:
+            with self._lock:
+                self._expire(job)
+                if job.state != QUEUED:
+                    return
+                job.state = RUNNING
+
+            try:
+                result, error = render(), None
+            except Exception as e:
+                result, error = None, e
+
+            with self._lock:
+                # A job cancelled or timed out while running keeps that state.
+                self._expire(job)
+                if job.state == RUNNING:
+                    job.result = result
+                    job.error = error
+                    self._finish(job, DONE if error is None else FAILED)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _expire(self, job: RenderJob) -> None:
+        if not job.finished and time.monotonic() >= job.deadline:
+            self._finish(job, TIMED_OUT)
+
+    def _finish(self, job: RenderJob, state: str) -> None:
+        job.state = state
+        if self._in_flight.get(job.key) is job:
+            del self._in_flight[job.key]
+        job._finished.set()
+        # Forget the oldest finished jobs beyond the retention limit; unfinished jobs are always kept.
+        excess = len(self._jobs) - len(self._in_flight) - self.max_finished
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id].finished:
+                del self._jobs[job_id]
+                excess -= 1
@@ -0,0 +1,111 @@
+"""Provide an in-memory cache of decoded and resized template images.
+
+'TemplateCache' keeps each source image already resized to the meme width, so a
+render only pays for copying the pixels it draws on instead of re-decoding them.
+Each template is kept with its `SaliencyMap`, so placing a caption on it does not
+read its pixels either.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Iterable, NamedTuple, Tuple
+
+from PIL import Image
+
+from telemetry import metrics
+
+from .image_utils import open_image_resized
+from .placement import SaliencyMap
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class _Template(NamedTuple):
+    mtime_ns: int
+    image: Image.Image
+    saliency: SaliencyMap
+    nbytes: int
+
+
+class TemplateCache:
+    """A thread-safe LRU cache of resized images keyed by (path, width), bounded by memory."""
+
+    max_bytes: int
+    hits: int
+    misses: int
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        """Construct a new `TemplateCache`.
+
+        :param max_bytes: An integer cap on the total size of cached pixel data in bytes.
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._templates: "OrderedDict[Tuple[str, int], _Template]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, image_path: str, width_px: int) -> Image.Image:
+        """Return a copy of the image resized to the width, which the caller may draw on.
+
+        The cached image is reloaded if the file has been modified since it was cached.
+
+        :param image_path: A String path of the image file.
+        :param width_px: An integer of maximum image width in pixels.
+        :return: An RGB `Image.Image` owned by the caller.
+        """
+        return self.get_with_saliency(image_path, width_px)[0]
+
+    def get_with_saliency(self, image_path: str, width_px: int) -> Tuple[Image.Image, SaliencyMap]:
+        """Return a copy of the image resized to the width, as `get` does, with its saliency map.
+
+        :param image_path: A String path of the image file.
+        :param width_px: An integer of maximum image width in pixels.
+        :return: A tuple of an RGB `Image.Image` owned by the caller and its shared SaliencyMap.
+        """
+        key = (os.path.abspath(image_path), width_px)
+        mtime_ns = os.stat(image_path).st_mtime_ns
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None and template.mtime_ns == mtime_ns:
+                self._templates.move_to_end(key)
+                self.hits += 1
+                metrics.count("meme_cache_requests_total", cache="template", result="hit")
+                return template.image.copy(), template.saliency
+            self.misses += 1
+        metrics.count("meme_cache_requests_total", cache="template", result="miss")
+
+        image = open_image_resized(image_path, width_px)
+        with metrics.timer("meme_stage_seconds", stage="saliency"):
+            saliency = SaliencyMap.from_image(image)
+        template = _Template(mtime_ns, image, saliency, len(image.getbands()) * image.size[0] * image.size[1] + saliency.nbytes)
+        with self._lock:
+            self._forget(key)
+            self._templates[key] = template
+            self._total_bytes += template.nbytes
+            self._evict()
+        return image.copy(), saliency
+
+    def warm_up(self, image_paths: Iterable[str], width_px: int) -> None:
+        """Load the supplied images ahead of time.
+
+        :param image_paths: An iterable of String paths of image files.
+        :param width_px: An integer of maximum image width in pixels.
+        """
+        for image_path in image_paths:
+            self.get(image_path, width_px)
+
+    def __len__(self) -> int:
+        """Return the number of cached images."""
+        return len(self._templates)
+
+    def _forget(self, key: Tuple[str, int]) -> None:
+        template = self._templates.pop(key, None)
+        if template is not None:
+            self._total_bytes -= template.nbytes
+
+    def _evict(self) -> None:
+        while self._templates and self._total_bytes > self.max_bytes:
+            _, template = self._templates.popitem(last=False)
+            self._total_bytes -= template.nbytes
@@ -0,0 +1,231 @@
+"""Provide a text layout engine that wraps captions by exact pixel width.
+
+`layout_text` breaks a text into lines that fit a maximum width in pixels, using the
+advance widths of its words measured once per font, and returns a `TextLayout`
+holding the lines, their widths, baselines and bounding box. Layouts are memoized
+and hold no reference to an image, so one layout is drawn onto any number of images.
+"""
+import functools
+import threading
+from collections import OrderedDict
+from typing import List, NamedTuple, Sequence, Tuple
+
+from PIL import ImageDraw
+
+from .font_registry import FontSpec, font_registry
+
+GREEDY = "greedy"
+BALANCED = "balanced"
+LAYOUT_CACHE_SIZE = 4096
+# Word widths kept per font; words come from user captions, so the least recently used are dropped.
+WORD_WIDTH_CACHE_SIZE = 16384
+# Words per text above which balanced breaking falls back to greedy, bounding its quadratic cost.
+MAX_BALANCED_WORDS = 256
+
+
+class TextLayout(NamedTuple):
+    """Lines of text broken to a maximum width, positioned relative to the top-left corner of their box."""
+
+    lines: Tuple[str, ...]
+    line_widths: Tuple[int, ...]
+    baselines: Tuple[int, ...]
+    width: int
+    height: int
+    max_width: int
+    font: str
+    font_size: int
+    stroke_width: int
+
+    @property
+    def bbox(self) -> Tuple[int, int, int, int]:
+        """Get the (left, top, right, bottom) box that contains every drawn pixel, stroke included."""
+        return (0, 0, self.width, self.height)
+
+    @property
+    def overflows(self) -> bool:
+        """Get whether a line is wider than the maximum width."""
+        return self.width > self.max_width
+
+    def draw(
+            self,
+            image_draw: ImageDraw.ImageDraw,
+            origin: Tuple[int, int],
+            fill: Tuple[int, ...],
+            stroke_fill: Tuple[int, ...] = (255, 255, 255),
+        ) -> None:
+        """Draw the lines with the box's top-left corner at the origin.
+
+        :param image_draw: A ImageDraw.ImageDraw instance of the image to draw on.
+        :param origin: A tuple of two integers of the coordinate of the box's top-left corner.
+        :param fill: A tuple of the color of the text.
+        :param stroke_fill: A tuple of the color of the text outline.
+        """
+        image_font = font_registry.get(self.font, self.font_size)
+        x = origin[0] + self.stroke_width
+        for line, baseline in zip(self.lines, self.baselines):
+            image_draw.text(
+                (x, origin[1] + baseline),
+                line,
+                font=image_font,
+                fill=fill,
+                anchor="ls",
+                stroke_width=self.stroke_width,
+                stroke_fill=stroke_fill,
+            )
+
+
+class _FontMetrics:
+    """Advance widths of recently used words in one font, measured once and shared by every layout."""
+
+    def __init__(self, spec: FontSpec, max_words: int = WORD_WIDTH_CACHE_SIZE) -> None:
+        self._font = font_registry.get(*spec)
+        self._max_words = max_words
+        self._widths: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.space_width = self._font.getlength(" ")
+        ascent, descent = self._font.getmetrics()
+        self.ascent = ascent
+        self.descent = descent
+
+    def word_widths(self, words: Sequence[str]) -> List[float]:
+        measured = {}
+        with self._lock:
+            for word in words:
+                if word in measured:
+                    continue
+                width = self._widths.get(word)
+                if width is None:
+                    width = self._widths[word] = self._font.getlength(word)
+                else:
+                    self._widths.move_to_end(word)
+                measured[word] = width
+            while len(self._widths) > self._max_words:
+                self._widths.popitem(last=False)
+        return [measured[word] for word in words]
+
+    def text_width(self, text: str) -> int:
+        return int(self._font.getlength(text) + 0.5)
+
+
+@functools.lru_cache(maxsize=64)
+def _font_metrics(font: str, font_size: int) -> _FontMetrics:
+    return _FontMetrics((font, font_size))
+
+
+@functools.lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def layout_text(
+        font: str,
+        font_size: int,
+        text: str,
+        max_width: int,
+        strategy: str = GREEDY,
+        line_height: int = 0,
+        stroke_width: int = 1,
+    ) -> TextLayout:
+    """Break the text into lines no wider than the maximum width and position them.
+
+    Words are measured once per font; a word that alone is wider than the line is
+    broken between characters. The greedy strategy fills each line as far as it goes,
+    the balanced strategy minimizes the sum of squared slack of all but the last line
+    so that lines have similar widths.
+
+    :param font: A string of font that is avaiable on the system.
+    :param font_size: An integer of font size.
+    :param text: A string of text to lay out.
+    :param max_width: An integer of maximum line width in pixels, stroke included.
+    :param strategy: A string of the line breaking strategy, `GREEDY` or `BALANCED`.
+    :param line_height: An integer of the distance between baselines in pixels. Defaults to the font size.
+    :param stroke_width: An integer of the width of the text outline in pixels.
+    :return: A TextLayout.
+    """
+    metrics = _font_metrics(font, font_size)
+    available = max(1, max_width - 2 * stroke_width)
+    words = _split_long_words(metrics, text.split(), available)
+    if not words:
+        words = [""]
+    widths = metrics.word_widths(words)
+    if strategy == BALANCED and len(words) <= MAX_BALANCED_WORDS:
+        breaks = _balanced_breaks(widths, metrics.space_width, available)
+    elif strategy in (GREEDY, BALANCED):
+        breaks = _greedy_breaks(widths, metrics.space_width, available)
+    else:
+        raise ValueError(f"Unknown line breaking strategy \"{strategy}\".")
+
+    lines = tuple(" ".join(words[start:end]) for start, end in zip(breaks, breaks[1:]))
+    # Measure each finished line once, so widths account for kerning and rounding exactly.
+    line_widths = tuple(metrics.text_width(line) + 2 * stroke_width for line in lines)
+    line_height = line_height or font_size
+    first_baseline = metrics.ascent + stroke_width
+    baselines = tuple(first_baseline + i * line_height for i in range(len(lines)))
+    height = baselines[-1] + metrics.descent + stroke_width
+    return TextLayout(lines, line_widths, baselines, max(line_widths), height, max_width, font, font_size, stroke_width)
+
+
+def _split_long_words(metrics: _FontMetrics, words: List[str], available: int) -> List[str]:
+    widths = metrics.word_widths(words)
+    if all(width <= available for width in widths):
+        return words
+    split = []
+    for word, width in zip(words, widths):
+        if width <= available:
+            split.append(word)
+            continue
+        split.extend(_split_word(metrics, word, available))
+    return split
+
+
+def _split_word(metrics: _FontMetrics, word: str, available: int) -> List[str]:
+    # Each piece is the longest prefix of the rest that fits, found from the summed widths of its characters
+    # and corrected by measuring the pieces around that guess, so a long word costs a few measurements per line.
+    char_widths = metrics.word_widths(list(word))
+    pieces = []
+    start = 0
+    while start < len(word):
+        end = start + 1
+        summed = char_widths[start]
+        while end < len(word) and summed + char_widths[end] <= available:
+            summed += char_widths[end]
+            end += 1
+        while end < len(word) and metrics.text_width(word[start:end + 1]) <= available:
+            end += 1
+        while end > start + 1 and metrics.text_width(word[start:end]) > available:
+            end -= 1
+        pieces.append(word[start:end])
+        start = end
+    return pieces
+
+
+def _greedy_breaks(widths: List[float], space: float, available: int) -> List[int]:
+    breaks = [0]
+    line_width = widths[0]
+    for i in range(1, len(widths)):
+        if line_width + space + widths[i] > available:
+            breaks.append(i)
+            line_width = widths[i]
+        else:
+            line_width += space + widths[i]
+    breaks.append(len(widths))
+    return breaks
+
+
+def _balanced_breaks(widths: List[float], space: float, available: int) -> List[int]:
+    n = len(widths)
+    # cost[i] is the least raggedness of laying out words[i:], next_break[i] where its first line ends.
+    cost = [0.0] * (n + 1)
+    next_break = [n] * (n + 1)
+    for i in range(n - 1, -1, -1):
+        cost[i] = float("inf")
+        line_width = -space
+        for j in range(i + 1, n + 1):
+            line_width += space + widths[j - 1]
+            if line_width > available and j > i + 1:
+                break
+            slack = 0.0 if j == n else (available - line_width) ** 2
+            if slack + cost[j] < cost[i]:
+                cost[i] = slack + cost[j]
+                next_break[i] = j
+
+    breaks = [0]
+    while breaks[-1] < n:
+        breaks.append(next_break[breaks[-1]])
+    return breaks
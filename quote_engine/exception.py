@@ -11,3 +11,7 @@ class InvalidFilePath(Exception):
 class UnsupportedFileType(Exception):
 	"""An exception for unsupported file type."""
 	pass
+
+class PDFConversionError(Exception):
+	"""An exception for a PDF that pdftotext failed to convert to text."""
+	pass
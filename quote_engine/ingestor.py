@@ -1,33 +1,328 @@
 """Provide one interface to load any supported file type.
 
 'Ingestor' concrete class inherites from 'IngestorInterface' abstract class.
-It is a strategy object that encapsulates all the ingestors, including
-'TextIngestor', `DocxIngestor`, `PDFIngestor` and `CSVIngestor`.
- abstract class defines the interface for ingestors.
+It is a strategy object that dispatches every file to the ingestor registered for its
+format, including 'TextIngestor', `DocxIngestor`, `PDFIngestor` and `CSVIngestor`.
+
+Ingestors are registered by file extension with `Ingestor.register`, or by installed
+packages under the `quote_engine.ingestors` entry point group. A file goes to the ingestor
+of its extension; only a file whose extension is missing or unknown is recognized by the
+magic numbers its leading bytes match. `.gz` and `.zst` files are decompressed while the
+inner ingestor reads them.
 """
+import collections
+import concurrent.futures
+import functools
+import glob
+import io
+import os
+import threading
+import time
+import warnings
+from telemetry import metrics
+from .exception import UnsupportedFileType
 from .ingestor_utils import IngestorInterface, TextIngestor, DocxIngestor, PDFIngestor, CSVIngestor
-from .quote_model import QuoteModel
-from typing import Iterable
+from .quote_model import ParseStats, QuoteModel
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Type
+
+DEFAULT_MAX_WORKERS = 4
+ENTRY_POINT_GROUP = "quote_engine.ingestors"
+# Leading bytes read to recognize a file's compression and format.
+SNIFF_BYTES = 16
+
+
+class IngestResult(NamedTuple):
+    """The outcome of ingesting one file with `Ingestor.parse_many`."""
+
+    path: str
+    quotes: List[QuoteModel]
+    error: Optional[Exception] = None
+    malformed: int = 0
+
+
+def _open_gzip(path: str) -> BinaryIO:
+    import gzip
+
+    return gzip.open(path, 'rb')
+
+
+def _open_zstd(path: str) -> BinaryIO:
+    try:
+        import zstandard
+    except ImportError as e:
+        raise UnsupportedFileType(f"Cannot decompress \"{path}\": the zstandard package is not installed.") from e
+
+    stream = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    # Buffered, so the decompressed content can be peeked at.
+    return io.BufferedReader(stream)
+
+
+# Compressed file extensions and the magic number and decompressing opener of their format.
+CODECS: Dict[str, Tuple[bytes, Callable[[str], BinaryIO]]] = {
+    ".gz": (b"\x1f\x8b", _open_gzip),
+    ".zst": (b"\x28\xb5\x2f\xfd", _open_zstd),
+}
 
 
 class Ingestor(IngestorInterface):
     """Concrete ingestor class that can load any supported file type."""
 
-    ingestors = [TextIngestor, DocxIngestor, PDFIngestor, CSVIngestor]
     # Implement class inheritance in Python using the strategy object design pattern
     # and apply DRY (don't repeat yourself) principles.
-    # All ingestors are packaged into a main Ingestor class.
-    # This class encapsulates all the ingestors to provide one interface to load any supported file type.
+    # All ingestors are registered with a main Ingestor class, which looks up the
+    # ingestor of a file by its extension in constant time.
+    _by_extension: Dict[str, Type[IngestorInterface]] = {}
+    _by_magic: List[Tuple[bytes, Type[IngestorInterface]]] = []
+    _plugins_loaded = False
+    _lock = threading.Lock()
+
+    @classmethod
+    def register(cls, ingestor: Type[IngestorInterface]) -> Type[IngestorInterface]:
+        """Register an ingestor for its `allowed_file_extensions` and `magic_numbers`.
+
+        A later registration of an extension or magic number replaces the earlier one, so a
+        plugin can take over a built-in format. Returns the ingestor, so it can decorate the class.
+        Ingestors registered at runtime reach the process pool of `parse_many` only if they are
+        registered when their module is imported; plugins are loaded in every process.
+
+        :param ingestor: A subclass of IngestorInterface.
+        :return: The registered ingestor.
+        """
+        with cls._lock:
+            for extension in ingestor.allowed_file_extensions:
+                cls._by_extension[extension.lower()] = ingestor
+            for magic in ingestor.magic_numbers:
+                cls._by_magic = [(magic, ingestor)] + [entry for entry in cls._by_magic if entry[0] != magic]
+        return ingestor
 
     @classmethod
-    def parse(cls, path: str) -> Iterable[QuoteModel]:
+    def ingestor_for_extension(cls, extension: str) -> Optional[Type[IngestorInterface]]:
+        """Get the ingestor registered for a file extension.
+
+        :param extension: A String file extension including the dot, such as ".txt".
+        :return: The registered ingestor, or None if the extension is not supported.
+        """
+        if not cls._plugins_loaded:
+            cls._load_plugins()
+        return cls._by_extension.get(extension.lower())
+
+    @classmethod
+    def can_digest(cls, path: str) -> bool:
+        """Check if the supplied file can be digested or not, by its extension or else its content.
+
+        :param path: A String path of the file that contains quotes.
+        :return: A boolean result whether the supplied 'path' file can be digested or not.
+        """
+        try:
+            cls._resolve(path)
+        except (OSError, UnsupportedFileType):
+            return False
+        return True
+
+    @classmethod
+    def parse(cls, path: str, stats: Optional[ParseStats] = None) -> Iterable[QuoteModel]:
         """Get a iterable of QuoteModel digested from the supplied file.
 
+        Quotes are yielded while the file is read, so files of any size are ingested in bounded memory.
+        Compressed files are decompressed as they are read, without writing the content to disk.
+
         :param path: A String path of the file that contains quotes.
+        :param stats: A ParseStats to count the parsed quotes and skipped malformed entries in.
         :return: A iterable of QuoteModel digested from the supplied file.
+        :raises UnsupportedFileType: If no registered ingestor recognizes the file.
+        """
+        if not metrics.is_enabled():
+            return cls._parse(path, stats)[1]
+
+        start = time.perf_counter()
+        stats = stats if stats is not None else ParseStats()
+        try:
+            ingestor, quotes = cls._parse(path, stats)
+        except Exception:
+            metrics.count("quote_ingested_files_total", format="unknown", result="error")
+            raise
+        return _iter_recorded(quotes, _format_label(ingestor), stats, start)
+
+    @classmethod
+    def parse_many(cls, paths: Iterable[str], max_workers: int = DEFAULT_MAX_WORKERS) -> Iterator[IngestResult]:
+        """Get an iterator of the quotes digested from each supplied file, parsing the files concurrently.
+
+        Ingestors that wait on a subprocess run in a thread pool and CPU-bound ingestors in a
+        process pool. Results are yielded in the order of `paths` as soon as each is ready,
+        and a file that fails to parse is reported in its result without aborting the others.
+
+        :param paths: An iterable of String paths of the files that contain quotes.
+        :param max_workers: An integer number of workers per pool, which also bounds how far
+            ahead of the consumer files are parsed.
+        :return: An iterator of IngestResult, one per supplied path.
         """
-        for ingestor in cls.ingestors:
+        pending = collections.deque()
+        process_pool = None
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as thread_pool:
+            try:
+                for path in paths:
+                    ingestor = cls._find_ingestor(path)
+                    if ingestor.executor_kind == "process":
+                        if process_pool is None:
+                            process_pool = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+                        pool = process_pool
+                    else:
+                        pool = thread_pool
+                    pending.append((path, _format_label(ingestor), pool.submit(_parse_to_list, path)))
+                    if len(pending) >= 2 * max_workers:
+                        yield _ingest_result(*pending.popleft())
+                while pending:
+                    yield _ingest_result(*pending.popleft())
+            finally:
+                if process_pool is not None:
+                    process_pool.shutdown(cancel_futures=True)
+
+    @classmethod
+    def parse_dir(cls, directory: str, pattern: str = "**/*", max_workers: int = DEFAULT_MAX_WORKERS) -> Iterator[IngestResult]:
+        """Get an iterator of the quotes digested from every supported file in a directory tree.
+
+        :param directory: A String path of the directory to search.
+        :param pattern: A String glob pattern relative to the directory; `**` matches any subdirectories.
+        :param max_workers: An integer number of workers per pool.
+        :return: An iterator of IngestResult, one per supported file, in sorted path order.
+        """
+        paths = sorted(path for path in glob.glob(os.path.join(directory, pattern), recursive=True)
+                       if os.path.isfile(path) and cls.can_digest(path))
+        return cls.parse_many(paths, max_workers=max_workers)
+
+    @classmethod
+    def _find_ingestor(cls, path: str) -> Type[IngestorInterface]:
+        try:
+            return cls._resolve(path)
+        except (OSError, UnsupportedFileType):
+            # Unsupported files fail in a worker like any other file, and are reported in their result.
+            return IngestorInterface
+
+    @classmethod
+    def _parse(cls, path: str, stats: Optional[ParseStats]) -> Tuple[Type[IngestorInterface], Iterable[QuoteModel]]:
+        ingestor, open_stream = cls._resolve_opener(path)
+        if open_stream is None:
+            return ingestor, ingestor.parse(path, stats)
+        return ingestor, _iter_stream(ingestor, open_stream, stats)
+
+    @classmethod
+    def _resolve(cls, path: str) -> Type[IngestorInterface]:
+        return cls._resolve_opener(path)[0]
+
+    @classmethod
+    def _resolve_opener(cls, path: str) -> Tuple[Type[IngestorInterface], Optional[Callable[[], BinaryIO]]]:
+        """Find the ingestor of a file, and the opener of a stream of its content unless it is parsed by path.
+
+        The file is only opened to read its leading bytes when its extension is missing, unknown or a codec's.
+        """
+        name, extension = os.path.splitext(path)
+        extension = extension.lower()
+        if extension not in CODECS:
+            ingestor = cls.ingestor_for_extension(extension)
+            if ingestor is not None:
+                return ingestor, None
+
+        with open(path, 'rb') as f:
+            head = f.read(SNIFF_BYTES)
+        open_codec = next((opener for magic, opener in CODECS.values() if head.startswith(magic)), None)
+        if open_codec is None:
+            ingestor = cls._sniff(head)
+            if ingestor is None:
+                raise UnsupportedFileType(f"Cannot ingest the file \"{path}\".")
             if ingestor.can_digest(path):
-                return ingestor.parse(path)
-        else:
-            raise NotImplementedError
\ No newline at end of file
+                return ingestor, None
+            # The extension is missing or unknown.
+            return ingestor, functools.partial(open, path, 'rb')
+
+        open_stream = functools.partial(open_codec, path)
+        if extension in CODECS:
+            extension = os.path.splitext(name)[1].lower()
+        ingestor = cls.ingestor_for_extension(extension)
+        if ingestor is None:
+            with open_stream() as stream:
+                ingestor = cls._sniff(stream.peek(SNIFF_BYTES))
+            if ingestor is None:
+                raise UnsupportedFileType(f"Cannot ingest the decompressed content of \"{path}\".")
+        return ingestor, open_stream
+
+    @classmethod
+    def _sniff(cls, head: bytes) -> Optional[Type[IngestorInterface]]:
+        if not cls._plugins_loaded:
+            cls._load_plugins()
+        for magic, ingestor in cls._by_magic:
+            if head.startswith(magic):
+                return ingestor
+        return None
+
+    @classmethod
+    def _load_plugins(cls) -> None:
+        from importlib import metadata
+
+        with cls._lock:
+            if cls._plugins_loaded:
+                return
+            cls._plugins_loaded = True
+            entry_points = metadata.entry_points(group=ENTRY_POINT_GROUP)
+        for entry_point in entry_points:
+            try:
+                cls.register(entry_point.load())
+            except Exception as e:
+                warnings.warn(f"Failed to load the ingestor plugin \"{entry_point.name}\": {e!r}", RuntimeWarning)
+
+
+for _ingestor in (TextIngestor, DocxIngestor, PDFIngestor, CSVIngestor):
+    Ingestor.register(_ingestor)
+
+
+def _iter_stream(
+        ingestor: Type[IngestorInterface],
+        open_stream: Callable[[], BinaryIO],
+        stats: Optional[ParseStats],
+    ) -> Iterator[QuoteModel]:
+    # Opened on the first quote, so an iterator dropped before then holds no file.
+    with open_stream() as stream:
+        yield from ingestor.parse_stream(stream, stats)
+
+
+def _format_label(ingestor: Type[IngestorInterface]) -> str:
+    if ingestor is IngestorInterface:
+        return "unknown"
+    if ingestor.allowed_file_extensions:
+        return ingestor.allowed_file_extensions[0].lstrip(".")
+    return ingestor.__name__
+
+
+def _iter_recorded(quotes: Iterable[QuoteModel], file_format: str, stats: ParseStats, start: float) -> Iterator[QuoteModel]:
+    quotes_before, malformed_before = stats.quotes, stats.malformed
+    result = "error"
+    try:
+        yield from quotes
+        result = "ok"
+    finally:
+        _record_ingest(file_format, result, time.perf_counter() - start,
+                       stats.quotes - quotes_before, stats.malformed - malformed_before)
+
+
+def _record_ingest(file_format: str, result: str, seconds: float, quotes: int, malformed: int) -> None:
+    metrics.observe("quote_ingest_seconds", seconds, format=file_format)
+    metrics.count("quote_ingested_files_total", format=file_format, result=result)
+    metrics.count("quote_ingested_quotes_total", quotes, format=file_format)
+    metrics.count("quote_malformed_total", malformed, format=file_format)
+
+
+def _parse_to_list(path: str) -> Tuple[List[QuoteModel], int, float]:
+    # Recorded by the caller, as a worker process's metrics would be lost.
+    start = time.perf_counter()
+    stats = ParseStats()
+    quotes = list(Ingestor._parse(path, stats)[1])
+    return quotes, stats.malformed, time.perf_counter() - start
+
+
+def _ingest_result(path: str, file_format: str, future: concurrent.futures.Future) -> IngestResult:
+    try:
+        quotes, malformed, seconds = future.result()
+    except Exception as e:
+        metrics.count("quote_ingested_files_total", format=file_format, result="error")
+        return IngestResult(path, [], e)
+    _record_ingest(file_format, "ok", seconds, len(quotes), malformed)
+    return IngestResult(path, quotes, malformed=malformed)
@@ -4,23 +4,37 @@
 
 Four concrete classes that realize the 'IngestorInterface' abstract class including:
 'TextIngestor', `DocxIngestor`, `PDFIngestor` and `CSVIngestor`.
+
+The modules each format backend needs are imported when a file of that format is
+ingested, so importing the ingestors stays cheap.
+
+Each ingestor parses a file by its path with `parse`, or a binary stream, such as a
+decompressed file, with `parse_stream`.
 """
 import abc
+import collections
+import contextlib
+import io
 import os
-import subprocess
-import docx
-import pandas as pd
-import pathlib
+import threading
 
-from typing import Iterable
-from .quote_model import QuoteModel
-from .exception import InvalidFilePath, UnsupportedFileType
+from typing import BinaryIO, Deque, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+from .quote_model import ParseStats, QuoteModel
+from .exception import InvalidFileFormat, InvalidFilePath, PDFConversionError, UnsupportedFileType
+
+# Characters of pdftotext's error output kept for the message of a failed conversion.
+_PDFTOTEXT_STDERR_CHARS = 4096
 
 
 class IngestorInterface(abc.ABC):
     """General interface for ingestors."""
 
     allowed_file_extensions = []  # class attribute, which can be redefined by children classes.
+    # Leading bytes that identify the format whatever the file is named; empty for plain text formats.
+    magic_numbers = []
+    # Pool that `Ingestor.parse_many` runs this ingestor in: "thread" for I/O- or subprocess-bound
+    # parsing, "process" for CPU-bound parsing that would otherwise hold the GIL.
+    executor_kind = "thread"
 
     # Hint: Classmethods can access class attribute
     @classmethod
@@ -31,24 +45,41 @@ class IngestorInterface(abc.ABC):
         :return: A boolean result whether the supplied 'path' file can be digested or not.
         """
         try:
-            file_extension = pathlib.Path(path).suffix
-        except Exception as e:
+            file_extension = os.path.splitext(path)[1].lower()
+        except TypeError as e:
             raise InvalidFilePath(f"Invalid file path \"{path}\".") from e
         return file_extension in cls.allowed_file_extensions
 
     @classmethod
     @abc.abstractmethod
-    def parse(cls, path: str) -> Iterable[QuoteModel]:
+    def parse(cls, path: str, stats: Optional[ParseStats] = None) -> Iterable[QuoteModel]:
         """Get a iterable of QuoteModel digested from the supplied file.
 
         Concrete subclasses must override this method to get the parsed
-        QuoteModel digested from the supplied file.
+        QuoteModel digested from the supplied file. The quotes should be yielded
+        as the file is read, so that files of any size are ingested in bounded memory,
+        and malformed entries should be skipped and counted in `stats`.
 
         :param path: A String path of the file that contains quotes.
+        :param stats: A ParseStats to count the parsed quotes and skipped malformed entries in.
         :return: A iterable of QuoteModel digested from the supplied file.
         """
         raise NotImplementedError
 
+    @classmethod
+    def parse_stream(cls, stream: BinaryIO, stats: Optional[ParseStats] = None) -> Iterable[QuoteModel]:
+        """Get a iterable of QuoteModel digested from a binary stream of a file's content.
+
+        Subclasses that can read their format from a stream override this method, which lets
+        `Ingestor` feed them compressed files and files whose name does not tell their format.
+        The stream is read while the quotes are consumed and is left open for the caller to close.
+
+        :param stream: A binary file object positioned at the start of the content.
+        :param stats: A ParseStats to count the parsed quotes and skipped malformed entries in.
+        :return: A iterable of QuoteModel digested from the stream.
+        """
+        raise UnsupportedFileType(f"{cls.__name__} cannot ingest a stream.")
+
 
 class TextIngestor(IngestorInterface):
     """A concreate text ingestor that can ingest .txt files."""
@@ -56,98 +87,401 @@ class TextIngestor(IngestorInterface):
     allowed_file_extensions = [".txt"]
 
     @classmethod
-    def parse(cls, path: str) -> Iterable[QuoteModel]:
+    def parse(cls, path: str, stats: Optional[ParseStats] = None) -> Iterable[QuoteModel]:
         """Get a iterable of QuoteModel digested from the supplied file.
 
+        The file is read line by line while the quotes are consumed.
+
         :param path: A String path of the file that contains quotes.
+        :param stats: A ParseStats to count the parsed quotes and skipped malformed lines in.
         :return: A iterable of QuoteModel digested from the supplied file.
         """
         if not cls.can_digest(path):
             raise UnsupportedFileType(f"Cannot ingest the file \"{path}\".")
 
-        with open(path, 'r') as f:
-            return QuoteModel.from_linestr_iter_gen(f.readlines())
+        return QuoteModel.from_linestr_iter_gen(_iter_text_lines(path), stats)
+
+    @classmethod
+    def parse_stream(cls, stream: BinaryIO, stats: Optional[ParseStats] = None) -> Iterable[QuoteModel]:
+        """Get a iterable of QuoteModel digested from a binary stream of UTF-8 text.
+
+        :param stream: A binary file object positioned at the start of the content.
+        :param stats: A ParseStats to count the parsed quotes and skipped malformed lines in.
+        :return: A iterable of QuoteModel digested from the stream.
+        """
+        return QuoteModel.from_linestr_iter_gen(_iter_text_lines(stream), stats)
 
 
 class DocxIngestor(IngestorInterface):
     """A concreate docx ingestor that can ingest .docx files."""
 
     allowed_file_extensions = [".docx"]
+    magic_numbers = [b"PK\x03\x04"]
+    executor_kind = "process"
 
     @classmethod
-    def parse(cls, path: str) -> Iterable[QuoteModel]:
+    def parse(cls, path: str, stats: Optional[ParseStats] = None) -> Iterable[QuoteModel]:
         """Get a iterable of QuoteModel digested from the supplied file.
 
-        This function depends on the `python-docx` library to parse DOCX files.
+        The document body is read paragraph by paragraph with an incremental XML parser,
+        and every paragraph is discarded once its quote has been consumed.
 
         :param path: A String path of the file that contains quotes.
+        :param stats: A ParseStats to count the parsed quotes and skipped malformed paragraphs in.
         :return: A iterable of QuoteModel digested from the supplied file.
         """
         if not cls.can_digest(path):
             raise UnsupportedFileType(f"Cannot ingest the file \"{path}\".")
 
-        doc = docx.Document(path)
-        return QuoteModel.from_linestr_iter_gen([para.text for para in doc.paragraphs])
+        return QuoteModel.from_linestr_iter_gen(_iter_docx_paragraphs(path), stats)
+
+    @classmethod
+    def parse_stream(cls, stream: BinaryIO, stats: Optional[ParseStats] = None) -> Iterable[QuoteModel]:
+        """Get a iterable of QuoteModel digested from a binary stream of a .docx document.
+
+        A .docx document is a zip archive, which is read from its end, so the stream is
+        read into memory first.
+
+        :param stream: A binary file object positioned at the start of the content.
+        :param stats: A ParseStats to count the parsed quotes and skipped malformed paragraphs in.
+        :return: A iterable of QuoteModel digested from the stream.
+        """
+        return QuoteModel.from_linestr_iter_gen(_iter_docx_paragraphs(stream), stats)
+
+
+Source = Union[str, BinaryIO]
+
+
+def _source_name(source: Source) -> str:
+    return source if isinstance(source, str) else getattr(source, "name", "<stream>")
+
+
+def _iter_text_lines(source: Source, newline: Optional[str] = None) -> Iterator[str]:
+    if isinstance(source, str):
+        with open(source, 'r', encoding='utf-8-sig', newline=newline) as f:
+            yield from f
+        return
+
+    f = io.TextIOWrapper(source, encoding='utf-8-sig', newline=newline)
+    try:
+        yield from f
+    finally:
+        # Leave the stream open for its owner.
+        f.detach()
+
+
+_W_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_W_PARAGRAPH = _W_NAMESPACE + "p"
+_W_TEXT = {_W_NAMESPACE + "t": None, _W_NAMESPACE + "tab": "\t", _W_NAMESPACE + "br": "\n", _W_NAMESPACE + "cr": "\n"}
+
+
+def _iter_docx_paragraphs(source: Source) -> Iterator[str]:
+    import zipfile
+    from xml.etree import ElementTree
+
+    if not isinstance(source, str):
+        source = io.BytesIO(source.read())
+    with zipfile.ZipFile(source) as archive, archive.open("word/document.xml") as document:
+        depth = 0
+        body = None
+        for event, element in ElementTree.iterparse(document, events=("start", "end")):
+            if event == "start":
+                depth += 1
+                if depth == 2:
+                    body = element
+                continue
+
+            depth -= 1
+            if depth == 2:
+                # Only paragraphs directly in the body are quotes, not those in tables or other blocks.
+                if element.tag == _W_PARAGRAPH:
+                    yield "".join(_W_TEXT[node.tag] or node.text or "" for node in element.iter() if node.tag in _W_TEXT)
+                # A top-level block of the body has been consumed; drop it to keep memory bounded.
+                body.clear()
 
 
 class PDFIngestor(IngestorInterface):
-    """A concreate docx ingestor that can ingest .docx files."""
+    """A concreate pdf ingestor that can ingest .pdf files."""
 
     allowed_file_extensions = [".pdf"]
+    magic_numbers = [b"%PDF-"]
 
     @classmethod
-    def parse(cls, path: str) -> Iterable[QuoteModel]:
+    def parse(
+            cls,
+            path: str,
+            stats: Optional[ParseStats] = None,
+            first_page: Optional[int] = None,
+            last_page: Optional[int] = None,
+        ) -> Iterable[QuoteModel]:
         """Get a iterable of QuoteModel digested from the supplied file.
 
         This function depends on the `pdftotext` package from the system;
         it utilizes the subprocess module to call the pdftotext CLI utility which
         creates a pipeline that converts PDFs to text, and then it ingests the text.
 
-        This function creates a temporary file and handles its deletion as well.
+        The text is streamed from the pdftotext stdout while it is being converted,
+        so no temporary file is written and any number of PDFs can be parsed concurrently.
 
         :param path: A String path of the file that contains quotes.
+        :param stats: A ParseStats to count the parsed quotes and skipped malformed lines in.
+        :param first_page: An integer of the first page to ingest, 1-based. Defaults to the first page.
+        :param last_page: An integer of the last page to ingest, inclusive. Defaults to the last page.
         :return: A iterable of QuoteModel digested from the supplied file.
+        :raises PDFConversionError: If pdftotext is not available or exits with a non-zero code.
         """
         if not cls.can_digest(path):
             raise UnsupportedFileType(f"Cannot ingest the file \"{path}\".")
 
-        tmp_txt_path = "_tmp_pdf_content.txt"
-        cmd = ['pdftotext', path, tmp_txt_path]
-        process = subprocess.run(cmd)
-        if process.returncode != 0:
-            raise Exception(f"Conversion of {path} from .pdf to .txt has failed.")
+        return QuoteModel.from_linestr_iter_gen(_iter_pdftotext_lines(path, first_page, last_page), stats)
+
+    @classmethod
+    def parse_stream(
+            cls,
+            stream: BinaryIO,
+            stats: Optional[ParseStats] = None,
+            first_page: Optional[int] = None,
+            last_page: Optional[int] = None,
+        ) -> Iterable[QuoteModel]:
+        """Get a iterable of QuoteModel digested from a binary stream of a PDF.
+
+        The stream is piped into the stdin of pdftotext, so no temporary file is written.
+
+        :param stream: A binary file object positioned at the start of the content.
+        :param stats: A ParseStats to count the parsed quotes and skipped malformed lines in.
+        :param first_page: An integer of the first page to ingest, 1-based. Defaults to the first page.
+        :param last_page: An integer of the last page to ingest, inclusive. Defaults to the last page.
+        :return: A iterable of QuoteModel digested from the stream.
+        :raises PDFConversionError: If pdftotext is not available or exits with a non-zero code.
+        """
+        return QuoteModel.from_linestr_iter_gen(_iter_pdftotext_lines(stream, first_page, last_page), stats)
+
+    @classmethod
+    def parse_pages(
+            cls,
+            path: str,
+            first_page: Optional[int] = None,
+            last_page: Optional[int] = None,
+            stats: Optional[ParseStats] = None,
+        ) -> Iterator[Tuple[int, List[QuoteModel]]]:
+        """Get an iterator of the QuoteModel digested from each page of the supplied file, page by page.
+
+        Each page is yielded as soon as pdftotext has converted it, so large PDFs can be
+        ingested incrementally.
 
+        :param path: A String path of the file that contains quotes.
+        :param first_page: An integer of the first page to ingest, 1-based. Defaults to the first page.
+        :param last_page: An integer of the last page to ingest, inclusive. Defaults to the last page.
+        :param stats: A ParseStats to count the parsed quotes and skipped malformed lines in.
+        :return: An iterator of (page number, list of QuoteModel) tuples.
+        :raises PDFConversionError: If pdftotext is not available or exits with a non-zero code.
+        """
+        if not cls.can_digest(path):
+            raise UnsupportedFileType(f"Cannot ingest the file \"{path}\".")
+
+        page_number = first_page or 1
+        page_lines = []
+        for line in _iter_pdftotext_lines(path, first_page, last_page):
+            # pdftotext ends every page with a form feed.
+            while "\f" in line:
+                page_end, line = line.split("\f", 1)
+                page_lines.append(page_end)
+                yield page_number, list(QuoteModel.from_linestr_iter_gen(page_lines, stats))
+                page_number += 1
+                page_lines = []
+            page_lines.append(line)
+        if any(line.strip() for line in page_lines):
+            yield page_number, list(QuoteModel.from_linestr_iter_gen(page_lines, stats))
+
+
+def _iter_pdftotext_lines(source: Source, first_page: Optional[int], last_page: Optional[int]) -> Iterator[str]:
+    import subprocess
+
+    path = _source_name(source)
+    cmd = ['pdftotext', '-enc', 'UTF-8']
+    if first_page is not None:
+        cmd += ['-f', str(first_page)]
+    if last_page is not None:
+        cmd += ['-l', str(last_page)]
+    # pdftotext reads the PDF from its stdin when given "fd://0".
+    cmd += [source if isinstance(source, str) else 'fd://0', '-']
+    stdin = None if isinstance(source, str) else subprocess.PIPE
+
+    try:
+        process = subprocess.Popen(cmd, stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE, encoding='utf-8')
+    except FileNotFoundError as e:
+        raise PDFConversionError(f"Conversion of {path} from .pdf to .txt has failed: pdftotext is not installed.") from e
+
+    feeder = None
+    if stdin is not None:
+        feeder = threading.Thread(target=_feed_stdin, args=(source, process.stdin.buffer), daemon=True)
+        feeder.start()
+    # Read while stdout is, so a damaged PDF's warnings never fill the pipe and stall pdftotext; only the tail is kept.
+    stderr_tail: Deque[str] = collections.deque(maxlen=2)
+    drainer = threading.Thread(target=_drain_stderr, args=(process.stderr, stderr_tail), daemon=True)
+    drainer.start()
+
+    try:
+        yield from process.stdout
+        drainer.join()
+        if process.wait() != 0:
+            stderr = "".join(stderr_tail)[-_PDFTOTEXT_STDERR_CHARS:].strip()
+            raise PDFConversionError(
+                f"Conversion of {path} from .pdf to .txt has failed with exit code {process.returncode}: {stderr}")
+    finally:
+        # Stop the conversion if the consumer stopped reading early.
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
+        drainer.join()
+        process.stderr.close()
+        if feeder is not None:
+            feeder.join()
+
+
+def _drain_stderr(stderr: TextIO, tail: Deque[str]) -> None:
+    for chunk in iter(lambda: stderr.read(_PDFTOTEXT_STDERR_CHARS), ""):
+        tail.append(chunk)
+
+
+def _feed_stdin(source: BinaryIO, stdin: BinaryIO) -> None:
+    import shutil
+
+    try:
+        shutil.copyfileobj(source, stdin)
+    except (BrokenPipeError, ValueError):
+        # pdftotext exited or was killed before it read the whole PDF.
+        pass
+    finally:
         try:
-            with open(tmp_txt_path, 'r') as f:
-                return QuoteModel.from_linestr_iter_gen(f.readlines())
-        finally:
-            os.remove(tmp_txt_path)
+            stdin.close()
+        except BrokenPipeError:
+            pass
 
 
 class CSVIngestor(IngestorInterface):
     """A concreate csv ingestor that can ingest .csv files."""
 
     allowed_file_extensions = [".csv"]
+    executor_kind = "process"
 
     @classmethod
-    def parse(cls, path: str) -> Iterable[QuoteModel]:
+    def parse(
+            cls,
+            path: str,
+            stats: Optional[ParseStats] = None,
+            body_column: str = "body",
+            author_column: str = "author",
+            backend: str = "csv",
+        ) -> Iterable[QuoteModel]:
         """Get a iterable of QuoteModel digested from the supplied file.
 
-        This function depends on the `pandas` library to parse CSV files.
+        The first row of the file is a header. Quotes are read from the columns named
+        `body_column` and `author_column`, and a file whose header does not name both is rejected.
+
+        The default "csv" backend streams the file row by row with the standard library
+        in constant memory. The "pandas" backend loads the whole file with the `pandas`
+        library, which is only imported when this backend is used.
 
         :param path: A String path of the file that contains quotes.
+        :param stats: A ParseStats to count the parsed quotes and skipped malformed rows in.
+        :param body_column: A String name of the column that holds the quote body.
+        :param author_column: A String name of the column that holds the quote author.
+        :param backend: A String of the backend to parse with, "csv" or "pandas".
         :return: A iterable of QuoteModel digested from the supplied file.
+        :raises InvalidFileFormat: If the header does not name the body and author columns.
         """
         if not cls.can_digest(path):
             raise UnsupportedFileType(f"Cannot ingest the file \"{path}\".")
 
+        if backend == "pandas":
+            return cls._parse_with_pandas(path, body_column, author_column, stats)
+        if backend == "csv":
+            return cls._iter_quotes(path, body_column, author_column, stats)
+        raise ValueError(f"Unknown CSV backend \"{backend}\".")
+
+    @classmethod
+    def parse_stream(
+            cls,
+            stream: BinaryIO,
+            stats: Optional[ParseStats] = None,
+            body_column: str = "body",
+            author_column: str = "author",
+            backend: str = "csv",
+        ) -> Iterable[QuoteModel]:
+        """Get a iterable of QuoteModel digested from a binary stream of UTF-8 CSV.
+
+        :param stream: A binary file object positioned at the start of the content.
+        :param stats: A ParseStats to count the parsed quotes and skipped malformed rows in.
+        :param body_column: A String name of the column that holds the quote body.
+        :param author_column: A String name of the column that holds the quote author.
+        :param backend: A String of the backend to parse with, "csv" or "pandas".
+        :return: A iterable of QuoteModel digested from the stream.
+        :raises InvalidFileFormat: If the header does not name the body and author columns.
+        """
+        if backend == "pandas":
+            return cls._parse_with_pandas(stream, body_column, author_column, stats)
+        if backend == "csv":
+            return cls._iter_quotes(stream, body_column, author_column, stats)
+        raise ValueError(f"Unknown CSV backend \"{backend}\".")
+
+    @classmethod
+    def _iter_quotes(cls, source: Source, body_column: str, author_column: str, stats: Optional[ParseStats]) -> Iterator[QuoteModel]:
+        import csv
+
+        path = _source_name(source)
+        try:
+            with contextlib.closing(_iter_text_lines(source, newline='')) as f:
+                reader = csv.reader(f)
+                header = next(reader, None)
+                if header is None:
+                    print(f"Empty data ingested from \"{path}\" file.")
+                    return
+                body_id, author_id = _find_columns(path, header, body_column, author_column)
+                min_row_length = max(body_id, author_id) + 1
+                empty = True
+                for row in reader:
+                    if not row:
+                        continue
+                    empty = False
+                    if len(row) < min_row_length:
+                        if stats is not None:
+                            stats.malformed += 1
+                        continue
+                    if stats is not None:
+                        stats.quotes += 1
+                    yield QuoteModel(body=row[body_id], author=row[author_id])
+        except (OSError, csv.Error) as e:
+            raise Exception(f"Failed to ingest quotes from \"{path}\".") from e
+
+        if empty:
+            print(f"Empty data ingested from \"{path}\" file.")
+
+    @classmethod
+    def _parse_with_pandas(cls, source: Source, body_column: str, author_column: str, stats: Optional[ParseStats]) -> List[QuoteModel]:
+        import pandas as pd
+
+        path = _source_name(source)
         try:
-            data = pd.read_csv(path, header=0).to_dict('split').get('data')
+            df = pd.read_csv(source, header=0)
+            body_id, author_id = _find_columns(path, list(df.columns), body_column, author_column)
+            data = df.iloc[:, [body_id, author_id]].to_dict('split').get('data')
+        except InvalidFileFormat:
+            raise
         except Exception as e:
             raise Exception(f"Failed to ingest quotes from \"{path}\".") from e
 
         if data:
+            if stats is not None:
+                stats.quotes += len(data)
             return [QuoteModel(body=quote[0], author=quote[1]) for quote in data]
         else:
             print(f"Empty data ingested from \"{path}\" file.")
             return []
+
+
+def _find_columns(path: str, header: List[str], body_column: str, author_column: str) -> Tuple[int, int]:
+    if body_column in header and author_column in header:
+        return header.index(body_column), header.index(author_column)
+    raise InvalidFileFormat(f"The header of \"{path}\" does not name the \"{body_column}\" and \"{author_column}\" columns.")
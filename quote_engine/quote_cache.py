@@ -0,0 +1,140 @@
+"""Provide a persistent cache of parsed quote files.
+
+'QuoteCache' wraps `Ingestor.parse` and stores the parsed quotes of each file on disk,
+so a warm start loads them back without running any parser or subprocess.
+A cached file is re-parsed when its size or mtime changes, or optionally its content hash.
+"""
+import hashlib
+import json
+import os
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from telemetry import metrics
+
+from .quote_model import ParseStats, QuoteModel
+
+DEFAULT_CACHE_DIR = "./.cache/quotes"
+CACHE_FORMAT_VERSION = 2
+_HASH_CHUNK_BYTES = 1 << 16
+
+
+class QuoteCache:
+    """An on-disk cache of the quotes parsed from each quote file."""
+
+    cache_dir: str
+    use_content_hash: bool
+    hits: int
+    misses: int
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, use_content_hash: bool = False) -> None:
+        """Construct a new `QuoteCache` that stores parsed quotes in the specified directory.
+
+        :param cache_dir: A string of the cache directory path.
+        :param use_content_hash: A boolean whether to also compare the content hash of a file before
+            trusting its cached quotes, which catches edits that keep the size and mtime.
+        """
+        self.cache_dir = cache_dir
+        self.use_content_hash = use_content_hash
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def parse(self, path: str) -> List[QuoteModel]:
+        """Get a list of QuoteModel digested from the supplied file, from the cache if it is up to date.
+
+        :param path: A String path of the file that contains quotes.
+        :return: A list of QuoteModel digested from the supplied file.
+        """
+        key = self._file_key(path)
+        cache_path = self._cache_path(path)
+        entry = self._load(cache_path, key)
+        if entry is not None:
+            self.hits += 1
+            metrics.count("quote_cache_requests_total", result="hit")
+            return entry[0]
+
+        self.misses += 1
+        metrics.count("quote_cache_requests_total", result="miss")
+        # Imported on a miss only, so a warm start never loads the parser backends.
+        from .ingestor import Ingestor
+        stats = ParseStats()
+        quotes = list(Ingestor.parse(path, stats))
+        self._store(cache_path, key, quotes, stats.malformed)
+        return quotes
+
+    def parse_many(self, paths: Iterable[str]) -> Iterator["IngestResult"]:
+        """Get an iterator of the quotes digested from each supplied file, from the cache where up to date.
+
+        Files that are not cached are parsed concurrently with `Ingestor.parse_many`.
+
+        :param paths: An iterable of String paths of the files that contain quotes.
+        :return: An iterator of IngestResult, one per supplied path, in the order of `paths`.
+        """
+        from .ingestor import Ingestor, IngestResult
+
+        results: List[Optional[IngestResult]] = []
+        misses = []
+        for path in paths:
+            try:
+                key = self._file_key(path)
+            except OSError as e:
+                results.append(IngestResult(path, [], e))
+                continue
+            entry = self._load(self._cache_path(path), key)
+            if entry is None:
+                results.append(None)
+                misses.append((path, key))
+            else:
+                self.hits += 1
+                metrics.count("quote_cache_requests_total", result="hit")
+                quotes, malformed = entry
+                results.append(IngestResult(path, quotes, malformed=malformed))
+
+        parsed = Ingestor.parse_many([path for path, _ in misses]) if misses else iter(())
+        miss_keys = iter(misses)
+        for result in results:
+            if result is None:
+                path, key = next(miss_keys)
+                result = next(parsed)
+                self.misses += 1
+                metrics.count("quote_cache_requests_total", result="miss")
+                if result.error is None:
+                    self._store(self._cache_path(path), key, result.quotes, result.malformed)
+            yield result
+
+    def _file_key(self, path: str) -> dict:
+        stat = os.stat(path)
+        key = {"version": CACHE_FORMAT_VERSION, "path": os.path.abspath(path),
+               "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        if self.use_content_hash:
+            hasher = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(_HASH_CHUNK_BYTES), b""):
+                    hasher.update(chunk)
+            key["sha256"] = hasher.hexdigest()
+        return key
+
+    def _cache_path(self, path: str) -> str:
+        name = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, name + ".json")
+
+    @staticmethod
+    def _load(cache_path: str, key: dict) -> Optional[Tuple[List[QuoteModel], int]]:
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            if entry.get("key") != key:
+                return None
+            quotes = [QuoteModel(body=body, author=author) for body, author in entry["quotes"]]
+            return quotes, int(entry.get("malformed", 0))
+        except (OSError, ValueError, TypeError, KeyError, AttributeError):
+            # A damaged or foreign entry is a miss, and is overwritten once the file is parsed again.
+            return None
+
+    @staticmethod
+    def _store(cache_path: str, key: dict, quotes: List[QuoteModel], malformed: int = 0) -> None:
+        entry = {"key": key, "malformed": malformed, "quotes": [(quote.body, quote.author) for quote in quotes]}
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, cache_path)
@@ -1,8 +1,6 @@
 """Provide Quote Model object that contains `body` and `author` properties."""
 from __future__ import annotations
-from typing import Iterable
-
-from .exception import InvalidFileFormat
+from typing import Iterable, Optional
 
 
 class QuoteModel:
@@ -12,6 +10,8 @@ class QuoteModel:
     and has a method that returns an Iterable of `QuoteModel` instances from an Iterable of strings.
     """
 
+    __slots__ = ("body", "author")
+
     body: str
     author: str
 
@@ -29,21 +29,41 @@ class QuoteModel:
         return f"\"{self.body}\" - {self.author}"
 
     @classmethod
-    def from_linestr_iter_gen(cls, iterable: Iterable[str]) -> Iterable[QuoteModel]:
+    def from_linestr_iter_gen(cls, iterable: Iterable[str], stats: Optional[ParseStats] = None) -> Iterable[QuoteModel]:
         """Return an Iterable of `QuoteModel` instances.
 
+        Strings are consumed one at a time. Blank strings are skipped, and so are malformed
+        strings that do not split into a quote body and author, which are counted in `stats`.
+
         :param iterable: A String Iterable that contains a quote and its author joint by " - ".
+        :param stats: A ParseStats to count the parsed quotes and skipped malformed strings in.
         :return: A iterable of `QuoteModel` instances.
         """
         splitter = " - "
         for linestring in iterable:
             line_clean = linestring.strip().replace("\"", "")
-            if line_clean:
-                try:
-                    body, author = line_clean.split(splitter)
-                except Exception as e:
-                    raise InvalidFileFormat(
-                        f"Failed to parse quote body and quote author from the string \"{linestring}\" with \"{splitter}\".") from e
-                yield cls(body=body, author=author)
-            else:
-                return
+            if not line_clean:
+                continue
+            try:
+                body, author = line_clean.split(splitter)
+            except ValueError:
+                if stats is not None:
+                    stats.malformed += 1
+                continue
+            if stats is not None:
+                stats.quotes += 1
+            yield cls(body=body, author=author)
+
+
+class ParseStats:
+    """Counters of the quotes parsed from a file and the malformed entries skipped."""
+
+    __slots__ = ("quotes", "malformed")
+
+    quotes: int
+    malformed: int
+
+    def __init__(self) -> None:
+        """Construct a new `ParseStats` with zeroed counters."""
+        self.quotes = 0
+        self.malformed = 0
@@ -0,0 +1,278 @@
+"""Provide a compact, indexed store of quotes.
+
+'QuoteStore' holds quotes in a few flat arrays instead of one `QuoteModel` object per
+quote: every body is UTF-8 encoded into one shared buffer addressed by an offset
+array, and authors are interned into a table referenced by id. Quotes are
+deduplicated on ingest, can be sampled uniformly or by weight in O(1), and looked up
+by author. A store can be saved to a file and memory-mapped back, so forked workers
+share the pages of one copy instead of each holding their own.
+
+'WeightedSampler' draws quotes from a store with per-quote weights using the alias method.
+"""
+from __future__ import annotations
+
+import mmap
+import random
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+from .exception import InvalidFileFormat
+from .quote_model import QuoteModel
+
+_MAGIC = b"QSTORE01"
+_HEADER = struct.Struct("<8s8sQQQQ")
+_BYTE_ORDER = sys.byteorder.encode("ascii").ljust(8, b"\0")
+_MIN_DEDUP_CAPACITY = 1024
+
+
+class QuoteStore:
+    """A compact, deduplicated, sequence-like store of quotes."""
+
+    __slots__ = ("_text", "_offsets", "_author_ids", "_authors", "_author_lookup",
+                 "_dedup", "_by_author", "_mmap")
+
+    def __init__(self, quotes: Iterable[QuoteModel] = ()) -> None:
+        """Construct a new `QuoteStore` and add the supplied quotes to it.
+
+        :param quotes: An iterable of QuoteModel to add.
+        """
+        self._text: Union[bytearray, memoryview] = bytearray()
+        self._offsets: Union[array, memoryview] = array("Q", [0])
+        self._author_ids: Union[array, memoryview] = array("I")
+        self._authors: List[str] = []
+        self._author_lookup: Dict[str, int] = {}
+        self._dedup: Optional[array] = array("Q", bytes(8 * _MIN_DEDUP_CAPACITY))
+        self._by_author: Optional[List[array]] = None
+        self._mmap: Optional[mmap.mmap] = None
+        self.extend(quotes)
+
+    def __len__(self) -> int:
+        """Return the number of quotes."""
+        return len(self._author_ids)
+
+    def __getitem__(self, index: int) -> QuoteModel:
+        """Return the quote at the index as a new `QuoteModel`."""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("QuoteStore index out of range")
+        return QuoteModel(body=self.body(index), author=self._authors[self._author_ids[index]])
+
+    def __iter__(self) -> Iterator[QuoteModel]:
+        """Return an iterator over all quotes in insertion order."""
+        return (self[index] for index in range(len(self)))
+
+    def body(self, index: int) -> str:
+        """Return the body of the quote at the index without building a `QuoteModel`."""
+        return str(self._text[self._offsets[index]:self._offsets[index + 1]], "utf-8")
+
+    def author(self, index: int) -> str:
+        """Return the author of the quote at the index without building a `QuoteModel`."""
+        return self._authors[self._author_ids[index]]
+
+    @property
+    def authors(self) -> List[str]:
+        """Get the distinct authors in order of first appearance."""
+        return list(self._authors)
+
+    @property
+    def read_only(self) -> bool:
+        """Get whether the store is memory-mapped from a file and cannot be added to."""
+        return self._dedup is None
+
+    def add(self, quote: QuoteModel) -> bool:
+        """Add a quote unless an identical one is already stored.
+
+        :param quote: A QuoteModel to add.
+        :return: A boolean whether the quote was added.
+        """
+        if self.read_only:
+            raise ValueError("A QuoteStore loaded from a file is read-only.")
+
+        body = str(quote.body).encode("utf-8")
+        author = str(quote.author)
+        author_id = self._author_lookup.get(author)
+        slot = self._find_slot(body, author, author_id)
+        if self._dedup[slot]:
+            return False
+
+        if author_id is None:
+            author_id = self._author_lookup[sys.intern(author)] = len(self._authors)
+            self._authors.append(author)
+            if self._by_author is not None:
+                self._by_author.append(array("I"))
+        index = len(self)
+        self._text += body
+        self._offsets.append(len(self._text))
+        self._author_ids.append(author_id)
+        if self._by_author is not None:
+            self._by_author[author_id].append(index)
+
+        self._dedup[slot] = index + 1
+        if 2 * len(self) > len(self._dedup):
+            self._grow_dedup()
+        return True
+
+    def extend(self, quotes: Iterable[QuoteModel]) -> int:
+        """Add every quote that is not already stored.
+
+        :param quotes: An iterable of QuoteModel to add.
+        :return: An integer of the number of quotes added.
+        """
+        return sum(self.add(quote) for quote in quotes)
+
+    def random_quote(self, rng: Optional[random.Random] = None) -> QuoteModel:
+        """Return a uniformly random quote.
+
+        :param rng: A random.Random to draw with. Defaults to the `random` module.
+        :return: A QuoteModel.
+        """
+        if not len(self):
+            raise IndexError("Cannot choose from an empty QuoteStore")
+        return self[int((rng or random).random() * len(self))]
+
+    def weighted_sampler(self, weights: Sequence[float]) -> WeightedSampler:
+        """Return a sampler that draws quotes with probability proportional to their weights.
+
+        :param weights: A sequence of one non-negative float per quote, in insertion order.
+        :return: A WeightedSampler over this store.
+        """
+        return WeightedSampler(self, weights)
+
+    def quote_ids_by(self, author: str) -> Sequence[int]:
+        """Return the indices of the quotes by the author, in insertion order.
+
+        :param author: A String of the quote author.
+        :return: A sequence of integer indices, empty if the author is unknown.
+        """
+        author_id = self._author_lookup.get(author)
+        if author_id is None:
+            return array("I")
+        if self._by_author is None:
+            self._by_author = [array("I") for _ in self._authors]
+            for index, quote_author_id in enumerate(self._author_ids):
+                self._by_author[quote_author_id].append(index)
+        return self._by_author[author_id]
+
+    def quotes_by(self, author: str) -> List[QuoteModel]:
+        """Return the quotes by the author, in insertion order."""
+        return [self[index] for index in self.quote_ids_by(author)]
+
+    def save(self, path: str) -> None:
+        """Write the store to a file that `QuoteStore.load` can memory-map.
+
+        :param path: A String path of the file to write.
+        """
+        author_text = bytearray()
+        author_offsets = array("Q", [0])
+        for author in self._authors:
+            author_text += author.encode("utf-8")
+            author_offsets.append(len(author_text))
+
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, _BYTE_ORDER, len(self), len(self._text), len(self._authors), len(author_text)))
+            for section in (self._offsets, self._author_ids, author_offsets, self._text, author_text):
+                f.write(section)
+                f.write(bytes(-f.tell() % 8))
+
+    @classmethod
+    def load(cls, path: str) -> QuoteStore:
+        """Memory-map a store written by `save`.
+
+        The quote data stays in the page cache and is shared by every process that loads
+        the same file. The returned store is read-only.
+
+        :param path: A String path of the file to load.
+        :return: A read-only QuoteStore.
+        """
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        try:
+            magic, byte_order, n_quotes, text_bytes, n_authors, author_text_bytes = _HEADER.unpack_from(view)
+        except struct.error as e:
+            raise InvalidFileFormat(f"\"{path}\" is not a QuoteStore file.") from e
+        if magic != _MAGIC or byte_order != _BYTE_ORDER:
+            raise InvalidFileFormat(f"\"{path}\" is not a QuoteStore file written on this platform.")
+
+        sections = []
+        position = _HEADER.size
+        for length in (8 * (n_quotes + 1), 4 * n_quotes, 8 * (n_authors + 1), text_bytes, author_text_bytes):
+            sections.append(view[position:position + length])
+            position += length + (-length % 8)
+        offsets, author_ids, author_offsets, text, author_text = sections
+
+        store = cls()
+        store._text = text
+        store._offsets = offsets.cast("Q")
+        store._author_ids = author_ids.cast("I")
+        author_offsets = author_offsets.cast("Q")
+        store._authors = [sys.intern(str(author_text[author_offsets[i]:author_offsets[i + 1]], "utf-8"))
+                          for i in range(n_authors)]
+        store._author_lookup = {author: author_id for author_id, author in enumerate(store._authors)}
+        store._dedup = None
+        store._mmap = mapped
+        return store
+
+    def _find_slot(self, body: bytes, author: str, author_id: Optional[int]) -> int:
+        mask = len(self._dedup) - 1
+        slot = hash((body, author)) & mask
+        while self._dedup[slot]:
+            index = self._dedup[slot] - 1
+            if self._author_ids[index] == author_id and self._text[self._offsets[index]:self._offsets[index + 1]] == body:
+                break
+            slot = (slot + 1) & mask
+        return slot
+
+    def _grow_dedup(self) -> None:
+        self._dedup = array("Q", bytes(16 * len(self._dedup)))
+        for index in range(len(self)):
+            body = bytes(self._text[self._offsets[index]:self._offsets[index + 1]])
+            author_id = self._author_ids[index]
+            self._dedup[self._find_slot(body, self._authors[author_id], author_id)] = index + 1
+
+
+class WeightedSampler:
+    """Draws quotes from a `QuoteStore` in O(1) with probability proportional to per-quote weights."""
+
+    __slots__ = ("_store", "_probabilities", "_aliases")
+
+    def __init__(self, store: QuoteStore, weights: Sequence[float]) -> None:
+        """Construct a new `WeightedSampler` with Vose's alias method in O(n).
+
+        :param store: A QuoteStore to draw from.
+        :param weights: A sequence of one non-negative float per quote, in insertion order.
+        """
+        n = len(store)
+        if len(weights) != n:
+            raise ValueError(f"Expected {n} weights, got {len(weights)}.")
+        total = float(sum(weights))
+        if n == 0 or total <= 0:
+            raise ValueError("Weights must contain at least one positive value.")
+
+        self._store = store
+        self._probabilities = array("d", (w * n / total for w in weights))
+        self._aliases = array("Q", range(n))
+        small = [i for i, p in enumerate(self._probabilities) if p < 1.0]
+        large = [i for i, p in enumerate(self._probabilities) if p >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self._aliases[less] = more
+            self._probabilities[more] -= 1.0 - self._probabilities[less]
+            (small if self._probabilities[more] < 1.0 else large).append(more)
+        for index in small + large:
+            self._probabilities[index] = 1.0
+
+    def sample(self, rng: Optional[random.Random] = None) -> QuoteModel:
+        """Return a quote drawn with probability proportional to its weight.
+
+        :param rng: A random.Random to draw with. Defaults to the `random` module.
+        :return: A QuoteModel.
+        """
+        rng = rng or random
+        index = int(rng.random() * len(self._probabilities))
+        if rng.random() >= self._probabilities[index]:
+            index = self._aliases[index]
+        return self._store[index]
@@ -0,0 +1,210 @@
+"""Provide a full-text search index over the quotes of a `QuoteStore`.
+
+'SearchIndex' keeps an inverted index from lower-cased word tokens of each quote's
+body and author to the sorted ids of the quotes that contain them. Queries match all
+their terms, where a term ending in `*` matches every token with that prefix, and
+results are ranked with BM25 over the quote length.
+
+Every term occurs once per quote as far as the ranking goes, so a quote's score is the
+sum of its terms' weights scaled by a factor that only falls with its length. A query
+walks the quotes of its rarest term shortest first, from postings kept in that order
+for the terms that have been searched, and stops as soon as no quote left could beat
+the results it has, so a common term costs about as much as a rare one.
+"""
+import bisect
+import heapq
+import math
+import re
+from array import array
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from .quote_model import QuoteModel
+from .quote_store import QuoteStore
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+# Quotes added by one update above which the shortest-first postings are rebuilt on their next search
+# instead of having each quote inserted into them.
+_MAX_IMPACT_INSERTS = 1000
+
+
+class SearchHit(NamedTuple):
+    """A quote that matches a search query, with its relevance score."""
+
+    quote_id: int
+    score: float
+    quote: QuoteModel
+
+
+def tokenize(text: str) -> List[str]:
+    """Return the lower-cased word tokens of the text."""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class SearchIndex:
+    """An inverted index over a `QuoteStore` that is kept in sync by calling `update`."""
+
+    store: QuoteStore
+
+    def __init__(self, store: QuoteStore) -> None:
+        """Construct a new `SearchIndex` and index every quote already in the store.
+
+        :param store: A QuoteStore to index.
+        """
+        self.store = store
+        self._postings: Dict[str, array] = {}
+        # Postings of the searched terms from the shortest quote to the longest, built on first use.
+        self._impact_postings: Dict[str, array] = {}
+        self._lengths = array("H")
+        self._total_length = 0
+        self._sorted_terms: List[str] = []
+        self.update()
+
+    def __len__(self) -> int:
+        """Return the number of indexed quotes."""
+        return len(self._lengths)
+
+    def update(self) -> int:
+        """Index the quotes added to the store since the last update.
+
+        :return: An integer of the number of newly indexed quotes.
+        """
+        start = len(self)
+        if len(self.store) - start > _MAX_IMPACT_INSERTS:
+            self._impact_postings.clear()
+        new_terms = []
+        for quote_id in range(start, len(self.store)):
+            tokens = tokenize(self.store.body(quote_id)) + tokenize(self.store.author(quote_id))
+            length = min(len(tokens), 0xFFFF)
+            self._lengths.append(length)
+            self._total_length += length
+            for token in set(tokens):
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = array("I")
+                    new_terms.append(token)
+                postings.append(quote_id)
+                ordered = self._impact_postings.get(token)
+                if ordered is not None:
+                    # The newest quote comes first among the quotes of its length.
+                    ordered.insert(bisect.bisect_left(ordered, length, key=self._lengths.__getitem__), quote_id)
+        if new_terms:
+            # Sorting two sorted runs merges them in linear time.
+            self._sorted_terms.extend(sorted(new_terms))
+            self._sorted_terms.sort()
+        return len(self) - start
+
+    def search(self, query: str, author: Optional[str] = None, limit: int = 10) -> List[SearchHit]:
+        """Return the best-ranked quotes that contain every term of the query.
+
+        :param query: A String of whitespace-separated terms; a term ending in `*` is a prefix.
+        :param author: A String of the exact author to restrict results to, or None for any author.
+        :param limit: An integer of the maximum number of results.
+        :return: A list of SearchHit ordered by descending score.
+        """
+        # One list of (term, postings, idf) alternatives per query term; a prefix term has one per expansion.
+        term_matches = []
+        for raw_term in query.split():
+            is_prefix = raw_term.endswith("*")
+            terms = tokenize(raw_term)
+            if not terms:
+                continue
+            for term in terms[:-1]:
+                term_matches.append([(term, self._postings.get(term, array("I")), self._idf(term))])
+            last = terms[-1]
+            if is_prefix:
+                term_matches.append([(t, self._postings[t], self._idf(t)) for t in self._expand_prefix(last)])
+            else:
+                term_matches.append([(last, self._postings.get(last, array("I")), self._idf(last))])
+
+        if author is not None:
+            term_matches.append([(None, self.store.quote_ids_by(author), 0.0)])
+        if not term_matches or limit <= 0:
+            return []
+
+        term_matches.sort(key=lambda matches: sum(len(postings) for _, postings, _ in matches))
+        if not any(postings for _, postings, _ in term_matches[0]):
+            return []
+        # Summed in the order the weights of a quote are, so no quote's weight exceeds it by rounding.
+        max_weight = 0.0
+        for matches in term_matches:
+            max_weight += max(weight for _, _, weight in matches)
+
+        average_length = self._total_length / max(1, len(self))
+        top: List[Tuple[float, int]] = []
+        for quote_id, weight in self._iter_by_impact(term_matches[0]):
+            # Quotes come shortest first, so none after this one can score more than this bound. One that only
+            # ties the worst result has the same length and a lower id, which ranks it lower, unless every score is 0.
+            if len(top) == limit:
+                bound = self._bm25(quote_id, max_weight, average_length)
+                if bound < top[0][0] or (bound == top[0][0] and max_weight > 0):
+                    break
+            for matches in term_matches[1:]:
+                other_weight = _max_weight(matches, quote_id)
+                if other_weight is None:
+                    break
+                weight += other_weight
+            else:
+                scored = (self._bm25(quote_id, weight, average_length), quote_id)
+                if len(top) < limit:
+                    heapq.heappush(top, scored)
+                elif scored > top[0]:
+                    heapq.heapreplace(top, scored)
+        return [SearchHit(quote_id, score, self.store[quote_id]) for score, quote_id in sorted(top, reverse=True)]
+
+    def _idf(self, term: str) -> float:
+        document_frequency = len(self._postings.get(term, ()))
+        return math.log(1 + (len(self) - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self._sorted_terms, prefix)
+        end = bisect.bisect_left(self._sorted_terms, prefix + "\U0010ffff")
+        return self._sorted_terms[start:end]
+
+    def _iter_by_impact(self, matches) -> Iterator[Tuple[int, float]]:
+        # Yields each quote once with its best weight, shortest first and by descending id among equal lengths,
+        # the order in which equal scores are ranked.
+        if len(matches) == 1:
+            term, postings, weight = matches[0]
+            for quote_id in self._impact_ordered(term, postings):
+                yield quote_id, weight
+            return
+        streams = [self._impact_keyed(term, postings, weight) for term, postings, weight in matches]
+        previous = None
+        for _, negative_id, negative_weight in heapq.merge(*streams):
+            if negative_id != previous:
+                previous = negative_id
+                yield -negative_id, -negative_weight
+
+    def _impact_keyed(self, term: Optional[str], postings: Sequence[int], weight: float) -> Iterator[Tuple[int, int, float]]:
+        lengths = self._lengths
+        for quote_id in self._impact_ordered(term, postings):
+            yield lengths[quote_id], -quote_id, -weight
+
+    def _impact_ordered(self, term: Optional[str], postings: Sequence[int]) -> Sequence[int]:
+        ordered = self._impact_postings.get(term) if term is not None else None
+        if ordered is None:
+            # The sort is stable, so reversed postings stay in descending id order within a length.
+            ordered = array("I", sorted(reversed(postings), key=self._lengths.__getitem__))
+            if term is not None:
+                self._impact_postings[term] = ordered
+        return ordered
+
+    def _bm25(self, quote_id: int, idf_sum: float, average_length: float) -> float:
+        # Quotes are short, so every term is counted once per quote.
+        length_norm = 1 - _BM25_B + _BM25_B * self._lengths[quote_id] / average_length
+        return idf_sum * (_BM25_K1 + 1) / (1 + _BM25_K1 * length_norm)
+
+
+def _max_weight(matches, quote_id: int) -> Optional[float]:
+    best = None
+    for _, postings, weight in matches:
+        if _contains(postings, quote_id) and (best is None or weight > best):
+            best = weight
+    return best
+
+
+def _contains(sorted_ids: Sequence[int], quote_id: int) -> bool:
+    position = bisect.bisect_left(sorted_ids, quote_id)
+    return position < len(sorted_ids) and sorted_ids[position] == quote_id
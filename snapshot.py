@@ -0,0 +1,99 @@
+"""Provide prebuilt snapshots of the quotes and images memes are made from.
+
+Building a snapshot ingests the quote files and catalogs the images once; loading it
+memory-maps the saved `QuoteStore` and reads the image catalog, without importing any
+parser backend, running `pdftotext` or decoding an image, so app workers and CLI runs
+start fast.
+
+To build a snapshot:
+    python3 snapshot.py ./.cache/snapshot
+"""
+import argparse
+import os
+import sys
+from typing import Iterable, List, NamedTuple
+
+from meme_engine.image_index import DEFAULT_CATALOG_PATH, ImageIndex
+from quote_engine.quote_cache import QuoteCache
+from quote_engine.quote_store import QuoteStore
+
+QUOTE_FILES = ['./_data/DogQuotes/DogQuotesTXT.txt',
+               './_data/DogQuotes/DogQuotesDOCX.docx',
+               './_data/DogQuotes/DogQuotesPDF.pdf',
+               './_data/DogQuotes/DogQuotesCSV.csv']
+IMAGES_PATH = "./_data/photos/dog/"
+SNAPSHOT_QUOTES = "quotes.qstore"
+SNAPSHOT_IMAGES = "images.json"
+
+
+class Snapshot(NamedTuple):
+    """The quotes and images memes are made from."""
+
+    quotes: QuoteStore
+    images: ImageIndex
+
+
+def load_quotes(quote_files: Iterable[str] = QUOTE_FILES) -> QuoteStore:
+    """Load the quotes from the quote files, reusing the parsed quotes cached by earlier runs."""
+    quotes = QuoteStore()
+    for result in QuoteCache().parse_many(quote_files):
+        if result.error is not None:
+            print(f"Failed to ingest quotes from \"{result.path}\": {result.error!r}")
+        elif result.malformed:
+            print(f"Skipped {result.malformed} malformed quotes in \"{result.path}\".")
+        quotes.extend(result.quotes)
+    return quotes
+
+
+def load_images(images_path: str = IMAGES_PATH, catalog_path: str = DEFAULT_CATALOG_PATH) -> ImageIndex:
+    """Catalog the readable images below the images directory, reusing the catalog saved by earlier runs."""
+    images = ImageIndex(images_path, catalog_path)
+    if images.refresh().changed:
+        images.save()
+    if images.rejected:
+        print(f"Skipped {len(images.rejected)} unreadable or unsupported files below \"{images_path}\".")
+    return images
+
+
+def build_snapshot(quote_files: Iterable[str] = QUOTE_FILES, images_path: str = IMAGES_PATH) -> Snapshot:
+    """Ingest the quote files and catalog the images."""
+    return Snapshot(load_quotes(quote_files), load_images(images_path))
+
+
+def save_snapshot(snapshot: Snapshot, directory: str) -> None:
+    """Write a snapshot to a directory that `load_snapshot` reads.
+
+    :param snapshot: A Snapshot to save.
+    :param directory: A String path of the directory to write; it is created if missing.
+    """
+    os.makedirs(directory, exist_ok=True)
+    snapshot.quotes.save(os.path.join(directory, SNAPSHOT_QUOTES))
+    snapshot.images.save(os.path.join(directory, SNAPSHOT_IMAGES))
+
+
+def load_snapshot(directory: str) -> Snapshot:
+    """Read a snapshot written by `save_snapshot`; its quote store is read-only.
+
+    Refreshing the snapshot's image index updates it in memory only, leaving the snapshot as it was built.
+
+    :param directory: A String path of the snapshot directory.
+    :return: A Snapshot.
+    """
+    quotes = QuoteStore.load(os.path.join(directory, SNAPSHOT_QUOTES))
+    images = ImageIndex.load(os.path.join(directory, SNAPSHOT_IMAGES))
+    images.catalog_path = None
+    return Snapshot(quotes, images)
+
+
+def parse_args(argv: List[str] = sys.argv[1:]) -> argparse.Namespace:
+    """Parse input arguments."""
+    parser = argparse.ArgumentParser(description="Build a snapshot of the quotes and images.")
+    parser.add_argument("directory", help="Directory to write the snapshot to")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    snapshot = build_snapshot()
+    save_snapshot(snapshot, args.directory)
+    print(f"Saved {len(snapshot.quotes)} quotes and {len(snapshot.images)} images to \"{args.directory}\".")
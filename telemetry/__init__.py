@@ -0,0 +1 @@
+"""Let Python know that the `telemetry/` folder is a package."""
@@ -0,0 +1,290 @@
+"""Provide process-wide instrumentation of the meme and quote engines.
+
+The engines time their stages with `timer` and count bytes, items and cache lookups
+with `count`. Both return at once while instrumentation is disabled, which is the
+default, so the hot paths pay one function call; `enable` turns recording on.
+`render_prometheus` writes every recorded metric in the Prometheus text format, and
+`summary` returns them for printing, as `meme.py --profile` does.
+
+Metrics are kept per process: work done in a process pool is recorded in the worker.
+"""
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, NamedTuple, Tuple
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+# Upper bounds of the histogram buckets in seconds, from sub-millisecond cache hits to slow PDF conversions.
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# The type and help text of every metric the engines record.
+METRICS: Dict[str, Tuple[str, str]] = {
+    "meme_stage_seconds": (HISTOGRAM, "Time spent in each stage of rendering a meme."),
+    "meme_render_seconds": (HISTOGRAM, "Time spent rendering a meme, from its source image to its captioned pixels."),
+    "meme_decoded_bytes_total": (COUNTER, "Bytes of pixels decoded from source images."),
+    "meme_encoded_bytes_total": (COUNTER, "Bytes of encoded meme images, by format."),
+    "meme_cache_requests_total": (COUNTER, "Lookups in the meme engine caches, by cache and result."),
+    "meme_render_queue_jobs": (GAUGE, "Jobs of the render queue: submitted, coalesced and rejected so far, pending and retained now."),
+    "meme_images": (GAUGE, "Files of the image catalog, by status."),
+    "quote_ingest_seconds": (HISTOGRAM, "Time spent ingesting one quote file, by format."),
+    "quote_ingested_files_total": (COUNTER, "Quote files ingested, by format and result."),
+    "quote_ingested_quotes_total": (COUNTER, "Quotes ingested, by format."),
+    "quote_malformed_total": (COUNTER, "Malformed entries skipped while ingesting, by format."),
+    "quote_cache_requests_total": (COUNTER, "Lookups in the parsed quote cache, by result."),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Sample(NamedTuple):
+    """One value of a metric read by a collector when the metrics are rendered."""
+
+    name: str
+    labels: Dict[str, str]
+    value: float
+
+
+class Histogram:
+    """Counts of observed values in cumulative buckets, with their sum."""
+
+    buckets: Tuple[float, ...]
+    counts: List[int]
+    count: int
+    sum: float
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        """Construct a new empty `Histogram`.
+
+        :param buckets: A sorted tuple of the upper bounds of the buckets.
+        """
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Add a value to the histogram."""
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket it falls in.
+
+        :param q: A float between 0 and 1.
+        :return: A float upper bound, or infinity if the quantile is above the last bucket.
+        """
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+
+class MetricsRegistry:
+    """A thread-safe store of counters and histograms keyed by metric name and labels."""
+
+    def __init__(self) -> None:
+        """Construct a new empty `MetricsRegistry`."""
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._collectors: Dict[str, Callable[[], Iterable[Sample]]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, amount: float, labels: Labels = ()) -> None:
+        """Add an amount to a counter."""
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, labels: Labels = ()) -> None:
+        """Add a value to a histogram."""
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def register_collector(self, key: str, collect: Callable[[], Iterable[Sample]]) -> None:
+        """Register a function that reads current values, such as queue lengths, when the metrics are rendered.
+
+        :param key: A String identifying the collector; registering the same key again replaces it.
+        :param collect: A function returning an iterable of Sample.
+        """
+        with self._lock:
+            self._collectors[key] = collect
+
+    def counters(self) -> Dict[Tuple[str, Labels], float]:
+        """Return a copy of the counters keyed by (name, labels)."""
+        with self._lock:
+            return dict(self._counters)
+
+    def histograms(self) -> Dict[Tuple[str, Labels], Histogram]:
+        """Return copies of the histograms keyed by (name, labels)."""
+        with self._lock:
+            copies = {}
+            for key, histogram in self._histograms.items():
+                copy = Histogram(histogram.buckets)
+                copy.counts, copy.count, copy.sum = list(histogram.counts), histogram.count, histogram.sum
+                copies[key] = copy
+            return copies
+
+    def reset(self) -> None:
+        """Drop every recorded value, keeping the collectors."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render_prometheus(self) -> str:
+        """Return every metric in the Prometheus text exposition format, version 0.0.4."""
+        with self._lock:
+            collectors = list(self._collectors.values())
+        samples: Dict[str, List[Tuple[Labels, float]]] = {}
+        for (name, labels), value in self.counters().items():
+            samples.setdefault(name, []).append((labels, value))
+        for collect in collectors:
+            for sample in collect():
+                samples.setdefault(sample.name, []).append((tuple(sorted(sample.labels.items())), sample.value))
+        histograms: Dict[str, List[Tuple[Labels, Histogram]]] = {}
+        for (name, labels), histogram in self.histograms().items():
+            histograms.setdefault(name, []).append((labels, histogram))
+
+        lines = []
+        for name in sorted(set(samples) | set(histograms)):
+            kind, help_text = METRICS.get(name, (GAUGE if name in samples else HISTOGRAM, ""))
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(samples.get(name, ())):
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+            for labels, histogram in sorted(histograms.get(name, ()), key=lambda item: item[0]):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', _format_value(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> List[Tuple[str, str, str]]:
+        """Return a row of (metric, labels, description) per recorded metric, for printing.
+
+        Histograms are described by their count, total and mean time and estimated 95th
+        percentile, counters by their value.
+        """
+        rows = []
+        for (name, labels), histogram in sorted(self.histograms().items()):
+            mean_ms = histogram.sum / histogram.count * 1000 if histogram.count else 0.0
+            rows.append((name, _format_labels(labels), f"count={histogram.count} total={histogram.sum * 1000:.1f}ms "
+                                                       f"mean={mean_ms:.2f}ms p95<={histogram.quantile(0.95) * 1000:g}ms"))
+        for (name, labels), value in sorted(self.counters().items()):
+            rows.append((name, _format_labels(labels), _format_value(value)))
+        return rows
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f"{key}=\"{value}\"" for (key, _), value in zip(labels, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+registry = MetricsRegistry()
+_enabled = False
+
+
+def enable(enabled: bool = True) -> None:
+    """Turn recording of timers and counts on or off for the whole process."""
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    """Get whether timers and counts are recorded."""
+    return _enabled
+
+
+class _Timer:
+    __slots__ = ("_name", "_labels", "_start")
+
+    def __init__(self, name: str, labels: Labels) -> None:
+        self._name = name
+        self._labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        registry.observe(self._name, time.perf_counter() - self._start, self._labels)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name: str, **labels: str):
+    """Return a context manager that adds the time spent in it to a histogram while instrumentation is enabled.
+
+    :param name: A String name of the histogram, such as "meme_stage_seconds".
+    :param labels: The String label values of the histogram, such as stage="decode".
+    :return: A context manager.
+    """
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(name, tuple(sorted(labels.items())))
+
+
+def count(name: str, amount: float = 1, **labels: str) -> None:
+    """Add an amount to a counter while instrumentation is enabled.
+
+    :param name: A String name of the counter, such as "meme_encoded_bytes_total".
+    :param amount: A number to add.
+    :param labels: The String label values of the counter.
+    """
+    if _enabled:
+        registry.inc(name, amount, tuple(sorted(labels.items())))
+
+
+def observe(name: str, value: float, **labels: str) -> None:
+    """Add a value, such as a duration measured elsewhere, to a histogram while instrumentation is enabled.
+
+    :param name: A String name of the histogram.
+    :param value: A float value in the histogram's unit.
+    :param labels: The String label values of the histogram.
+    """
+    if _enabled:
+        registry.observe(name, value, tuple(sorted(labels.items())))
+
+
+def collect_gauges(key: str, read: Callable[[], Dict[str, float]], name: str, label: str) -> None:
+    """Register a collector that reports a dict of current values as one gauge labelled by the dict keys.
+
+    :param key: A String identifying the collector; registering the same key again replaces it.
+    :param read: A function returning a dict of label value to current value.
+    :param name: A String name of the gauge.
+    :param label: A String name of the label the dict keys are reported under.
+    """
+    registry.register_collector(key, lambda: [Sample(name, {label: str(k)}, v) for k, v in read().items()])
+
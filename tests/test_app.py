@@ -0,0 +1,51 @@
+import functools
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+
+import app as app_module
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def image_url(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("images")
+    Image.effect_mandelbrot((320, 240), (-2.0, -1.5, 1.0, 1.5), 64).convert("RGB").save(directory / "photo.jpg")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_QuietHandler, directory=str(directory)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/photo.jpg"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(tmp_path):
+    application = app_module.create_app(output_dir=str(tmp_path / "out"), warm_up=False, image_refresh_s=None)
+    yield application.test_client()
+    application.extensions["meme_generator"].render_queue.shutdown()
+
+
+def test_browser_gets_the_job_page_at_once(client, image_url):
+    response = client.post("/create", data={"image_url": image_url, "body": "To bork", "author": "Rex"})
+    assert response.status_code == 202
+    assert f"wait={app_module.JOB_PAGE_WAIT_S}" in response.get_data(as_text=True)
+
+
+def test_finished_job_links_to_its_meme(client, image_url):
+    json = {"Accept": "application/json"}
+    status = client.post("/create", data={"image_url": image_url, "body": "To bork", "author": "Rex"}, headers=json).get_json()
+    response = client.get(status["status_url"], query_string={"wait": 10}, headers=json)
+    assert response.status_code == 200
+    path = response.get_json()["path"]
+    assert path.startswith("/memes/")
+
+    meme = client.get(path)
+    assert meme.status_code == 200
+    assert meme.mimetype == "image/jpeg"
+    assert path in client.get(status["status_url"]).get_data(as_text=True)
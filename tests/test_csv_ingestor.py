@@ -0,0 +1,46 @@
+import io
+
+import pytest
+
+from quote_engine.exception import InvalidFileFormat
+from quote_engine.ingestor_utils import CSVIngestor
+from quote_engine.quote_model import ParseStats
+
+def _quotes(quotes):
+    return [(quote.body, quote.author) for quote in quotes]
+
+
+@pytest.fixture(params=["csv", "pandas"])
+def backend(request):
+    if request.param == "pandas":
+        pytest.importorskip("pandas")
+    return request.param
+
+
+def test_quoted_commas_and_reordered_columns(tmp_path, backend):
+    path = tmp_path / "quotes.csv"
+    path.write_text('author,body\nMr. Paws,"When in doubt, go shoe-shopping"\nSkittle,"Say ""bork"""\n')
+    assert _quotes(CSVIngestor.parse(str(path), backend=backend)) == [
+        ("When in doubt, go shoe-shopping", "Mr. Paws"),
+        ("Say \"bork\"", "Skittle"),
+    ]
+
+
+def test_byte_order_mark_is_not_part_of_the_header(tmp_path, backend):
+    path = tmp_path / "quotes.csv"
+    path.write_bytes("\ufeffbody,author\nChase the mailman,Skittle\n".encode("utf-8"))
+    assert _quotes(CSVIngestor.parse(str(path), backend=backend)) == [("Chase the mailman", "Skittle")]
+
+
+def test_missing_headers_are_rejected(tmp_path, backend):
+    path = tmp_path / "quotes.csv"
+    path.write_text("quote,who\nChase the mailman,Skittle\n")
+    with pytest.raises(InvalidFileFormat):
+        list(CSVIngestor.parse(str(path), backend=backend))
+
+
+def test_short_rows_are_counted_as_malformed():
+    stats = ParseStats()
+    stream = io.BytesIO(b"body,author\nChase the mailman,Skittle\nno author\n\nBork,Bork\n")
+    assert _quotes(CSVIngestor.parse_stream(stream, stats)) == [("Chase the mailman", "Skittle"), ("Bork", "Bork")]
+    assert (stats.quotes, stats.malformed) == (2, 1)
@@ -0,0 +1,29 @@
+import docx
+
+from quote_engine.ingestor_utils import DocxIngestor
+
+
+def _write_docx(path):
+    document = docx.Document()
+    document.add_paragraph("To bork or not to bork - Bork")
+    table = document.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = "Quote in a table - Cell"
+    table.cell(0, 1).text = "Another in a table - Cell"
+    document.add_paragraph("")
+    document.add_paragraph("Chase the mailman - Skittle")
+    document.add_paragraph("not a quote")
+    document.save(path)
+    return path
+
+
+def test_only_body_paragraphs_are_quotes(tmp_path):
+    path = _write_docx(str(tmp_path / "quotes.docx"))
+    quotes = [str(quote) for quote in DocxIngestor.parse(path)]
+
+    assert quotes == ["\"To bork or not to bork\" - Bork", "\"Chase the mailman\" - Skittle"]
+
+
+def test_stream_matches_path(tmp_path):
+    path = _write_docx(str(tmp_path / "quotes.docx"))
+    with open(path, "rb") as f:
+        assert [str(quote) for quote in DocxIngestor.parse_stream(f)] == [str(quote) for quote in DocxIngestor.parse(path)]
@@ -0,0 +1,124 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from meme_engine.exception import ImageFetchError, ImageFetchTimeout, ImageTooLarge
+from meme_engine.image_fetcher import ImageFetcher
+
+MAX_BYTES = 64 * 1024
+PHOTO = bytes(range(256)) * 40
+
+
+class _StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    block_on_close = False
+
+    def handle_error(self, request, client_address):
+        # The fetcher hangs up on oversized and slow bodies on purpose.
+        pass
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/photo.jpg":
+            self._send_headers(len(PHOTO))
+            self.wfile.write(PHOTO)
+        elif self.path == "/huge.jpg":
+            self._send_headers(MAX_BYTES + 1)
+            self.wfile.write(b"\0" * (MAX_BYTES + 1))
+        elif self.path == "/huge-chunked.jpg":
+            self._send_headers(None)
+            chunk = b"\0" * 4096
+            for _ in range(MAX_BYTES // len(chunk) + 2):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+        elif self.path == "/slow.jpg":
+            # Each byte arrives well within the read timeout, but the whole body would take 60 s.
+            self._send_headers(1200)
+            self._drip(1200)
+        elif self.path == "/slow-unsized.jpg":
+            self.send_response(200)
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self._drip(1200)
+        else:
+            self.send_error(404)
+
+    def _send_headers(self, length):
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        if length is None:
+            self.send_header("Transfer-Encoding", "chunked")
+        else:
+            self.send_header("Content-Length", str(length))
+        self.end_headers()
+
+    def _drip(self, count):
+        for _ in range(count):
+            self.wfile.write(b"\0")
+            self.wfile.flush()
+            time.sleep(0.05)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    server = _StandInServer(("127.0.0.1", 0), _StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fetcher():
+    fetcher = ImageFetcher(max_bytes=MAX_BYTES, timeout=(1.0, 1.0), deadline_s=1.0)
+    yield fetcher
+    fetcher.close()
+
+
+def test_fetches_image(fetcher, base_url):
+    image = fetcher.fetch(base_url + "/photo.jpg")
+    assert image.tell() == 0
+    assert image.getvalue() == PHOTO
+
+
+@pytest.mark.parametrize("path", ["/huge.jpg", "/huge-chunked.jpg"])
+def test_rejects_oversized_image(fetcher, base_url, path):
+    with pytest.raises(ImageTooLarge):
+        fetcher.fetch(base_url + path)
+
+
+def test_rejects_missing_image(fetcher, base_url):
+    with pytest.raises(ImageFetchError) as excinfo:
+        fetcher.fetch(base_url + "/missing.jpg")
+    assert not isinstance(excinfo.value, ImageFetchTimeout)
+
+
+@pytest.mark.parametrize("path", ["/slow.jpg", "/slow-unsized.jpg"])
+def test_slow_drip_stops_at_deadline(fetcher, base_url, path):
+    start = time.monotonic()
+    with pytest.raises(ImageFetchTimeout):
+        fetcher.fetch(base_url + path)
+    assert time.monotonic() - start < fetcher.deadline_s + 1.0
+
+
+def test_fetches_after_hanging_up(fetcher, base_url):
+    with pytest.raises(ImageFetchTimeout):
+        fetcher.fetch(base_url + "/slow.jpg")
+    assert fetcher.fetch(base_url + "/photo.jpg").getvalue() == PHOTO
+
+
+def test_fetch_deadline_shortens_the_fetchers(fetcher, base_url):
+    start = time.monotonic()
+    with pytest.raises(ImageFetchTimeout):
+        fetcher.fetch(base_url + "/slow.jpg", deadline_s=0.3)
+    assert time.monotonic() - start < 0.8
+    with pytest.raises(ImageFetchTimeout):
+        fetcher.fetch(base_url + "/photo.jpg", deadline_s=0.0)
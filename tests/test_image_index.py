@@ -0,0 +1,16 @@
+from PIL import Image
+
+from meme_engine.image_index import ImageIndex
+
+
+def test_refresh_accepts_mpo_photos(tmp_path):
+    frames = [Image.new("RGB", (320, 240), (40 * i, 0, 0)) for i in range(2)]
+    frames[0].save(tmp_path / "stereo.mpo", "MPO", save_all=True, append_images=frames[1:])
+    frames[0].save(tmp_path / "photo.jpg", "JPEG")
+    (tmp_path / "notes.jpg").write_text("not an image")
+
+    index = ImageIndex(str(tmp_path), catalog_path=None)
+    index.refresh()
+
+    assert [image.name for image in index] == ["photo.jpg", "stereo.mpo"]
+    assert list(index.rejected) == ["notes.jpg"]
@@ -0,0 +1,144 @@
+import gzip
+import warnings
+
+import docx
+import pytest
+import zstandard
+
+from quote_engine import ingestor as ingestor_module
+from quote_engine.exception import UnsupportedFileType
+from quote_engine.ingestor import CODECS, Ingestor
+from quote_engine.ingestor_utils import CSVIngestor, DocxIngestor, IngestorInterface, TextIngestor
+from quote_engine.quote_model import QuoteModel
+
+TEXT = "To bork or not to bork - Bork\nChase the mailman - Skittle\n"
+CSV = "body,author\nTo bork or not to bork,Bork\nChase the mailman,Skittle\n"
+QUOTES = ["\"To bork or not to bork\" - Bork", "\"Chase the mailman\" - Skittle"]
+
+
+def _parse(path):
+    return [str(quote) for quote in Ingestor.parse(str(path))]
+
+
+def _docx(path):
+    document = docx.Document()
+    for line in TEXT.splitlines():
+        document.add_paragraph(line)
+    document.save(str(path))
+    return path
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(Ingestor, "_by_extension", dict(Ingestor._by_extension))
+    monkeypatch.setattr(Ingestor, "_by_magic", list(Ingestor._by_magic))
+
+
+@pytest.mark.parametrize("name, content", [("quotes.txt", TEXT), ("quotes.csv", CSV)])
+def test_parses_by_extension(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content)
+    assert _parse(path) == QUOTES
+
+
+def test_known_extension_wins_over_magic(tmp_path):
+    path = tmp_path / "quotes.txt"
+    path.write_text("%PDF-1.7 is a version - Bork\nPK is not a zip - Skittle\n")
+    assert Ingestor._resolve(str(path)) is TextIngestor
+    assert _parse(path) == ["\"%PDF-1.7 is a version\" - Bork", "\"PK is not a zip\" - Skittle"]
+
+
+@pytest.mark.parametrize("name", ["quotes", "quotes.dat"])
+def test_misnamed_docx_is_sniffed(tmp_path, name):
+    path = _docx(tmp_path / name)
+    assert Ingestor._resolve(str(path)) is DocxIngestor
+    assert _parse(path) == QUOTES
+
+
+@pytest.mark.parametrize("name, compress", [
+    ("quotes.txt.gz", gzip.compress),
+    ("quotes.csv.zst", zstandard.ZstdCompressor().compress),
+])
+def test_decompresses_codecs(tmp_path, name, compress):
+    path = tmp_path / name
+    content = CSV if ".csv" in name else TEXT
+    path.write_bytes(compress(content.encode()))
+    assert _parse(path) == QUOTES
+
+
+def test_decompressed_docx_is_sniffed(tmp_path):
+    source = _docx(tmp_path / "quotes.docx")
+    path = tmp_path / "quotes.zst"
+    path.write_bytes(zstandard.ZstdCompressor().compress(source.read_bytes()))
+    assert Ingestor._resolve(str(path)) is DocxIngestor
+    assert _parse(path) == QUOTES
+
+
+def test_stream_is_opened_only_when_iterated(tmp_path, monkeypatch):
+    opened = []
+    magic, open_gzip = CODECS[".gz"]
+    monkeypatch.setitem(CODECS, ".gz", (magic, lambda path: opened.append(path) or open_gzip(path)))
+    path = tmp_path / "quotes.txt.gz"
+    path.write_bytes(gzip.compress(TEXT.encode()))
+
+    quotes = Ingestor.parse(str(path))
+    assert opened == []
+    assert [str(quote) for quote in quotes] == QUOTES
+    assert opened == [str(path)]
+
+
+def test_unsupported_file(tmp_path):
+    path = tmp_path / "quotes.bork"
+    path.write_bytes(b"\x00\x01 not quotes")
+    assert not Ingestor.can_digest(str(path))
+    with pytest.raises(UnsupportedFileType):
+        Ingestor.parse(str(path))
+
+
+def test_registered_ingestor_takes_its_extension(tmp_path, registry):
+    @Ingestor.register
+    class ShoutIngestor(IngestorInterface):
+        allowed_file_extensions = [".shout"]
+
+        @classmethod
+        def parse(cls, path, stats=None):
+            with open(path) as f:
+                return [QuoteModel(line.upper(), "Shouter") for line in f.read().split()]
+
+    path = tmp_path / "quotes.SHOUT"
+    path.write_text("bork woof")
+    assert Ingestor.ingestor_for_extension(".shout") is ShoutIngestor
+    assert _parse(path) == ["\"BORK\" - Shouter", "\"WOOF\" - Shouter"]
+
+
+def test_parse_many_keeps_path_order(tmp_path):
+    paths = []
+    for i in range(6):
+        path = tmp_path / f"quotes{i}.txt"
+        path.write_text(f"Quote {i} - Author {i}\n")
+        paths.append(str(path))
+    paths.insert(3, str(tmp_path / "missing.txt"))
+    paths.append(str(_docx(tmp_path / "quotes.docx")))
+
+    results = list(Ingestor.parse_many(paths, max_workers=2))
+
+    assert [result.path for result in results] == paths
+    assert [str(quote) for quote in results[0].quotes] == ["\"Quote 0\" - Author 0"]
+    assert isinstance(results[3].error, OSError)
+    assert [str(quote) for quote in results[-1].quotes] == QUOTES
+
+
+def test_plugin_failure_warns_without_printing(monkeypatch, registry, capsys):
+    class BrokenEntryPoint:
+        name = "broken"
+
+        def load(self):
+            raise ImportError("no such module")
+
+    monkeypatch.setattr(ingestor_module.Ingestor, "_plugins_loaded", False)
+    monkeypatch.setattr("importlib.metadata.entry_points", lambda group: [BrokenEntryPoint()])
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        Ingestor.ingestor_for_extension(".txt")
+    assert any("broken" in str(warning.message) for warning in caught)
+    assert capsys.readouterr().out == ""
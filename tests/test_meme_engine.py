@@ -0,0 +1,77 @@
+import os
+
+from PIL import Image
+
+from meme_engine.animation import is_animated
+from meme_engine.meme_engine import MemeEngine, MemeJob
+
+
+def _photo(path, size=(320, 240)):
+    Image.effect_mandelbrot(size, (-2.0, -1.5, 1.0, 1.5), 64).convert("RGB").save(path, "JPEG")
+    return path
+
+
+def test_make_meme_is_served_from_the_store(tmp_path):
+    photo = _photo(str(tmp_path / "photo.jpg"))
+    engine = MemeEngine(str(tmp_path / "out"))
+    path = engine.make_meme(photo, "To bork or not to bork", "Bork")
+    assert engine.make_meme(photo, "To bork or not to bork", "Bork") == path
+    assert Image.open(path).format == "JPEG"
+
+
+def test_failing_job_does_not_stop_the_batch(tmp_path):
+    photo = _photo(str(tmp_path / "photo.jpg"))
+    truncated = str(tmp_path / "truncated.jpg")
+    with open(photo, "rb") as src, open(truncated, "wb") as dst:
+        dst.write(src.read()[:600])
+    not_an_image = tmp_path / "quotes.jpg"
+    not_an_image.write_text("not an image")
+    jobs = [
+        MemeJob(photo, "To bork or not to bork", "Bork"),
+        MemeJob(truncated, "To bork or not to bork", "Bork"),
+        MemeJob(str(not_an_image), "To bork or not to bork", "Bork"),
+        MemeJob(str(tmp_path / "missing.jpg"), "To bork or not to bork", "Bork"),
+        MemeJob(photo, "Chase the mailman", "Skittle"),
+    ]
+
+    results = {result.job: result for result in MemeEngine(str(tmp_path / "out")).make_memes(jobs, processes=1)}
+
+    assert len(results) == len(jobs)
+    for job in (jobs[0], jobs[4]):
+        assert results[job].error is None
+        assert os.path.exists(results[job].path)
+    for job in jobs[1:4]:
+        assert results[job].path is None
+        assert isinstance(results[job].error, OSError)
+
+
+def _frames(count, size=(320, 240)):
+    return [Image.new("RGB", size, (40 * i, 0, 0)) for i in range(count)]
+
+
+def test_only_animation_formats_are_animated(tmp_path):
+    first, *rest = _frames(2)
+    for name, fmt, animated in (("a.gif", "GIF", True), ("a.png", "PNG", True), ("a.webp", "WEBP", True),
+                                ("a.mpo", "MPO", False), ("a.tiff", "TIFF", False)):
+        path = str(tmp_path / name)
+        first.save(path, fmt, save_all=True, append_images=rest)
+        assert is_animated(path) is animated, fmt
+
+
+def test_mpo_renders_as_a_still(tmp_path):
+    photo = str(tmp_path / "stereo.mpo")
+    first, *rest = _frames(2)
+    first.save(photo, "MPO", save_all=True, append_images=rest)
+    path = MemeEngine(str(tmp_path / "out")).make_meme(photo, "To bork or not to bork", "Bork")
+    assert Image.open(path).format == "JPEG"
+
+
+def test_animated_meme_is_looked_up_once(tmp_path):
+    animation = str(tmp_path / "animation.gif")
+    first, *rest = _frames(2)
+    first.save(animation, "GIF", save_all=True, append_images=rest)
+    engine = MemeEngine(str(tmp_path / "out"))
+    path = engine.make_meme(animation, "To bork or not to bork", "Bork")
+    assert engine.make_meme(animation, "To bork or not to bork", "Bork") == path
+    assert path.endswith(".gif")
+    assert (engine.output_store.misses, engine.output_store.hits) == (1, 1)
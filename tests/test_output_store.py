@@ -0,0 +1,50 @@
+import os
+
+from meme_engine.output_store import OutputStore
+
+
+def _write(content):
+    def write(path):
+        with open(path, "wb") as f:
+            f.write(content)
+    return write
+
+
+def test_put_and_get(tmp_path):
+    store = OutputStore(str(tmp_path))
+    key = OutputStore.make_key("image", "body", "author")
+    path = store.put(key, _write(b"meme"))
+    assert store.get(key) == path
+    assert open(path, "rb").read() == b"meme"
+
+
+def test_eviction_leaves_other_files_alone(tmp_path):
+    logo = tmp_path / "logo.jpg"
+    logo.write_bytes(b"logo")
+    store = OutputStore(str(tmp_path), max_entries=2)
+    for i in range(3):
+        store.put(OutputStore.make_key(i), _write(b"meme"))
+    assert logo.read_bytes() == b"logo"
+    assert store.stats()["entries"] == 2
+    assert store.evictions == 1
+
+
+def test_restart_adopts_only_keyed_files(tmp_path):
+    (tmp_path / "logo.jpg").write_bytes(b"logo")
+    key = OutputStore.make_key("image")
+    OutputStore(str(tmp_path)).put(key, _write(b"meme"))
+
+    store = OutputStore(str(tmp_path), max_entries=1)
+    assert store.get(key) == os.path.join(str(tmp_path), key + ".jpg")
+    assert store.stats()["entries"] == 1
+    assert (tmp_path / "logo.jpg").exists()
+
+
+def test_suffixes_share_the_caps(tmp_path):
+    store = OutputStore(str(tmp_path), max_entries=2, suffixes=(".jpg", ".gif"))
+    still = store.put(OutputStore.make_key("still"), _write(b"meme"))
+    store.put(OutputStore.make_key("first"), _write(b"gif"), ".gif")
+    store.put(OutputStore.make_key("second"), _write(b"gif"), ".gif")
+    assert not os.path.exists(still)
+    assert store.stats()["entries"] == 2
+    assert OutputStore(str(tmp_path), suffixes=(".jpg", ".gif")).stats()["entries"] == 2
@@ -0,0 +1,74 @@
+import io
+import os
+import stat
+import sys
+import threading
+
+import pytest
+
+from quote_engine.exception import PDFConversionError
+from quote_engine.ingestor_utils import PDFIngestor
+
+# Writes a damaged PDF's worth of warnings to stderr before any text, well past the pipe buffer.
+FAKE_PDFTOTEXT = f"""#!{sys.executable}
+import sys
+if "fd://0" in sys.argv:
+    sys.stdin.buffer.read()
+for i in range(20000):
+    sys.stderr.write(f"Syntax Error (%d): Illegal character in object stream\\n" % i)
+sys.stderr.flush()
+for i in range(3):
+    sys.stdout.write(f'"Quote {{i}}" - Author {{i}}\\n')
+sys.exit(int(sys.argv[sys.argv.index("-f") + 1]) if "-f" in sys.argv else 0)
+"""
+
+
+@pytest.fixture
+def fake_pdftotext(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "pdftotext"
+    script.write_text(FAKE_PDFTOTEXT)
+    script.chmod(script.stat().st_mode | stat.S_IXUSR)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    pdf = tmp_path / "quotes.pdf"
+    pdf.write_bytes(b"%PDF-1.4\n")
+    return str(pdf)
+
+
+def _run_with_timeout(parse, timeout_s=20.0):
+    result = {}
+
+    def run():
+        try:
+            result["quotes"] = list(parse())
+        except Exception as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout_s)
+    assert not thread.is_alive(), "pdftotext blocked on its stderr"
+    return result
+
+
+def test_parse_with_lots_of_stderr(fake_pdftotext):
+    result = _run_with_timeout(lambda: PDFIngestor.parse(fake_pdftotext))
+    assert [quote.body for quote in result["quotes"]] == ["Quote 0", "Quote 1", "Quote 2"]
+
+
+def test_parse_stream_with_lots_of_stderr(fake_pdftotext):
+    with open(fake_pdftotext, "rb") as f:
+        stream = io.BytesIO(f.read())
+    result = _run_with_timeout(lambda: PDFIngestor.parse_stream(stream))
+    assert len(result["quotes"]) == 3
+
+
+def test_failed_conversion_reports_the_end_of_stderr(fake_pdftotext):
+    # The fake exits with the first page number as its exit code.
+    result = _run_with_timeout(lambda: PDFIngestor.parse(fake_pdftotext, first_page=3))
+    error = result["error"]
+    assert isinstance(error, PDFConversionError)
+    assert "exit code 3" in str(error)
+    assert "Syntax Error (19999)" in str(error)
+    assert len(str(error)) < 5000
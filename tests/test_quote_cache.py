@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from quote_engine.quote_cache import QuoteCache
+
+
+def _bodies(quotes):
+    return [quote.body for quote in quotes]
+
+
+@pytest.fixture
+def quotes_path(tmp_path):
+    path = tmp_path / "quotes.txt"
+    path.write_text("To bork or not to bork - Bork\n")
+    return str(path)
+
+
+def test_warm_parse_is_a_hit(tmp_path, quotes_path):
+    cache = QuoteCache(str(tmp_path / "cache"))
+    assert _bodies(cache.parse(quotes_path)) == ["To bork or not to bork"]
+    warm = QuoteCache(cache.cache_dir)
+    assert _bodies(warm.parse(quotes_path)) == ["To bork or not to bork"]
+    assert (warm.hits, warm.misses) == (1, 0)
+
+
+def test_changed_size_is_parsed_again(tmp_path, quotes_path):
+    cache = QuoteCache(str(tmp_path / "cache"))
+    cache.parse(quotes_path)
+    mtime_ns = os.stat(quotes_path).st_mtime_ns
+    with open(quotes_path, "a") as f:
+        f.write("Chase the mailman - Skittle\n")
+    os.utime(quotes_path, ns=(mtime_ns, mtime_ns))
+
+    assert _bodies(cache.parse(quotes_path)) == ["To bork or not to bork", "Chase the mailman"]
+    assert cache.misses == 2
+
+
+def test_changed_mtime_is_parsed_again(tmp_path, quotes_path):
+    cache = QuoteCache(str(tmp_path / "cache"))
+    cache.parse(quotes_path)
+    with open(quotes_path, "w") as f:
+        f.write("To bark or not to bark - Bork\n")
+    stat = os.stat(quotes_path)
+    os.utime(quotes_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert _bodies(cache.parse(quotes_path)) == ["To bark or not to bark"]
+    assert cache.misses == 2
+
+
+@pytest.mark.parametrize("content", ["{\"key\": {\"ver", "[]", "{\"key\": null}", "not json at all"])
+def test_corrupt_cache_file_is_rebuilt(tmp_path, quotes_path, content):
+    cache = QuoteCache(str(tmp_path / "cache"))
+    cache.parse(quotes_path)
+    cache_path = cache._cache_path(quotes_path)
+    with open(cache_path, "w") as f:
+        f.write(content)
+
+    assert _bodies(cache.parse(quotes_path)) == ["To bork or not to bork"]
+    assert cache.misses == 2
+    assert _bodies(QuoteCache(cache.cache_dir).parse(quotes_path)) == ["To bork or not to bork"]
+
+
+def test_corrupt_quotes_in_a_matching_entry_are_rebuilt(tmp_path, quotes_path):
+    cache = QuoteCache(str(tmp_path / "cache"))
+    cache.parse(quotes_path)
+    cache._store(cache._cache_path(quotes_path), cache._file_key(quotes_path), [])
+    with open(cache._cache_path(quotes_path)) as f:
+        content = f.read().replace("\"quotes\":[]", "\"quotes\":[[\"only a body\"]]")
+    with open(cache._cache_path(quotes_path), "w") as f:
+        f.write(content)
+
+    results = list(cache.parse_many([quotes_path]))
+    assert _bodies(results[0].quotes) == ["To bork or not to bork"]
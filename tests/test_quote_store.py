@@ -0,0 +1,75 @@
+import collections
+import random
+
+import pytest
+
+from quote_engine.exception import InvalidFileFormat
+from quote_engine.quote_model import QuoteModel
+from quote_engine.quote_store import QuoteStore
+
+QUOTES = [
+    QuoteModel("To bork or not to bork", "Bork"),
+    QuoteModel("Chase the mailman", "Skittle"),
+    QuoteModel("Ünïcode bones 🦴", "Bork"),
+    QuoteModel("", "Nobody"),
+]
+
+
+def _pairs(quotes):
+    return [(quote.body, quote.author) for quote in quotes]
+
+
+def test_duplicates_are_dropped():
+    store = QuoteStore(QUOTES)
+    assert store.extend(QUOTES + [QuoteModel("To bork or not to bork", "Skittle")]) == 1
+    assert len(store) == len(QUOTES) + 1
+    assert _pairs(store.quotes_by("Bork")) == _pairs([QUOTES[0], QUOTES[2]])
+
+
+def test_dedup_survives_growth():
+    store = QuoteStore(QuoteModel(f"Quote {i}", f"Author {i % 7}") for i in range(5000))
+    assert store.extend(QuoteModel(f"Quote {i}", f"Author {i % 7}") for i in range(5000)) == 0
+    assert len(store) == 5000
+
+
+def test_save_and_load_round_trip(tmp_path):
+    store = QuoteStore(QUOTES)
+    path = str(tmp_path / "quotes.store")
+    store.save(path)
+
+    loaded = QuoteStore.load(path)
+
+    assert loaded.read_only
+    assert _pairs(loaded) == _pairs(store)
+    assert loaded.authors == store.authors
+    assert list(loaded.quote_ids_by("Bork")) == list(store.quote_ids_by("Bork"))
+    with pytest.raises(ValueError):
+        loaded.add(QuoteModel("New", "Bork"))
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / "quotes.txt"
+    path.write_bytes(b"To bork or not to bork - Bork\n" * 4)
+    with pytest.raises(InvalidFileFormat):
+        QuoteStore.load(str(path))
+
+
+def test_weighted_sampling_follows_the_weights():
+    store = QuoteStore(QUOTES)
+    weights = [1.0, 3.0, 0.0, 6.0]
+    sampler = store.weighted_sampler(weights)
+    rng = random.Random(42)
+    draws = 100_000
+
+    counts = collections.Counter((quote.body, quote.author) for quote in (sampler.sample(rng) for _ in range(draws)))
+
+    assert set(counts) <= set(_pairs(store))
+    for quote, weight in zip(_pairs(store), weights):
+        assert counts[quote] / draws == pytest.approx(weight / sum(weights), abs=0.01)
+
+
+def test_uniform_sampling_returns_stored_quotes():
+    store = QuoteStore(QUOTES)
+    rng = random.Random(7)
+    drawn = {(quote.body, quote.author) for quote in (store.random_quote(rng) for _ in range(1000))}
+    assert drawn == set(_pairs(store))
@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+from quote_engine.quote_model import QuoteModel
+from quote_engine.quote_store import QuoteStore
+from quote_engine.search_index import SearchIndex, tokenize
+
+WORDS = ["bark", "bork", "bone", "ball", "sock", "sun", "moon", "the", "a", "dog"]
+AUTHORS = ["Rex", "Fido", "Spot"]
+
+
+def _random_quotes(rng, count):
+    return [
+        QuoteModel(" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 8))) + f" q{i}", rng.choice(AUTHORS))
+        for i in range(count)
+    ]
+
+
+def _brute_force(index, query, author=None, limit=10):
+    # Scores every quote, so the pruned search must return exactly these hits.
+    ranked = []
+    for quote_id in range(len(index)):
+        tokens = set(tokenize(index.store.body(quote_id)) + tokenize(index.store.author(quote_id)))
+        if author is not None and index.store.author(quote_id) != author:
+            continue
+        weight = 0.0
+        for raw_term in query.split():
+            terms = tokenize(raw_term)
+            if not terms:
+                continue
+            weights = [index._idf(term) for term in terms[:-1] if term in tokens]
+            if len(weights) < len(terms) - 1:
+                break
+            last = terms[-1]
+            if raw_term.endswith("*"):
+                matching = [index._idf(token) for token in tokens if token.startswith(last)]
+            else:
+                matching = [index._idf(last)] if last in tokens else []
+            if not matching:
+                break
+            weight += sum(weights) + max(matching)
+        else:
+            average_length = index._total_length / len(index)
+            ranked.append((index._bm25(quote_id, weight, average_length), quote_id))
+    ranked.sort(reverse=True)
+    return [quote_id for _, quote_id in ranked[:limit]]
+
+
+@pytest.mark.parametrize("query, author", [
+    ("bork", None),
+    ("the", None),
+    ("bork the", None),
+    ("b*", None),
+    ("b* s*", None),
+    ("moon sock dog", None),
+    ("b*", "Rex"),
+    ("", "Fido"),
+    ("nothing", None),
+])
+def test_search_matches_brute_force(query, author):
+    index = SearchIndex(QuoteStore(_random_quotes(random.Random(7), 500)))
+    for limit in (1, 10, 50):
+        hits = index.search(query, author=author, limit=limit)
+        assert [hit.quote_id for hit in hits] == _brute_force(index, query, author, limit)
+        assert [hit.score for hit in hits] == sorted((hit.score for hit in hits), reverse=True)
+
+
+def test_update_keeps_searched_terms_and_prefixes_current():
+    rng = random.Random(11)
+    store = QuoteStore(_random_quotes(rng, 300))
+    index = SearchIndex(store)
+    index.search("bork")
+    index.search("b*")
+
+    store.add(QuoteModel("bork", "Rex"))
+    store.add(QuoteModel("zebra bork", "Rex"))
+    store.add(QuoteModel("zany", "Fido"))
+    assert index.update() == 3
+
+    for query in ("bork", "b*", "z*", "za*", "zebra"):
+        assert [hit.quote_id for hit in index.search(query)] == _brute_force(index, query)
+    assert {hit.quote.body for hit in index.search("z*")} == {"zebra bork", "zany"}
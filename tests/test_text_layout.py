@@ -0,0 +1,17 @@
+from meme_engine.text_layout import _FontMetrics, layout_text
+
+
+def test_word_widths_keep_only_recent_words():
+    metrics = _FontMetrics(("FreeMonoBold.ttf", 20), max_words=3)
+    widths = metrics.word_widths(["bork", "woof", "bork", "sit", "stay"])
+    assert widths[0] == widths[2]
+    assert metrics.word_widths(["woof", "sit", "stay", "bork"]) == [widths[1], widths[3], widths[4], widths[0]]
+    assert len(metrics._widths) == 3
+
+
+def test_long_word_is_broken_into_fitting_lines():
+    word = "bork" * 2000
+    layout = layout_text("FreeMonoBold.ttf", 20, f"to {word} or not", 300)
+    assert "".join(layout.lines).replace(" ", "") == f"to{word}ornot"
+    assert not layout.overflows
+    assert len(layout.lines) > 3